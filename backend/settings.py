@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 import os
+import tempfile
 import environ
 from dotenv import load_dotenv
 from urllib.parse import urlparse
@@ -221,6 +222,43 @@ DATABASES['default']['OPTIONS'] = {
 }
 
 
+# Cache used by the report endpoints. Set REDIS_URL to share it between
+# worker processes, or CACHE_DIR for a file-based cache; otherwise each
+# process keeps its own in-memory cache.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif os.getenv('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'welfare',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+
+# Rendered receipt PDFs (welfare/receipt_pdfs.py). The least recently served
+# are deleted once the directory grows past RECEIPT_PDF_CACHE_MAX_BYTES.
+RECEIPT_PDF_CACHE_DIR = os.getenv('RECEIPT_PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'welfare-receipt-pdfs'))
+RECEIPT_PDF_CACHE_MAX_BYTES = int(os.getenv('RECEIPT_PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Year-end statement batches started from the admin (welfare/statements.py)
+# render in at most this many processes each, whatever the number of CPUs
+STATEMENT_BATCH_MAX_WORKERS = int(os.getenv('STATEMENT_BATCH_MAX_WORKERS', 2))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,54 @@
+from .models import ActivityEntry, Event, Member, Payment, Receipt
+
+
+ACTIVITY_KINDS = {
+    Receipt: 'receipt',
+    Payment: 'payment',
+    Event: 'event',
+    Member: 'member',
+}
+
+
+def describe(instance, action):
+    """
+    Feed line for a create / update / delete of a receipt, payment, event
+    or member
+    """
+    if isinstance(instance, Receipt):
+        if action == 'created':
+            return f'{instance.member.full_name} paid {instance.get_receipt_type_display()}'
+        return f'Receipt {instance.receipt_number} for {instance.member.full_name} {action}'
+    if isinstance(instance, Event):
+        if action == 'created':
+            return f'New {instance.get_event_type_display()} event for {instance.member.full_name}'
+        return f'{instance.get_event_type_display()} event for {instance.member.full_name} {action}'
+    if isinstance(instance, Payment):
+        if action == 'created':
+            return f'{instance.get_payment_type_display()} payment to {instance.payee_name}'
+        return f'{instance.get_payment_type_display()} payment to {instance.payee_name} {action}'
+    if action == 'created':
+        return f'{instance.full_name} joined the welfare'
+    if action == 'updated':
+        return f'{instance.full_name} updated profile'
+    return f'{instance.full_name} removed'
+
+
+def activity_entry(instance, action):
+    return ActivityEntry(
+        church_id=instance.church_id,
+        kind=ACTIVITY_KINDS[type(instance)],
+        action=action,
+        object_id=instance.pk,
+        description=describe(instance, action)[:255],
+    )
+
+
+def record_activity(instance, action):
+    activity_entry(instance, action).save()
+
+
+def record_bulk_activity(instances, action='created'):
+    """
+    Feed entries for rows written with bulk_create, which sends no signals
+    """
+    ActivityEntry.objects.bulk_create([activity_entry(instance, action) for instance in instances], batch_size=500)
@@ -1,6 +1,12 @@
-from django.contrib import admin
+import threading
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from .models import *
+from .statements import STALE_BATCH_AFTER, run_statement_batch, running_batches
 
 @admin.register(Church)
 class ChurchAdmin(admin.ModelAdmin):
@@ -41,7 +47,7 @@ class MemberAdmin(admin.ModelAdmin):
 @admin.register(Receipt)
 class ReceiptAdmin(admin.ModelAdmin):
     list_display = ['receipt_number', 'member', 'date', 'receipt_type', 'amount', 'year']
-    list_filter = ['receipt_type', 'year', 'date']
+    list_filter = ['church', 'receipt_type', 'year', 'date']
     search_fields = ['receipt_number', 'member__full_name']
 
 @admin.register(Event)
@@ -61,4 +67,110 @@ class PaymentAdmin(admin.ModelAdmin):
 class YearlyDuesAdmin(admin.ModelAdmin):
     list_display = ['church', 'year', 'monthly_amount', 'created_by', 'created_at']
     list_filter = ['church', 'year']
-    search_fields = ['church__name']
\ No newline at end of file
+    search_fields = ['church__name']
+
+@admin.register(ChurchMonthlyLedger)
+class ChurchMonthlyLedgerAdmin(admin.ModelAdmin):
+    list_display = ['church', 'year', 'month', 'entry_kind', 'entry_type', 'amount', 'count', 'updated_at']
+    list_filter = ['church', 'year', 'entry_kind']
+
+
+@admin.register(MemberYearBalance)
+class MemberYearBalanceAdmin(admin.ModelAdmin):
+    list_display = ['member', 'year', 'expected', 'paid_dues', 'paid_levy', 'outstanding', 'last_payment_date']
+    list_filter = ['year', 'member__church', 'member__status']
+    search_fields = ['member__full_name', 'member__phone_number']
+    list_select_related = ['member']
+    ordering = ['-year', '-outstanding']
+
+
+@admin.register(ReceiptSequence)
+class ReceiptSequenceAdmin(admin.ModelAdmin):
+    list_display = ['church', 'year', 'last_value']
+    list_filter = ['church', 'year']
+
+
+@admin.register(ReportSnapshot)
+class ReportSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['church', 'year', 'report', 'created_by', 'created_at']
+    list_filter = ['church', 'year', 'report']
+    readonly_fields = ['payload', 'created_at']
+
+
+@admin.register(ActivityEntry)
+class ActivityEntryAdmin(admin.ModelAdmin):
+    list_display = ['church', 'kind', 'action', 'description', 'created_at']
+    list_filter = ['church', 'kind', 'action']
+    search_fields = ['description']
+
+@admin.register(LevyObligation)
+class LevyObligationAdmin(admin.ModelAdmin):
+    list_display = ['event', 'member', 'amount', 'amount_paid', 'settled']
+    list_filter = ['settled', 'event__church']
+    search_fields = ['member__full_name', 'event__description']
+    raw_id_fields = ['event', 'member']
+
+
+def start_statement_batch(batch_id):
+    # Rendering takes minutes for a large church, so it runs after the
+    # request once the batch row is committed
+    transaction.on_commit(
+        lambda: threading.Thread(target=run_statement_batch, args=(batch_id,), daemon=True).start()
+    )
+
+@admin.register(StatementBatch)
+class StatementBatchAdmin(admin.ModelAdmin):
+    list_display = [
+        'church', 'year', 'status', 'statement_count', 'file', 'created_by', 'created_at', 'started_at', 'finished_at'
+    ]
+    list_filter = ['status', 'year', 'church']
+    readonly_fields = [
+        'status', 'statement_count', 'file', 'error', 'created_by', 'created_at', 'started_at', 'finished_at'
+    ]
+    actions = ['render_again']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Church and year are picked when adding the batch only
+        if obj is not None:
+            return ['church', 'year'] + self.readonly_fields
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        busy = not change and running_batches().filter(church_id=obj.church_id).exists()
+        if not change:
+            obj.created_by = request.user
+        if busy:
+            obj.status = 'failed'
+            obj.error = 'Another statement batch of this church is running. Render this one again once it is done.'
+        super().save_model(request, obj, form, change)
+        if busy:
+            self.message_user(request, obj.error, messages.WARNING)
+        elif not change:
+            start_statement_batch(obj.pk)
+
+    @admin.action(description='Render the selected statement batches again')
+    def render_again(self, request, queryset):
+        # Finished batches, and running ones whose thread died with the
+        # server (started before started_at was recorded, or long ago)
+        stuck = Q(status='running') & (
+            Q(started_at__isnull=True) | Q(started_at__lt=timezone.now() - STALE_BATCH_AFTER)
+        )
+        batches = queryset.filter(Q(status__in=['done', 'failed']) | stuck)
+        # One batch per church at a time
+        busy = set(running_batches().values_list('church_id', flat=True))
+        queued = skipped = 0
+        for batch in batches:
+            if batch.church_id in busy:
+                skipped += 1
+                continue
+            busy.add(batch.church_id)
+            batch.status = 'pending'
+            batch.error = ''
+            batch.save(update_fields=['status', 'error'])
+            start_statement_batch(batch.pk)
+            queued += 1
+        self.message_user(request, f"{queued} statement batches queued")
+        if skipped:
+            self.message_user(
+                request, f"{skipped} skipped: another batch of their church is running or queued", messages.WARNING
+            )
@@ -0,0 +1,58 @@
+from .periods import Period
+
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def month_before(year, month):
+    """
+    Return (year, month) for the calendar month before the given one
+    """
+    if month > 1:
+        return year, month - 1
+    return year - 1, 12
+
+
+def month_q(date_field, year, month):
+    """
+    Q object matching rows whose date_field falls in the given calendar month
+    """
+    return Period.month(year, month).q(date_field)
+
+
+def summarize(queryset, **aggregates):
+    """
+    Evaluate several conditional aggregates (Sum(..., filter=Q(...)), Count(...))
+    in a single query. The queryset is narrowed to the union of the aggregate
+    filters so the database only touches rows that contribute to a figure.
+    """
+    scope = None
+    for aggregate in aggregates.values():
+        condition = getattr(aggregate, 'filter', None)
+        if condition is None:
+            scope = None
+            break
+        scope = condition if scope is None else scope | condition
+    if scope is not None:
+        queryset = queryset.filter(scope)
+    return queryset.aggregate(**aggregates)
+
+
+def fill_months(rows, aggregates):
+    """
+    Spread rows carrying a 'month' key over 12 slots (Jan..Dec), using None
+    for every aggregate in months that have no row
+    """
+    by_month = {row.pop('month'): row for row in rows}
+    empty = dict.fromkeys(aggregates)
+    return [by_month.get(month_num, empty) for month_num in range(1, 13)]
+
+
+def growth(current, previous):
+    """
+    Percentage change from previous to current, 0 when there is no baseline
+    """
+    if previous > 0:
+        return ((current - previous) / previous) * 100
+    return 0
+
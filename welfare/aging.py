@@ -0,0 +1,92 @@
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import MemberYearBalance
+
+
+# (label, fewest months behind, most months behind) of each aging bucket
+AGING_BUCKETS = [
+    ('0-3', 1, 3),
+    ('3-6', 4, 6),
+    ('6-12', 7, 12),
+    ('12+', 13, None),
+]
+
+
+def arrears_aging(church, today=None):
+    """
+    Months of dues each active member of church is behind on as of today,
+    and the amount that would bring them up to date. Built from the member
+    year balances in one query and whole-array NumPy operations.
+
+    Months due are the whole year for past years and up to the current
+    month for this year; months covered are the year's dues paid over the
+    monthly amount (expected / 12), in integer cents so the division is
+    exact.
+
+    Returns (member_ids, months_behind, amount_behind) for the members at
+    least one month behind, furthest behind first.
+    """
+    today = today or timezone.now().date()
+    rows = list(
+        MemberYearBalance.objects.filter(
+            member__church=church, member__status='active', year__lte=today.year, expected__gt=0
+        )
+        .order_by()
+        # Floats skip building a Decimal per value; cents are rounded back below
+        .values_list('member_id', 'year', Cast('expected', FloatField()), Cast('paid_dues', FloatField()))
+    )
+    member_ids, years, expected, paid = zip(*rows) if rows else ((), (), (), ())
+
+    member_ids = np.array(member_ids, dtype=np.int64)
+    years = np.array(years, dtype=np.int64)
+    monthly_cents = np.rint(np.array(expected, dtype=np.float64) * 100).astype(np.int64) // 12
+    paid_cents = np.rint(np.array(paid, dtype=np.float64) * 100).astype(np.int64)
+
+    months_due = np.where(years < today.year, 12, today.month)
+    months_covered = np.minimum(months_due, paid_cents // monthly_cents)
+    owed_cents = np.maximum(0, months_due * monthly_cents - paid_cents)
+
+    members, member_index = np.unique(member_ids, return_inverse=True)
+    months_behind = np.bincount(member_index, weights=months_due - months_covered, minlength=len(members)).astype(np.int64)
+    amount_behind = np.bincount(member_index, weights=owed_cents, minlength=len(members)) / 100
+
+    behind = months_behind > 0
+    members, months_behind, amount_behind = members[behind], months_behind[behind], amount_behind[behind]
+    order = np.lexsort((members, -amount_behind, -months_behind))
+    return members[order], months_behind[order], amount_behind[order]
+
+
+def _in_bucket(months_behind, fewest, most):
+    in_bucket = months_behind >= fewest
+    if most is not None:
+        in_bucket &= months_behind <= most
+    return in_bucket
+
+
+def aging_buckets(months_behind, amount_behind):
+    """
+    Member count and amount owed per AGING_BUCKETS bucket
+    """
+    buckets = []
+    for label, fewest, most in AGING_BUCKETS:
+        in_bucket = _in_bucket(months_behind, fewest, most)
+        buckets.append({
+            'bucket': label,
+            'members': int(np.count_nonzero(in_bucket)),
+            'amount': round(float(amount_behind[in_bucket].sum()), 2),
+        })
+    return buckets
+
+
+def bucket_positions(months_behind, label=None):
+    """
+    Positions in the arrears_aging arrays of the members in the bucket
+    labelled label, or of every member when label is not a bucket
+    """
+    for bucket_label, fewest, most in AGING_BUCKETS:
+        if label == bucket_label:
+            return np.flatnonzero(_in_bucket(months_behind, fewest, most))
+    return np.arange(len(months_behind))
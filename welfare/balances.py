@@ -0,0 +1,329 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, FilteredRelation, Max, PositiveSmallIntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Member, MemberYearBalance, Receipt, YearlyDues
+from .periods import Period
+
+
+def expected_dues(church_id, year):
+    """
+    Yearly dues expected from one member: 12 × the church's monthly amount
+    for year, 0 when no dues were set
+    """
+    monthly_amount = YearlyDues.objects.filter(church_id=church_id, year=year).values_list(
+        'monthly_amount', flat=True
+    ).first()
+    return 12 * monthly_amount if monthly_amount else 0
+
+
+def allocate_dues(paid_dues, expected):
+    """
+    Apply a year's dues payments, oldest first, to its months at expected / 12
+    each. Months are filled in calendar order, so the result only depends on
+    the total paid. Returns (paid_months, month_remainder): a bitmap with
+    bit m-1 set when month m is covered, and what was paid towards the first
+    month left uncovered.
+    """
+    if not expected:
+        return 0, 0
+    monthly_amount = expected / 12
+    months = min(12, int(paid_dues // monthly_amount))
+    remainder = paid_dues - months * monthly_amount if months < 12 else 0
+    return (1 << months) - 1, remainder
+
+
+def allocation_update(expected):
+    """
+    allocate_dues as UPDATE expressions over paid_dues, for re-pricing every
+    balance of a church year in one statement
+    """
+    if not expected:
+        return {'paid_months': Value(0), 'month_remainder': Value(0)}
+    monthly_amount = expected / 12
+    return {
+        'paid_months': Case(
+            *[
+                When(paid_dues__gte=months * monthly_amount, then=Value((1 << months) - 1))
+                for months in range(12, 0, -1)
+            ],
+            default=Value(0),
+            output_field=PositiveSmallIntegerField(),
+        ),
+        'month_remainder': Case(
+            When(paid_dues__gte=expected, then=Value(0)),
+            *[
+                When(paid_dues__gte=months * monthly_amount, then=F('paid_dues') - Value(months * monthly_amount))
+                for months in range(11, 0, -1)
+            ],
+            default=F('paid_dues'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    }
+
+
+def month_mask(first_month, last_month):
+    """
+    paid_months bits of months first_month through last_month inclusive
+    """
+    if last_month < first_month:
+        return 0
+    return ((1 << last_month) - 1) & ~((1 << (first_month - 1)) - 1)
+
+
+def months_due(year, today=None):
+    """
+    Number of months of year whose dues have fallen due: all twelve for
+    past years, up to and including the current month for this year
+    """
+    today = today or timezone.now().date()
+    if year < today.year:
+        return 12
+    if year > today.year:
+        return 0
+    return today.month
+
+
+def dues_compliant_members(church, year):
+    """
+    Active members of church whose dues for year cover every month due so
+    far, tested with a bitwise AND on paid_months
+    """
+    due = month_mask(1, months_due(year))
+    if not due:
+        return 0
+    return (
+        MemberYearBalance.objects.filter(member__church=church, member__status='active', year=year)
+        .alias(covered=F('paid_months').bitand(due))
+        .filter(covered=due)
+        .count()
+    )
+
+
+def with_year_balance(members, year):
+    """
+    Annotate a Member queryset with outstanding, expected, paid_dues and
+    last_payment_date from each member's balance for year, joined in the
+    same query. Members without a balance row owe nothing.
+    """
+    money = DecimalField(max_digits=10, decimal_places=2)
+    return members.annotate(
+        balance=FilteredRelation('year_balances', condition=Q(year_balances__year=year))
+    ).annotate(
+        outstanding=Coalesce(F('balance__outstanding'), Value(Decimal('0')), output_field=money),
+        expected=Coalesce(F('balance__expected'), Value(Decimal('0')), output_field=money),
+        paid_dues=Coalesce(F('balance__paid_dues'), Value(Decimal('0')), output_field=money),
+        last_payment_date=F('balance__last_payment_date'),
+    )
+
+
+def refresh_balance(member_id, year):
+    """
+    Recompute one member's balance for year from their receipts. Rows that
+    carry neither an expectation nor a payment are removed.
+    """
+    member = Member.objects.filter(pk=member_id).values('church_id', 'date_joined').first()
+    if member is None:
+        return
+    totals = Receipt.objects.filter(member_id=member_id, year=year).aggregate(
+        paid_dues=Sum('amount', filter=Q(receipt_type='monthly_dues')),
+        paid_levy=Sum('amount', filter=Q(receipt_type='transport_levy')),
+        last_payment_date=Max('date'),
+    )
+    expected = expected_dues(member['church_id'], year)
+    paid_dues = totals['paid_dues'] or 0
+    paid_levy = totals['paid_levy'] or 0
+
+    owes_year = expected and year >= member['date_joined'].year
+    if not owes_year and totals['last_payment_date'] is None:
+        MemberYearBalance.objects.filter(member_id=member_id, year=year).delete()
+        return
+
+    paid_months, month_remainder = allocate_dues(paid_dues, expected)
+    MemberYearBalance.objects.update_or_create(
+        member_id=member_id,
+        year=year,
+        defaults={
+            'expected': expected,
+            'paid_dues': paid_dues,
+            'paid_levy': paid_levy,
+            'outstanding': max(0, expected - paid_dues),
+            'paid_months': paid_months,
+            'month_remainder': month_remainder,
+            'last_payment_date': totals['last_payment_date'],
+        },
+    )
+
+
+def refresh_balances(member_years):
+    """
+    Batch form of refresh_balance for a set of (member_id, year) pairs that
+    only gained receipts, e.g. after a bulk insert. Uses one grouped query
+    over the receipts and one bulk write per table.
+    """
+    member_years = set(member_years)
+    if not member_years:
+        return
+    member_ids = {member_id for member_id, year in member_years}
+    years = {year for member_id, year in member_years}
+
+    church_of = dict(Member.objects.filter(pk__in=member_ids).values_list('id', 'church_id'))
+    expected = {
+        (church_id, year): 12 * monthly_amount
+        for church_id, year, monthly_amount in YearlyDues.objects.filter(
+            church__in=set(church_of.values()), year__in=years
+        ).values_list('church_id', 'year', 'monthly_amount')
+    }
+    totals = (
+        Receipt.objects.filter(member__in=member_ids, year__in=years)
+        .order_by()
+        .values('member', 'year')
+        .annotate(
+            paid_dues=Sum('amount', filter=Q(receipt_type='monthly_dues')),
+            paid_levy=Sum('amount', filter=Q(receipt_type='transport_levy')),
+            last_payment_date=Max('date'),
+        )
+    )
+    existing = {
+        (balance.member_id, balance.year): balance
+        for balance in MemberYearBalance.objects.filter(member__in=member_ids, year__in=years)
+    }
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for row in totals:
+        key = (row['member'], row['year'])
+        if key not in member_years:
+            continue
+        balance = existing.get(key) or MemberYearBalance(member_id=row['member'], year=row['year'])
+        balance.expected = expected.get((church_of[row['member']], row['year']), 0)
+        balance.paid_dues = row['paid_dues'] or 0
+        balance.paid_levy = row['paid_levy'] or 0
+        balance.outstanding = max(0, balance.expected - balance.paid_dues)
+        balance.paid_months, balance.month_remainder = allocate_dues(balance.paid_dues, balance.expected)
+        balance.last_payment_date = row['last_payment_date']
+        balance.updated_at = now
+        (to_update if balance.pk else to_create).append(balance)
+
+    with transaction.atomic():
+        MemberYearBalance.objects.bulk_create(to_create, batch_size=500)
+        MemberYearBalance.objects.bulk_update(
+            to_update,
+            [
+                'expected', 'paid_dues', 'paid_levy', 'outstanding', 'paid_months', 'month_remainder',
+                'last_payment_date', 'updated_at',
+            ],
+            batch_size=500,
+        )
+
+
+def apply_yearly_dues(church_id, year):
+    """
+    Re-price every balance of the church for year after its YearlyDues
+    changed, creating rows for members who joined by then and have not paid
+    anything yet so they show up as owing.
+    """
+    expected = expected_dues(church_id, year)
+    with transaction.atomic():
+        if expected:
+            members = Member.objects.filter(church_id=church_id, date_joined__lt=Period.year(year).end).exclude(
+                year_balances__year=year
+            )
+            MemberYearBalance.objects.bulk_create(
+                [MemberYearBalance(member_id=member_id, year=year) for member_id in members.values_list('id', flat=True)],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+        balances = MemberYearBalance.objects.filter(member__church_id=church_id, year=year)
+        balances.update(
+            expected=expected,
+            outstanding=Greatest(Value(expected) - F('paid_dues'), Value(0)),
+            **allocation_update(expected),
+        )
+        if not expected:
+            balances.filter(last_payment_date__isnull=True).delete()
+
+
+def open_member_balances(*members):
+    """
+    Create the balances newly added members owe: every dues year of their
+    church from the year they joined. Members are expected to share a church.
+    """
+    if not members:
+        return
+    dues = list(YearlyDues.objects.filter(church_id=members[0].church_id))
+    MemberYearBalance.objects.bulk_create(
+        [
+            MemberYearBalance(
+                member=member,
+                year=yearly_dues.year,
+                expected=12 * yearly_dues.monthly_amount,
+                outstanding=12 * yearly_dues.monthly_amount,
+            )
+            for member in members
+            for yearly_dues in dues
+            if yearly_dues.year >= member.date_joined.year
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild(church=None):
+    """
+    Recompute all member balances from receipts and the dues schedule, for
+    one church or for all of them. Returns the number of rows written.
+    """
+    members = Member.objects.all()
+    if church is not None:
+        members = members.filter(church=church)
+
+    expected = {}
+    dues_by_church = defaultdict(list)
+    for yearly_dues in YearlyDues.objects.filter(church__in=members.values('church')):
+        amount = 12 * yearly_dues.monthly_amount
+        expected[yearly_dues.church_id, yearly_dues.year] = amount
+        dues_by_church[yearly_dues.church_id].append((yearly_dues.year, amount))
+
+    balances = {}
+    for member_id, church_id, joined in members.values_list('id', 'church_id', 'date_joined'):
+        for year, amount in dues_by_church[church_id]:
+            if year >= joined.year:
+                balances[member_id, year] = MemberYearBalance(
+                    member_id=member_id, year=year, expected=amount, outstanding=amount
+                )
+
+    paid = (
+        Receipt.objects.filter(member__in=members)
+        .order_by()
+        .values('member', 'church', 'year')
+        .annotate(
+            paid_dues=Sum('amount', filter=Q(receipt_type='monthly_dues')),
+            paid_levy=Sum('amount', filter=Q(receipt_type='transport_levy')),
+            last_payment_date=Max('date'),
+        )
+    )
+    for row in paid:
+        amount = expected.get((row['church'], row['year']), 0)
+        paid_dues = row['paid_dues'] or 0
+        paid_months, month_remainder = allocate_dues(paid_dues, amount)
+        balances[row['member'], row['year']] = MemberYearBalance(
+            member_id=row['member'],
+            year=row['year'],
+            expected=amount,
+            paid_dues=paid_dues,
+            paid_levy=row['paid_levy'] or 0,
+            outstanding=max(0, amount - paid_dues),
+            paid_months=paid_months,
+            month_remainder=month_remainder,
+            last_payment_date=row['last_payment_date'],
+        )
+
+    with transaction.atomic():
+        MemberYearBalance.objects.filter(member__in=members).delete()
+        MemberYearBalance.objects.bulk_create(balances.values(), batch_size=500)
+    return len(balances)
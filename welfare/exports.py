@@ -0,0 +1,158 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+from .models import Event, Member, Payment, Receipt
+from .periods import YEAR_RANGE_ERROR, YEARS, Period
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Rows are joined into one write per this many lines so the server is not
+# handed thousands of tiny chunks
+CSV_LINES_PER_WRITE = 500
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+# kind -> (model, church lookup, date field, type filter field, [(column, lookup), ...])
+EXPORTS = {
+    'receipts': (Receipt, 'church', 'date', 'receipt_type', [
+        ('Receipt Number', 'receipt_number'),
+        ('Date', 'date'),
+        ('Member', 'member__full_name'),
+        ('Phone Number', 'member__phone_number'),
+        ('Type', 'receipt_type'),
+        ('Year', 'year'),
+        ('Amount', 'amount'),
+        ('Details', 'details'),
+        ('Recorded By', 'created_by__name'),
+    ]),
+    'payments': (Payment, 'church', 'date', 'payment_type', [
+        ('Date', 'date'),
+        ('Type', 'payment_type'),
+        ('Payee', 'payee_name'),
+        ('Beneficiary', 'beneficiary_member__full_name'),
+        ('Amount', 'amount'),
+        ('Method', 'payment_method'),
+        ('Receipt Number', 'receipt_number'),
+        ('Description', 'description'),
+        ('Recorded By', 'created_by__name'),
+    ]),
+    'events': (Event, 'church', 'event_date', 'event_type', [
+        ('Date', 'event_date'),
+        ('Type', 'event_type'),
+        ('Member', 'member__full_name'),
+        ('Venue', 'venue'),
+        ('Levy Amount', 'levy_amount'),
+        ('Levy Paid', 'is_levy_paid'),
+        ('Description', 'description'),
+        ('Recorded By', 'created_by__name'),
+    ]),
+    'members': (Member, 'church', 'date_joined', 'status', [
+        ('Full Name', 'full_name'),
+        ('Phone Number', 'phone_number'),
+        ('Gender', 'gender'),
+        ('Status', 'status'),
+        ('Location', 'location'),
+        ('Date Joined', 'date_joined'),
+    ]),
+}
+
+
+def export_rows(kind, church, params):
+    """
+    Return (headers, rows) for an export, where rows is a values_list
+    iterator over the church's records with the query-string filters
+    (year, date_from, date_to, type) applied in the database.
+
+    Raises ValueError on an unknown kind or a malformed filter.
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export '{kind}'. Choose one of: {', '.join(EXPORTS)}")
+    model, church_lookup, date_field, type_field, columns = EXPORTS[kind]
+
+    queryset = model.objects.filter(**{church_lookup: church})
+
+    year = params.get('year')
+    if year:
+        try:
+            year = int(year)
+        except ValueError:
+            raise ValueError('year must be a number')
+        if year not in YEARS:
+            raise ValueError(YEAR_RANGE_ERROR)
+        if model is Receipt:
+            # Receipts are filed under the year they pay for
+            queryset = queryset.filter(year=year)
+        else:
+            queryset = queryset.filter(Period.year(year).q(date_field))
+
+    for param, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+        if params.get(param):
+            value = parse_date(params[param])
+            if value is None:
+                raise ValueError(f'{param} must be a date in YYYY-MM-DD format')
+            queryset = queryset.filter(**{f'{date_field}__{lookup}': value})
+
+    if params.get('type'):
+        queryset = queryset.filter(**{type_field: params['type']})
+
+    headers = [header for header, lookup in columns]
+    rows = (
+        queryset.order_by(date_field, 'id')
+        .values_list(*[lookup for header, lookup in columns])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return headers, rows
+
+
+class _Echo:
+    """
+    File-like object whose write() hands back the line, so csv.writer can
+    format rows without buffering them
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_lines(headers, rows):
+    writer = csv.writer(_Echo())
+    lines = [writer.writerow(headers)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= CSV_LINES_PER_WRITE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def csv_response(headers, rows, filename):
+    response = StreamingHttpResponse(_csv_lines(headers, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(headers, rows, filename):
+    """
+    Write the rows with XlsxWriter in constant_memory mode (each row is
+    flushed to disk as soon as the next one starts) into a temporary file,
+    then stream that file back. An XLSX is a zip archive, so it can only be
+    sent once the workbook is closed.
+    """
+    from xlsxwriter import Workbook
+
+    output = tempfile.TemporaryFile()
+    workbook = Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    worksheet = workbook.add_worksheet()
+    bold = workbook.add_format({'bold': True})
+    worksheet.write_row(0, 0, headers, bold)
+    for row_number, row in enumerate(rows, start=1):
+        worksheet.write_row(row_number, 0, row)
+    workbook.close()
+    output.seek(0)
+
+    return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
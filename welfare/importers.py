@@ -0,0 +1,216 @@
+import csv
+import io
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .activity import record_bulk_activity
+from .balances import open_member_balances
+from .models import CustomUser, Member
+from .report_cache import invalidate_church_reports
+from .snapshots import invalidate_snapshots
+
+
+IMPORT_CHUNK_SIZE = 500
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    # XLSX number cells: 241234567.0 -> "241234567" (format the column as text to keep leading zeros)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_member_rows(file, filename):
+    """
+    Yield (row_number, row dict) for each data row of a CSV or XLSX upload
+    without loading the whole file: csv reads line by line, openpyxl in
+    read-only mode streams the first worksheet. The first row must hold the
+    column names (full_name, phone_number, gender, status, location).
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    elif extension == '.xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        reader = workbook.worksheets[0].iter_rows(values_only=True)
+    else:
+        raise ValueError('Upload a .csv or .xlsx file')
+
+    header = None
+    for row_number, values in enumerate(reader, start=1):
+        if header is None:
+            header = [_normalize_header(value) for value in values]
+            if 'full_name' not in header or 'phone_number' not in header:
+                raise ValueError('The first row must contain full_name and phone_number columns')
+            continue
+        cells = [_cell_text(value) for value in values]
+        if not any(cells):
+            continue
+        yield row_number, dict(zip(header, cells))
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _clean_row(row):
+    """
+    Return (values, errors) for one import row
+    """
+    errors = {}
+    full_name = row.get('full_name', '')
+    phone_number = row.get('phone_number', '').replace(' ', '')
+    gender = row.get('gender', '').lower()
+    status = row.get('status', '').lower() or 'active'
+
+    if not full_name:
+        errors['full_name'] = 'This field is required.'
+    try:
+        CustomUser.phone_regex(phone_number)
+        if len(phone_number) > Member._meta.get_field('phone_number').max_length:
+            raise ValidationError('Phone number is too long.')
+    except ValidationError as e:
+        errors['phone_number'] = e.messages[0]
+    if gender not in dict(Member.GENDER_CHOICES):
+        errors['gender'] = 'Use male or female.'
+    if status not in dict(Member.MEMBER_STATUS):
+        errors['status'] = f'Unknown status "{status}".'
+
+    values = {
+        'full_name': full_name,
+        'phone_number': phone_number,
+        'gender': gender,
+        'status': status,
+        'location': row.get('location') or None,
+    }
+    return values, errors
+
+
+def _existing(church, phones):
+    """
+    Users with the given phone numbers, the phones already linked to a member
+    and the phones already used by a member of church
+    """
+    users = {user.phone_number: user for user in CustomUser.objects.filter(phone_number__in=phones)}
+    linked_phones = set(
+        Member.objects.filter(user__phone_number__in=phones).values_list('user__phone_number', flat=True)
+    )
+    church_phones = set(
+        Member.objects.filter(church=church, phone_number__in=phones).values_list('phone_number', flat=True)
+    )
+    return users, linked_phones, church_phones
+
+
+def _create_members(church, valid):
+    results = []
+    users, linked_phones, church_phones = _existing(church, [values['phone_number'] for row_number, values in valid])
+
+    new_users = []
+    to_create = []
+    for row_number, values in valid:
+        phone_number = values['phone_number']
+        if phone_number in church_phones:
+            results.append({'row': row_number, 'phone_number': phone_number, 'status': 'skipped', 'message': 'Already a member.'})
+            continue
+        if phone_number in linked_phones:
+            results.append({
+                'row': row_number, 'phone_number': phone_number, 'status': 'error',
+                'errors': {'phone_number': 'This phone number belongs to a member of another church.'}
+            })
+            continue
+        if phone_number not in users:
+            # Passwords are derived from the phone number and hashed on first login
+            user = CustomUser(
+                phone_number=phone_number, name=values['full_name'], church=church, is_member=True,
+                password=CustomUser.IMPORTED_PASSWORD,
+            )
+            users[phone_number] = user
+            new_users.append(user)
+        to_create.append((row_number, values))
+
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(new_users, batch_size=IMPORT_CHUNK_SIZE)
+        members = Member.objects.bulk_create(
+            [Member(church=church, user=users[values['phone_number']], **values) for row_number, values in to_create],
+            batch_size=IMPORT_CHUNK_SIZE,
+        )
+        # bulk_create sends no post_save, so open the new members' dues balances here
+        open_member_balances(*members)
+        record_bulk_activity(members)
+        invalidate_church_reports(church.id)
+        invalidate_snapshots(church.id)
+
+    for (row_number, values), member in zip(to_create, members):
+        results.append({'row': row_number, 'phone_number': values['phone_number'], 'status': 'created', 'member_id': member.id})
+    return results
+
+
+def _import_chunk(church, chunk, seen_phones):
+    results = []
+    valid = []
+    for row_number, row in chunk:
+        values, errors = _clean_row(row)
+        if not errors and values['phone_number'] in seen_phones:
+            errors['phone_number'] = 'Duplicate phone number in this file.'
+        if errors:
+            results.append({'row': row_number, 'phone_number': values['phone_number'], 'status': 'error', 'errors': errors})
+            continue
+        seen_phones.add(values['phone_number'])
+        valid.append((row_number, values))
+
+    try:
+        results.extend(_create_members(church, valid))
+    except IntegrityError:
+        # Another import created some of these phone numbers after the
+        # lookup; the chunk was rolled back, and looking again reports them
+        # as existing members
+        try:
+            results.extend(_create_members(church, valid))
+        except IntegrityError:
+            results.extend(
+                {
+                    'row': row_number, 'phone_number': values['phone_number'], 'status': 'error',
+                    'errors': {'phone_number': 'Imported at the same time by another upload. Try again.'}
+                }
+                for row_number, values in valid
+            )
+    return results
+
+
+def import_members(church, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Create members of church from an iterable of (row_number, row dict)
+    pairs, chunk by chunk. Each chunk costs a fixed number of queries: one
+    lookup of existing users and members by phone_number__in and bulk
+    inserts for the new rows.
+
+    Returns a per-row report sorted by row number.
+    """
+    results = []
+    seen_phones = set()
+    for chunk in _chunks(rows, chunk_size):
+        results.extend(_import_chunk(church, chunk, seen_phones))
+    results.sort(key=lambda result: result['row'])
+    return results
+
+
+def summarize_import(results):
+    summary = {'created': 0, 'skipped': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return summary
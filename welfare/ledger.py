@@ -0,0 +1,145 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .aggregations import fill_months
+from .models import ChurchMonthlyLedger, Event, Payment, Receipt
+
+
+# How each source model maps onto a ledger row:
+# (entry_kind, church lookup, date field, type field, amount field)
+LEDGER_SOURCES = {
+    Receipt: ('receipt', 'church', 'date', 'receipt_type', 'amount'),
+    Payment: ('payment', 'church', 'date', 'payment_type', 'amount'),
+    Event: ('event', 'church', 'event_date', 'event_type', 'levy_amount'),
+}
+
+
+def ledger_entry(instance):
+    """
+    Return the (church_id, date, entry_kind, entry_type, amount) bucket a
+    Receipt, Payment or Event instance contributes to
+    """
+    entry_kind, church_lookup, date_field, type_field, amount_field = LEDGER_SOURCES[type(instance)]
+    return (
+        instance.church_id,
+        getattr(instance, date_field),
+        entry_kind,
+        getattr(instance, type_field),
+        getattr(instance, amount_field),
+    )
+
+
+def stored_entry(model, pk):
+    """
+    Return the ledger bucket of the row as currently stored in the database,
+    or None if it does not exist (yet)
+    """
+    entry_kind, church_lookup, date_field, type_field, amount_field = LEDGER_SOURCES[model]
+    row = model.objects.filter(pk=pk).values_list(church_lookup, date_field, type_field, amount_field).first()
+    if row is None:
+        return None
+    church_id, date, entry_type, amount = row
+    return (church_id, date, entry_kind, entry_type, amount)
+
+
+def _post_bucket(church_id, year, month, entry_kind, entry_type, amount, count):
+    row, created = ChurchMonthlyLedger.objects.get_or_create(
+        church_id=church_id,
+        year=year,
+        month=month,
+        entry_kind=entry_kind,
+        entry_type=entry_type,
+    )
+    ChurchMonthlyLedger.objects.filter(pk=row.pk).update(
+        amount=F('amount') + amount,
+        count=F('count') + count,
+    )
+
+
+def _post(entry, sign):
+    church_id, date, entry_kind, entry_type, amount = entry
+    _post_bucket(church_id, date.year, date.month, entry_kind, entry_type, sign * amount, sign)
+
+
+def record_change(previous, current):
+    """
+    Move a row's contribution from its previous bucket to its current one.
+    Either side may be None (create / delete). Uses F() increments so
+    concurrent writers to the same bucket do not lose updates.
+    """
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            _post(previous, -1)
+        if current is not None:
+            _post(current, 1)
+
+
+def record_bulk_insert(instances):
+    """
+    Add rows inserted with bulk_create (which sends no signals) to the
+    ledger, touching each month / type bucket once
+    """
+    buckets = defaultdict(lambda: [0, 0])
+    for instance in instances:
+        church_id, date, entry_kind, entry_type, amount = ledger_entry(instance)
+        bucket = buckets[church_id, date.year, date.month, entry_kind, entry_type]
+        bucket[0] += amount
+        bucket[1] += 1
+    with transaction.atomic():
+        for key, (amount, count) in buckets.items():
+            _post_bucket(*key, amount, count)
+
+
+def rebuild(church=None):
+    """
+    Recompute the ledger from the raw Receipt, Payment and Event tables,
+    for one church or for all of them. Returns the number of rows written.
+    """
+    rows = []
+    for model, (entry_kind, church_lookup, date_field, type_field, amount_field) in LEDGER_SOURCES.items():
+        queryset = model.objects.all()
+        if church is not None:
+            queryset = queryset.filter(**{church_lookup: church})
+        buckets = (
+            queryset.annotate(ledger_year=ExtractYear(date_field), ledger_month=ExtractMonth(date_field))
+            .order_by()
+            .values(church_lookup, 'ledger_year', 'ledger_month', type_field)
+            .annotate(total=Sum(amount_field), entries=Count('id'))
+        )
+        for bucket in buckets:
+            rows.append(ChurchMonthlyLedger(
+                church_id=bucket[church_lookup],
+                year=bucket['ledger_year'],
+                month=bucket['ledger_month'],
+                entry_kind=entry_kind,
+                entry_type=bucket[type_field],
+                amount=bucket['total'] or 0,
+                count=bucket['entries'],
+            ))
+
+    with transaction.atomic():
+        existing = ChurchMonthlyLedger.objects.all()
+        if church is not None:
+            existing = existing.filter(church=church)
+        existing.delete()
+        ChurchMonthlyLedger.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def ledger_trend(church, entry_kind, year, **aggregates):
+    """
+    Per-month aggregates over the ledger rows of one kind for year, in the
+    12-slot shape of aggregations.fill_months
+    """
+    rows = (
+        ChurchMonthlyLedger.objects.filter(church=church, entry_kind=entry_kind, year=year)
+        .order_by()
+        .values('month')
+        .annotate(**aggregates)
+    )
+    return fill_months(rows, aggregates)
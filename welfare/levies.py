@@ -0,0 +1,168 @@
+import functools
+import operator
+
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Church, Event, LevyObligation, Member, Receipt
+from .report_cache import invalidate_church_reports
+from .snapshots import invalidate_snapshots
+
+
+def with_levy_collected(events):
+    """
+    Annotate an Event queryset with levy_collected, the sum of the transport
+    levy receipts linked to each event
+    """
+    collected = (
+        Receipt.objects.filter(related_event=OuterRef('pk'))
+        .order_by()
+        .values('related_event')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    return events.annotate(
+        levy_collected=Coalesce(
+            Subquery(collected), Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+    )
+
+
+def assess_levy(event, batch_size=1000):
+    """
+    Bring an event's levy obligations in line with its levy_amount. The
+    first time the event carries a levy, every active member of the church
+    except the one the event is for gets an obligation, written with a
+    single bulk_create. Later edits reprice the existing obligations in one
+    UPDATE instead. Returns the number of obligations created.
+    """
+    obligations = LevyObligation.objects.filter(event=event)
+    if obligations.exists():
+        obligations.update(
+            amount=event.levy_amount,
+            settled=ExpressionWrapper(Q(amount_paid__gte=event.levy_amount), output_field=models.BooleanField()),
+        )
+        return 0
+    if event.levy_amount <= 0:
+        return 0
+
+    members = (
+        Member.objects.filter(church_id=event.church_id, status='active')
+        .exclude(pk=event.member_id)
+        .values_list('id', flat=True)
+    )
+    created = LevyObligation.objects.bulk_create(
+        [LevyObligation(event=event, member_id=member_id, amount=event.levy_amount) for member_id in members],
+        batch_size=batch_size,
+    )
+    return len(created)
+
+
+def settle_levies(obligations):
+    """
+    Recompute amount_paid and settled of the given obligations from the
+    transport levy receipts linked to their events, in one UPDATE
+    """
+    paid = Coalesce(
+        Subquery(
+            Receipt.objects.filter(
+                related_event=OuterRef('event'), member=OuterRef('member'), receipt_type='transport_levy'
+            )
+            .order_by()
+            .values('related_event')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        ),
+        Value(0),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    return obligations.update(
+        amount_paid=paid,
+        settled=ExpressionWrapper(Q(amount__lte=paid), output_field=models.BooleanField()),
+    )
+
+
+def settle_levy(event_id, member_id):
+    if event_id is not None:
+        settle_levies(LevyObligation.objects.filter(event_id=event_id, member_id=member_id))
+
+
+def settle_receipt_levies(receipts):
+    """
+    Settle the obligations paid towards by receipts saved without signals
+    (bulk_create), in one UPDATE
+    """
+    pairs = {(receipt.related_event_id, receipt.member_id) for receipt in receipts if receipt.related_event_id is not None}
+    if pairs:
+        condition = functools.reduce(operator.or_, (Q(event_id=event_id, member_id=member_id) for event_id, member_id in pairs))
+        settle_levies(LevyObligation.objects.filter(condition))
+
+
+def link_levy_receipts(church=None, batch_size=1000):
+    """
+    Link transport levy receipts that have no related_event to the member's
+    latest event of the year the receipt pays for, the guess the levy report
+    used to make on every request. Linked receipts are left alone. Returns
+    the number of receipts linked.
+    """
+    churches = Church.objects.all() if church is None else [church]
+    linked = 0
+    for church in churches:
+        # (member, year) -> latest event, by the model ordering
+        events = {}
+        event_years = {}
+        for event_id, member_id, event_date in Event.objects.filter(church=church).values_list(
+            'id', 'member_id', 'event_date'
+        ):
+            events.setdefault((member_id, event_date.year), event_id)
+            event_years[event_id] = event_date.year
+
+        receipts = Receipt.objects.filter(
+            church=church, receipt_type='transport_levy', related_event__isnull=True
+        ).only('id', 'member_id', 'year')
+        batch = []
+        years = set()
+        with transaction.atomic():
+            for receipt in receipts.iterator(chunk_size=batch_size):
+                event_id = events.get((receipt.member_id, receipt.year))
+                if event_id is None:
+                    continue
+                receipt.related_event_id = event_id
+                batch.append(receipt)
+                years.update((receipt.year, event_years[event_id]))
+                if len(batch) == batch_size:
+                    Receipt.objects.bulk_update(batch, ['related_event'])
+                    linked += len(batch)
+                    batch = []
+            Receipt.objects.bulk_update(batch, ['related_event'])
+            linked += len(batch)
+
+            # bulk_update sends no signals
+            if years:
+                settle_levies(LevyObligation.objects.filter(event__church=church))
+                invalidate_church_reports(church.id)
+                invalidate_snapshots(church.id, years)
+    return linked
+
+
+def assess_existing_levies(church=None):
+    """
+    Create the obligations of events recorded before levies were assessed
+    per member, against the members active now, and settle them from the
+    receipts already linked. Returns the number of obligations created.
+    """
+    events = Event.objects.filter(levy_amount__gt=0, levy_obligations__isnull=True)
+    if church is not None:
+        events = events.filter(church=church)
+
+    created = 0
+    church_ids = set()
+    with transaction.atomic():
+        for event in events.distinct().iterator():
+            created += assess_levy(event)
+            church_ids.add(event.church_id)
+        for church_id in church_ids:
+            settle_levies(LevyObligation.objects.filter(event__church_id=church_id))
+            invalidate_church_reports(church_id)
+    return created
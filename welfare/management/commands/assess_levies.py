@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from welfare.levies import assess_existing_levies
+from welfare.models import Church
+
+
+class Command(BaseCommand):
+    help = 'Create per-member levy obligations for events recorded before levies were assessed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--church', type=int, help='Only assess the events of this church id')
+
+    def handle(self, *args, **options):
+        church = None
+        if options['church'] is not None:
+            try:
+                church = Church.objects.get(pk=options['church'])
+            except Church.DoesNotExist:
+                raise CommandError(f"Church {options['church']} does not exist")
+
+        created = assess_existing_levies(church)
+        self.stdout.write(self.style.SUCCESS(f"Levy obligations created: {created}"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from welfare.importers import import_members, iter_member_rows, summarize_import
+from welfare.models import Church
+
+
+class Command(BaseCommand):
+    help = 'Import members of a church from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('church', type=int, help='Id of the church the members belong to')
+        parser.add_argument('path', help='CSV or XLSX file with full_name, phone_number, gender, status, location columns')
+
+    def handle(self, *args, **options):
+        try:
+            church = Church.objects.get(pk=options['church'])
+        except Church.DoesNotExist:
+            raise CommandError(f"Church {options['church']} does not exist")
+
+        try:
+            with open(options['path'], 'rb') as file:
+                results = import_members(church, iter_member_rows(file, options['path']))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            if result['status'] == 'error':
+                self.stdout.write(self.style.WARNING(f"Row {result['row']}: {result['errors']}"))
+        summary = summarize_import(results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['created']} members, skipped {summary['skipped']}, {summary['error']} errors"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from welfare.levies import link_levy_receipts
+from welfare.models import Church
+
+
+class Command(BaseCommand):
+    help = 'Link unlinked transport levy receipts to the event they most likely paid for'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--church', type=int, help='Only link the receipts of this church id')
+
+    def handle(self, *args, **options):
+        church = None
+        if options['church'] is not None:
+            try:
+                church = Church.objects.get(pk=options['church'])
+            except Church.DoesNotExist:
+                raise CommandError(f"Church {options['church']} does not exist")
+
+        linked = link_levy_receipts(church)
+        self.stdout.write(self.style.SUCCESS(f"Levy receipts linked: {linked}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from welfare.ledger import rebuild
+from welfare.models import Church
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the church monthly ledger from receipts, payments and events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--church', type=int, help='Only rebuild the ledger of this church id')
+
+    def handle(self, *args, **options):
+        church = None
+        if options['church'] is not None:
+            try:
+                church = Church.objects.get(pk=options['church'])
+            except Church.DoesNotExist:
+                raise CommandError(f"Church {options['church']} does not exist")
+
+        rows = rebuild(church)
+        self.stdout.write(self.style.SUCCESS(f"Ledger rebuilt: {rows} rows written"))
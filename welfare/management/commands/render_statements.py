@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from welfare.models import Church
+from welfare.statements import write_statements
+
+
+class Command(BaseCommand):
+    help = 'Render the year-end statement PDF of every member of a church into a zip archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--church', type=int, required=True, help='Church id to render the statements of')
+        parser.add_argument('--year', type=int, help='Year of the statements (default: the current year)')
+        parser.add_argument('--output', help='Path of the zip to write (default: statements-<church>-<year>.zip)')
+        parser.add_argument('--workers', type=int, help='Rendering processes (default: one per CPU)')
+
+    def handle(self, *args, **options):
+        try:
+            church = Church.objects.get(pk=options['church'])
+        except Church.DoesNotExist:
+            raise CommandError(f"Church {options['church']} does not exist")
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        year = options['year'] or timezone.now().year
+        output = options['output'] or f'statements-{church.id}-{year}.zip'
+        count = write_statements(church, year, output, options['workers'])
+        self.stdout.write(self.style.SUCCESS(f"Statements rendered: {count} written to {output}"))
@@ -0,0 +1,209 @@
+from functools import cached_property
+
+from .models import LevyObligation, MemberYearBalance, Receipt, YearlyDues
+
+
+class MemberHistory:
+    """
+    The rows the member self-service reports are computed from. Each set is
+    loaded with one query the first time a report needs it, so a summary of
+    all reports costs the same few queries however many years of history
+    the member has.
+    """
+
+    def __init__(self, member):
+        self.member = member
+
+    @cached_property
+    def monthly_dues(self):
+        # year -> monthly dues amount of the member's church
+        return dict(YearlyDues.objects.filter(church_id=self.member.church_id).values_list('year', 'monthly_amount'))
+
+    @cached_property
+    def balances(self):
+        # Newest year first
+        return list(MemberYearBalance.objects.filter(member=self.member).order_by('-year'))
+
+    @cached_property
+    def receipts(self):
+        # Newest first
+        return list(
+            Receipt.objects.filter(member=self.member).select_related('related_event').order_by('-date', '-id')
+        )
+
+    @cached_property
+    def levy_obligations(self):
+        return list(LevyObligation.objects.filter(member=self.member).select_related('event'))
+
+    def transport_receipts(self):
+        return [receipt for receipt in self.receipts if receipt.receipt_type == 'transport_levy']
+
+    def levies_owed(self, year=None):
+        # Transport levies assessed on the member, for events of year if given
+        return sum(
+            obligation.amount
+            for obligation in self.levy_obligations
+            if year is None or obligation.event.event_date.year == year
+        )
+
+    def levies_outstanding(self, year=None):
+        return sum(
+            obligation.outstanding
+            for obligation in self.levy_obligations
+            if not obligation.settled and (year is None or obligation.event.event_date.year == year)
+        )
+
+
+def dues_payload(history, current_year):
+    """
+    Dues expected and paid per year for the member (payload of
+    reports-member-dues/)
+    """
+    member = history.member
+    is_active_member = member.status == 'active'
+    paid_by_year = {balance.year: balance.paid_dues for balance in history.balances}
+    receipt_years = [year for year, paid_dues in paid_by_year.items() if paid_dues > 0]
+
+    total_expected = 0
+    total_paid = 0
+    payment_history = []
+    years_to_show = set(range(current_year - 3, current_year + 1)) | set(receipt_years)
+    for year in sorted(years_to_show, reverse=True):
+        monthly_amount = history.monthly_dues.get(year) or 0
+        year_expected = 12 * monthly_amount if is_active_member else 0
+        year_receipts = paid_by_year.get(year) or 0
+        year_progress = (year_receipts / year_expected * 100) if year_expected > 0 else 0
+
+        # Only years with data
+        if year_receipts > 0 or year_expected > 0:
+            payment_history.append({
+                'year': year,
+                'amountPaid': float(year_receipts),
+                'progress': round(year_progress, 1)
+            })
+
+        total_expected += year_expected
+        total_paid += year_receipts
+
+    overall_progress = (total_paid / total_expected * 100) if total_expected > 0 else 0
+
+    current_monthly_amount = history.monthly_dues.get(current_year, 10)
+    current_year_expected = 12 * current_monthly_amount if is_active_member else 0
+    current_year_receipts = paid_by_year.get(current_year) or 0
+    current_year_progress = (current_year_receipts / current_year_expected * 100) if current_year_expected > 0 else 0
+    current_balance = next((balance for balance in history.balances if balance.year == current_year), None)
+    paid_through = current_balance.paid_through if current_balance else None
+
+    return {
+        'totalDuesExpected': float(total_expected),
+        'totalPaid': float(total_paid),
+        'overallProgress': round(overall_progress, 1),
+
+        'currentYear': current_year,
+        'currentYearExpected': float(current_year_expected),
+        'currentYearPaid': float(current_year_receipts),
+        'currentYearProgress': round(current_year_progress, 1),
+        'currentYearMonthsPaid': current_balance.months_paid if current_balance else 0,
+        'paidThrough': paid_through.isoformat() if paid_through else None,
+
+        'paymentHistory': payment_history[:4],
+        'memberStatus': member.status
+    }
+
+
+def transport_levies_payload(history, current_year):
+    """
+    Transport levies paid against the levies assessed on the member (payload
+    of reports-transport-levies/)
+    """
+    transport_receipts = history.transport_receipts()
+    total_paid = sum(receipt.amount for receipt in transport_receipts)
+    total_expected = history.levies_owed()
+
+    current_year_receipts = sum(receipt.amount for receipt in transport_receipts if receipt.year == current_year)
+    current_year_expected = history.levies_owed(current_year)
+
+    overall_progress = (total_paid / total_expected * 100) if total_expected > 0 else 0
+    current_year_progress = (current_year_receipts / current_year_expected * 100) if current_year_expected > 0 else 0
+
+    member_contributions = []
+    for receipt in transport_receipts[:10]:  # Last 10 contributions
+        purpose = "Transport levy"
+        related_event = receipt.related_event
+        if related_event:
+            purpose = f"{related_event.get_event_type_display()} - {related_event.description}"
+
+        member_contributions.append({
+            'memberName': history.member.full_name,
+            'amountPaid': float(receipt.amount),
+            'progress': 100,  # Since they've paid, progress is 100%
+            'date': receipt.date.strftime('%b %d, %Y'),
+            'purpose': purpose
+        })
+
+    return {
+        'totalTransportExpected': float(total_expected),
+        'totalPaid': float(total_paid),
+        'overallProgress': round(overall_progress, 1),
+
+        'currentYear': current_year,
+        'currentYearExpected': float(current_year_expected),
+        'currentYearPaid': float(current_year_receipts),
+        'currentYearProgress': round(current_year_progress, 1),
+
+        'memberContributions': member_contributions
+    }
+
+
+def outstanding_amounts_payload(history, current_year):
+    """
+    Dues and levies still owed plus the latest receipts (payload of
+    reports-outstanding-amounts/)
+    """
+    # Outstanding dues for the last 2 years with dues receipts
+    outstanding_dues = {}
+    for balance in [balance for balance in history.balances if balance.paid_dues > 0][:2]:
+        if balance.outstanding > 0:
+            outstanding_dues[str(balance.year)] = float(balance.outstanding)
+
+    # Unsettled transport levies for events of the current and previous year
+    outstanding_transport = {}
+    for year in range(current_year - 1, current_year + 1):
+        unpaid_levies = history.levies_outstanding(year)
+        if unpaid_levies > 0:
+            outstanding_transport[str(year)] = float(unpaid_levies)
+
+    recent_payments = []
+    for receipt in history.receipts[:10]:
+        receipt_type_display = 'Dues' if receipt.receipt_type == 'monthly_dues' else 'Transport Levy'
+        recent_payments.append({
+            'id': receipt.id,
+            'type': receipt_type_display,
+            'amount': float(receipt.amount),
+            'date': receipt.date.strftime('%Y-%m-%d'),
+            'year': str(receipt.year),
+            'details': receipt.details or f"{receipt_type_display} payment",
+            'receiptNumber': receipt.receipt_number
+        })
+
+    return {
+        'outstandingDues': outstanding_dues,
+        'outstandingTransport': outstanding_transport,
+        'recentPayments': recent_payments
+    }
+
+
+def payment_history_row(receipt):
+    """
+    One receipt as listed by member-payment-history/
+    """
+    return {
+        'id': receipt.id,
+        'receipt_number': receipt.receipt_number,
+        'receipt_type': receipt.receipt_type,
+        'date': receipt.date,
+        'amount': float(receipt.amount),
+        'year': receipt.year,
+        'details': receipt.details or '',
+        'created_at': receipt.created_at
+    }
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def build_ledger(apps, schema_editor):
+    ChurchMonthlyLedger = apps.get_model('welfare', 'ChurchMonthlyLedger')
+    sources = [
+        (apps.get_model('welfare', 'Receipt'), 'receipt', 'member__church', 'date', 'receipt_type', 'amount'),
+        (apps.get_model('welfare', 'Payment'), 'payment', 'church', 'date', 'payment_type', 'amount'),
+        (apps.get_model('welfare', 'Event'), 'event', 'church', 'event_date', 'event_type', 'levy_amount'),
+    ]
+    rows = []
+    for model, entry_kind, church_lookup, date_field, type_field, amount_field in sources:
+        buckets = (
+            model.objects.annotate(ledger_year=ExtractYear(date_field), ledger_month=ExtractMonth(date_field))
+            .order_by()
+            .values(church_lookup, 'ledger_year', 'ledger_month', type_field)
+            .annotate(total=Sum(amount_field), entries=Count('id'))
+        )
+        for bucket in buckets:
+            rows.append(ChurchMonthlyLedger(
+                church_id=bucket[church_lookup],
+                year=bucket['ledger_year'],
+                month=bucket['ledger_month'],
+                entry_kind=entry_kind,
+                entry_type=bucket[type_field],
+                amount=bucket['total'] or 0,
+                count=bucket['entries'],
+            ))
+    ChurchMonthlyLedger.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0004_church_church_momo_church_welfare_momo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChurchMonthlyLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('entry_kind', models.CharField(choices=[('receipt', 'Receipt'), ('payment', 'Payment'), ('event', 'Event')], max_length=10)),
+                ('entry_type', models.CharField(max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('church', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_ledger', to='welfare.church')),
+            ],
+            options={
+                'ordering': ['church', 'year', 'month'],
+                'unique_together': {('church', 'year', 'month', 'entry_kind', 'entry_type')},
+            },
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
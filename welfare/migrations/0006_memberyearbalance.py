@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:54
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Q, Sum
+
+
+def build_balances(apps, schema_editor):
+    Member = apps.get_model('welfare', 'Member')
+    MemberYearBalance = apps.get_model('welfare', 'MemberYearBalance')
+    Receipt = apps.get_model('welfare', 'Receipt')
+    YearlyDues = apps.get_model('welfare', 'YearlyDues')
+
+    expected = {}
+    dues_by_church = defaultdict(list)
+    for yearly_dues in YearlyDues.objects.all():
+        amount = 12 * yearly_dues.monthly_amount
+        expected[yearly_dues.church_id, yearly_dues.year] = amount
+        dues_by_church[yearly_dues.church_id].append((yearly_dues.year, amount))
+
+    balances = {}
+    for member_id, church_id, joined in Member.objects.values_list('id', 'church_id', 'date_joined'):
+        for year, amount in dues_by_church[church_id]:
+            if year >= joined.year:
+                balances[member_id, year] = MemberYearBalance(
+                    member_id=member_id, year=year, expected=amount, outstanding=amount
+                )
+
+    paid = (
+        Receipt.objects.order_by()
+        .values('member', 'member__church', 'year')
+        .annotate(
+            paid_dues=Sum('amount', filter=Q(receipt_type='monthly_dues')),
+            paid_levy=Sum('amount', filter=Q(receipt_type='transport_levy')),
+            last_payment_date=Max('date'),
+        )
+    )
+    for row in paid:
+        amount = expected.get((row['member__church'], row['year']), 0)
+        paid_dues = row['paid_dues'] or 0
+        balances[row['member'], row['year']] = MemberYearBalance(
+            member_id=row['member'],
+            year=row['year'],
+            expected=amount,
+            paid_dues=paid_dues,
+            paid_levy=row['paid_levy'] or 0,
+            outstanding=max(0, amount - paid_dues),
+            last_payment_date=row['last_payment_date'],
+        )
+    MemberYearBalance.objects.bulk_create(balances.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0005_churchmonthlyledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberYearBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('expected', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('paid_dues', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('paid_levy', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_balances', to='welfare.member')),
+            ],
+            options={
+                'ordering': ['member', '-year'],
+                'indexes': [models.Index(fields=['year', 'outstanding'], name='balance_year_outstanding_idx')],
+                'unique_together': {('member', 'year')},
+            },
+        ),
+        migrations.RunPython(build_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # Continue each church's numbering from the highest CHURCH_INITIALS/YEAR/SEQ it already issued
+    Receipt = apps.get_model('welfare', 'Receipt')
+    ReceiptSequence = apps.get_model('welfare', 'ReceiptSequence')
+    last_values = {}
+    for church_id, receipt_number in Receipt.objects.values_list('member__church', 'receipt_number').iterator():
+        parts = receipt_number.split('/')
+        if len(parts) < 3 or not parts[-1].isdigit() or not parts[-2].isdigit():
+            continue
+        key = (church_id, int(parts[-2]))
+        last_values[key] = max(last_values.get(key, 0), int(parts[-1]))
+    ReceiptSequence.objects.bulk_create(
+        [
+            ReceiptSequence(church_id=church_id, year=year, last_value=last_value)
+            for (church_id, year), last_value in last_values.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0006_memberyearbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('church', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipt_sequences', to='welfare.church')),
+            ],
+            options={
+                'unique_together': {('church', 'year')},
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
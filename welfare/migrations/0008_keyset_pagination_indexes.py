@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0007_receiptsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['church', 'event_date', 'id'], name='event_church_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['church', 'full_name', 'id'], name='member_church_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['church', 'date', 'id'], name='payment_church_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['date', 'id'], name='receipt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['member', 'date', 'id'], name='receipt_member_date_idx'),
+        ),
+    ]
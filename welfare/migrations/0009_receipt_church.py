@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_receipt_church(apps, schema_editor):
+    # Copy each receipt's church from its member in primary-key batches, each
+    # committed on its own, so a large table is never locked in one long update
+    Receipt = apps.get_model('welfare', 'Receipt')
+    Member = apps.get_model('welfare', 'Member')
+    member_church = Member.objects.filter(pk=OuterRef('member_id')).values('church_id')[:1]
+    last_pk = 0
+    while True:
+        pks = list(
+            Receipt.objects.filter(pk__gt=last_pk, church__isnull=True)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:BACKFILL_BATCH_SIZE]
+        )
+        if not pks:
+            break
+        Receipt.objects.filter(pk__in=pks).update(church=Subquery(member_church))
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Lets every backfill batch commit separately
+    atomic = False
+
+    dependencies = [
+        ('welfare', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='church',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='welfare.church'),
+        ),
+        migrations.RunPython(backfill_receipt_church, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='receipt',
+            name='church',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='welfare.church'),
+        ),
+        migrations.RemoveIndex(
+            model_name='receipt',
+            name='receipt_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['church', 'date', 'id'], name='receipt_church_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['church', 'year', 'receipt_type', 'amount'], name='receipt_church_year_type_idx'),
+        ),
+    ]
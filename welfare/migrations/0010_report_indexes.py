@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0009_receipt_church'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['member', 'is_levy_paid'], name='event_member_levy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['church', 'status'], name='member_church_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['church', 'payment_type', 'date'], name='payment_church_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['member', 'receipt_type', 'year'], name='receipt_member_type_year_idx'),
+        ),
+    ]
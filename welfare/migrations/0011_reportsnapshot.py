@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0010_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('report', models.CharField(max_length=50)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('church', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_snapshots', to='welfare.church')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['church', '-year', 'report'],
+                'unique_together': {('church', 'year', 'report')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Entries seeded per church and kind, so the feed starts with recent history
+BACKFILL_PER_KIND = 100
+
+
+def backfill_activity(apps, schema_editor):
+    Church = apps.get_model('welfare', 'Church')
+    Receipt = apps.get_model('welfare', 'Receipt')
+    Payment = apps.get_model('welfare', 'Payment')
+    Event = apps.get_model('welfare', 'Event')
+    Member = apps.get_model('welfare', 'Member')
+    ActivityEntry = apps.get_model('welfare', 'ActivityEntry')
+
+    sources = [
+        ('receipt', Receipt.objects.select_related('member'),
+         lambda r: f'{r.member.full_name} paid {r.get_receipt_type_display()}'),
+        ('payment', Payment.objects.all(),
+         lambda p: f'{p.get_payment_type_display()} payment to {p.payee_name}'),
+        ('event', Event.objects.select_related('member'),
+         lambda e: f'New {e.get_event_type_display()} event for {e.member.full_name}'),
+        ('member', Member.objects.all(),
+         lambda m: f'{m.full_name} joined the welfare'),
+    ]
+    for church_id in Church.objects.values_list('id', flat=True):
+        entries = []
+        for kind, queryset, describe in sources:
+            for row in queryset.filter(church_id=church_id).order_by('-created_at')[:BACKFILL_PER_KIND]:
+                entries.append(ActivityEntry(
+                    church_id=church_id,
+                    kind=kind,
+                    action='created',
+                    object_id=row.pk,
+                    description=describe(row)[:255],
+                    created_at=row.created_at,
+                ))
+        ActivityEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0011_reportsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('payment', 'Payment'), ('event', 'Event'), ('member', 'Member')], max_length=10)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('description', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('church', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='welfare.church')),
+            ],
+            options={
+                'verbose_name_plural': 'activity entries',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['church', 'created_at', 'id'], name='activity_church_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0012_activityentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='related_event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='levy_receipts', to='welfare.event'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0013_receipt_related_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LevyObligation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('settled', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='levy_obligations', to='welfare.event')),
+                ('member', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='levy_obligations', to='welfare.member')),
+            ],
+            options={
+                'ordering': ['event', 'member'],
+                'indexes': [models.Index(fields=['member', 'settled'], name='levy_member_settled_idx'), models.Index(fields=['event', 'settled'], name='levy_event_settled_idx')],
+                'unique_together': {('event', 'member')},
+            },
+        ),
+    ]
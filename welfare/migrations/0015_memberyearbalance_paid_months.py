@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_paid_months(apps, schema_editor):
+    # Allocate the dues already paid on each balance to its months, in
+    # primary-key batches (same rule as welfare.balances.allocate_dues)
+    MemberYearBalance = apps.get_model('welfare', 'MemberYearBalance')
+    last_pk = 0
+    while True:
+        balances = list(
+            MemberYearBalance.objects.filter(pk__gt=last_pk, expected__gt=0, paid_dues__gt=0)
+            .order_by('pk')
+            .only('pk', 'expected', 'paid_dues')[:BACKFILL_BATCH_SIZE]
+        )
+        if not balances:
+            break
+        for balance in balances:
+            monthly_amount = balance.expected / 12
+            months = min(12, int(balance.paid_dues // monthly_amount))
+            balance.paid_months = (1 << months) - 1
+            balance.month_remainder = balance.paid_dues - months * monthly_amount if months < 12 else 0
+        MemberYearBalance.objects.bulk_update(balances, ['paid_months', 'month_remainder'])
+        last_pk = balances[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Lets every backfill batch commit separately
+    atomic = False
+
+    dependencies = [
+        ('welfare', '0014_levyobligation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberyearbalance',
+            name='month_remainder',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='memberyearbalance',
+            name='paid_months',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_paid_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0015_memberyearbalance_paid_months'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('statement_count', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, upload_to='statements/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('church', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_batches', to='welfare.church')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'statement batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
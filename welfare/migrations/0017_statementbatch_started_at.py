@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0016_statementbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statementbatch',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:26
+
+import django.core.validators
+from django.db import migrations, models
+
+
+# Church's email, welfare_momo and church_momo definitions (nullable email,
+# mobile money number validators) changed in models.py without a migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('welfare', '0017_statementbatch_started_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='church',
+            name='church_momo',
+            field=models.CharField(blank=True, max_length=15, null=True, validators=[django.core.validators.RegexValidator(message='Enter a valid 10-digit mobile money number', regex='^0[0-9]{9}$')]),
+        ),
+        migrations.AlterField(
+            model_name='church',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, null=True),
+        ),
+        migrations.AlterField(
+            model_name='church',
+            name='welfare_momo',
+            field=models.CharField(max_length=15, validators=[django.core.validators.RegexValidator(message='Enter a valid 10-digit mobile money number', regex='^0[0-9]{9}$')]),
+        ),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+import calendar
+import datetime
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.utils import timezone
 from django.core.validators import RegexValidator
 
 class CustomUserManager(BaseUserManager):
@@ -82,6 +87,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Password of users created by a member import: unusable (Django's "!"
+    # prefix) until the login sets it from the phone number. Other unusable
+    # passwords are accounts locked on purpose and stay locked.
+    IMPORTED_PASSWORD = '!imported'
+    
     objects = CustomUserManager()
     
     USERNAME_FIELD = 'phone_number'
@@ -133,34 +143,40 @@ class Member(models.Model):
     class Meta:
         ordering = ['full_name']
         unique_together = ['church', 'phone_number']  # Unique phone per church
+        indexes = [
+            models.Index(fields=['church', 'full_name', 'id'], name='member_church_name_idx'),
+            models.Index(fields=['church', 'status'], name='member_church_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} ({self.phone_number})"
 
     def save(self, *args, **kwargs):
-        # Auto-create user if doesn't exist and phone_number is provided
-        if not self.user and self.phone_number:
-            try:
-                # Check if user already exists with this phone number
-                user = CustomUser.objects.get(phone_number=self.phone_number)
-                self.user = user
-            except CustomUser.DoesNotExist:
-                # Create new user with member role
-                user = CustomUser.objects.create_user(
-                    phone_number=self.phone_number,
-                    name=self.full_name,
-                    church=self.church,
-                    is_member=True,
-                    is_welfare_admin=False,
-                    is_church_admin=False
-                )
-                self.user = user
-        
-        # Ensure phone_number stays in sync with user
-        if self.user and self.user.phone_number != self.phone_number:
-            self.phone_number = self.user.phone_number
+        # Atomic so the activity feed entry (post_save signal) commits with the member
+        with transaction.atomic():
+            # Auto-create user if doesn't exist and phone_number is provided
+            if not self.user and self.phone_number:
+                try:
+                    # Check if user already exists with this phone number
+                    user = CustomUser.objects.get(phone_number=self.phone_number)
+                    self.user = user
+                except CustomUser.DoesNotExist:
+                    # Create new user with member role
+                    user = CustomUser.objects.create_user(
+                        phone_number=self.phone_number,
+                        name=self.full_name,
+                        church=self.church,
+                        is_member=True,
+                        is_welfare_admin=False,
+                        is_church_admin=False
+                    )
+                    self.user = user
             
-        super().save(*args, **kwargs)
+            # Ensure phone_number stays in sync with user
+            if self.user and self.user.phone_number != self.phone_number:
+                self.phone_number = self.user.phone_number
+                
+            super().save(*args, **kwargs)
 
 
 
@@ -176,32 +192,55 @@ class Receipt(models.Model):
     
     receipt_number = models.CharField(max_length=50, unique=True, blank=True)
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
+    church = models.ForeignKey(Church, on_delete=models.CASCADE, related_name='receipts')  # Copied from member on save
     date = models.DateField()
     receipt_type = models.CharField(max_length=20, choices=RECEIPT_TYPES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     year = models.IntegerField()  # Year payment is for
     details = models.TextField(blank=True)
+    
+    # Event a transport levy receipt was paid for
+    related_event = models.ForeignKey(
+        'Event',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='levy_receipts'
+    )
+    
     created_by = models.ForeignKey(CustomUser, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['church', 'date', 'id'], name='receipt_church_date_idx'),
+            models.Index(fields=['church', 'year', 'receipt_type', 'amount'], name='receipt_church_year_type_idx'),
+            models.Index(fields=['member', 'date', 'id'], name='receipt_member_date_idx'),
+            models.Index(fields=['member', 'receipt_type', 'year'], name='receipt_member_type_year_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
-        if not self.receipt_number:
-            # Generate receipt number: CHURCH_INITIALS/YEAR/SEQ
-            church_initials = ''.join(word[0].upper() for word in self.member.church.name.split()[:3])
-            year = self.date.year
-            last_receipt = Receipt.objects.filter(
-                receipt_number__startswith=f"{church_initials}/{year}/"
-            ).order_by('receipt_number').last()
+        # Atomic so the monthly ledger update (post_save signal) commits with the receipt
+        with transaction.atomic():
+            # Receipts are always filed under their member's church
+            self.church_id = self.member.church_id
             
-            if last_receipt:
-                last_seq = int(last_receipt.receipt_number.split('/')[-1])
-                new_seq = last_seq + 1
-            else:
-                new_seq = 1
-                
-            self.receipt_number = f"{church_initials}/{year}/{new_seq:04d}"
-        
-        super().save(*args, **kwargs)
+            if not self.receipt_number:
+                # Take the next number from the church's own sequence for the year
+                church = self.church
+                year = self.date.year
+                self.receipt_number = Receipt.format_receipt_number(church, year, ReceiptSequence.reserve(church, year))
+            
+            super().save(*args, **kwargs)
+    
+    @staticmethod
+    def format_receipt_number(church, year, seq):
+        """
+        Receipt number: CHURCH_INITIALS-CHURCH_ID/YEAR/SEQ. The church id keeps
+        churches that share initials from colliding on the unique number.
+        """
+        church_initials = ''.join(word[0].upper() for word in church.name.split()[:3])
+        return f"{church_initials}-{church.id}/{year}/{seq:04d}"
     
     def __str__(self):
         return f"{self.receipt_number} - {self.member.full_name}"
@@ -209,6 +248,44 @@ class Receipt(models.Model):
 
 
 
+class ReceiptSequence(models.Model):
+    """
+    Last receipt sequence number issued per church and year
+    """
+    church = models.ForeignKey(Church, on_delete=models.CASCADE, related_name='receipt_sequences')
+    year = models.IntegerField()
+    last_value = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['church', 'year']
+    
+    def __str__(self):
+        return f"{self.church.name} - {self.year}: {self.last_value}"
+    
+    @classmethod
+    def reserve(cls, church, year, count=1):
+        """
+        Reserve count consecutive sequence numbers for (church, year) and return
+        the first one. The increment is a single UPDATE, so the row stays
+        locked until the caller's transaction ends and concurrent writers
+        queue up instead of reading the same last value.
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(church=church, year=year).update(last_value=F('last_value') + count)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(church=church, year=year, last_value=count)
+                    return 1
+                except IntegrityError:
+                    # Another writer created the row first
+                    cls.objects.filter(church=church, year=year).update(last_value=F('last_value') + count)
+            last_value = cls.objects.filter(church=church, year=year).values_list('last_value', flat=True).get()
+        return last_value - count + 1
+
+
+
+
 
 
 class Event(models.Model):
@@ -236,9 +313,18 @@ class Event(models.Model):
     
     class Meta:
         ordering = ['-event_date', '-created_at']
+        indexes = [
+            models.Index(fields=['church', 'event_date', 'id'], name='event_church_date_idx'),
+            models.Index(fields=['member', 'is_levy_paid'], name='event_member_levy_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_event_type_display()} - {self.member.full_name} ({self.event_date})"
+    
+    def save(self, *args, **kwargs):
+        # Atomic so the monthly ledger update (post_save signal) commits with the event
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 
@@ -300,6 +386,10 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['church', 'date', 'id'], name='payment_church_date_idx'),
+            models.Index(fields=['church', 'payment_type', 'date'], name='payment_church_type_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.payment_type} - {self.payee_name} - {self.amount}"
@@ -315,7 +405,9 @@ class Payment(models.Model):
     
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        # Atomic so the monthly ledger update (post_save signal) commits with the payment
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 
@@ -338,4 +430,218 @@ class YearlyDues(models.Model):
         verbose_name_plural = 'Yearly dues'
     
     def __str__(self):
-        return f"{self.church.name} - {self.year}: ${self.monthly_amount}/month"
\ No newline at end of file
+        return f"{self.church.name} - {self.year}: ${self.monthly_amount}/month"
+    
+    def save(self, *args, **kwargs):
+        # Atomic so member balances (post_save signal) are re-priced with the dues change
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+
+
+class ChurchMonthlyLedger(models.Model):
+    """
+    Rollup of receipts, payments and event levies per church, calendar month
+    and type. Kept in sync by the signals in welfare/signals.py and rebuilt
+    from scratch with `python manage.py rebuild_ledger`.
+    """
+    ENTRY_KINDS = [
+        ('receipt', 'Receipt'),
+        ('payment', 'Payment'),
+        ('event', 'Event'),
+    ]
+    
+    church = models.ForeignKey(Church, on_delete=models.CASCADE, related_name='monthly_ledger')
+    year = models.IntegerField()
+    month = models.PositiveSmallIntegerField()
+    entry_kind = models.CharField(max_length=10, choices=ENTRY_KINDS)
+    entry_type = models.CharField(max_length=20)  # receipt_type / payment_type / event_type
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # levy_amount for events
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['church', 'year', 'month', 'entry_kind', 'entry_type']
+        ordering = ['church', 'year', 'month']
+    
+    def __str__(self):
+        return f"{self.church.name} - {self.year}/{self.month:02d} {self.entry_kind}:{self.entry_type} = {self.amount}"
+
+
+
+
+class MemberYearBalance(models.Model):
+    """
+    Denormalized dues position of a member for one year. Kept in sync by the
+    signals in welfare/signals.py on Receipt, YearlyDues and Member changes.
+    """
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='year_balances')
+    year = models.IntegerField()
+    expected = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # 12 × YearlyDues.monthly_amount
+    paid_dues = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    paid_levy = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # max(0, expected - paid_dues)
+    paid_months = models.PositiveSmallIntegerField(default=0)  # Bit m-1 set when month m is covered by dues paid
+    month_remainder = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Paid towards the first uncovered month
+    last_payment_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['member', 'year']
+        ordering = ['member', '-year']
+        indexes = [
+            models.Index(fields=['year', 'outstanding'], name='balance_year_outstanding_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.member.full_name} - {self.year}: {self.outstanding} outstanding"
+    
+    @property
+    def months_paid(self):
+        # Dues fill months from January, so the covered months are a prefix of the year
+        months = 0
+        while months < 12 and self.paid_months & (1 << months):
+            months += 1
+        return months
+    
+    @property
+    def paid_through(self):
+        """
+        Last day of the last month the year's dues cover, None when they
+        cover no month
+        """
+        if not self.months_paid:
+            return None
+        month = self.months_paid
+        return datetime.date(self.year, month, calendar.monthrange(self.year, month)[1])
+
+
+
+
+class ReportSnapshot(models.Model):
+    """
+    Insights payload frozen when a church closes a past year. Served instead
+    of recomputing the report, and deleted by the signals in
+    welfare/signals.py when a back-dated row for that year is written.
+    """
+    church = models.ForeignKey(Church, on_delete=models.CASCADE, related_name='report_snapshots')
+    year = models.IntegerField()
+    report = models.CharField(max_length=50)  # Name of the report view, e.g. receipts_insights
+    payload = models.JSONField()
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['church', 'year', 'report']
+        ordering = ['church', '-year', 'report']
+    
+    def __str__(self):
+        return f"{self.church.name} - {self.year} {self.report}"
+
+
+
+
+class ActivityEntry(models.Model):
+    """
+    Append-only feed of creates, updates and deletes of receipts, payments,
+    events and members, written by the signals in welfare/signals.py in the
+    same transaction as the change. Backs the dashboard activity feed.
+    """
+    ACTIVITY_KINDS = [
+        ('receipt', 'Receipt'),
+        ('payment', 'Payment'),
+        ('event', 'Event'),
+        ('member', 'Member'),
+    ]
+    
+    ACTIONS = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    church = models.ForeignKey(Church, on_delete=models.CASCADE, related_name='activity')
+    kind = models.CharField(max_length=10, choices=ACTIVITY_KINDS)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    object_id = models.BigIntegerField()  # Id of the receipt / payment / event / member
+    description = models.CharField(max_length=255)
+    created_at = models.DateTimeField(default=timezone.now)  # Not auto_now_add so backfills keep the original time
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = 'activity entries'
+        indexes = [
+            models.Index(fields=['church', 'created_at', 'id'], name='activity_church_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.church.name} - {self.description}"
+
+
+
+
+
+class LevyObligation(models.Model):
+    """
+    Transport levy one member owes for an event. Created for every active
+    member when an event with a levy is recorded (welfare/levies.py), and
+    settled by the signals in welfare/signals.py as transport levy receipts
+    linked to the event arrive.
+    """
+    # Indexed through unique_together and levy_member_settled_idx
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='levy_obligations', db_index=False)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='levy_obligations', db_index=False)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)  # Event.levy_amount when assessed
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Sum of the member's linked receipts
+    settled = models.BooleanField(default=False)  # amount_paid >= amount
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['event', 'member']
+        ordering = ['event', 'member']
+        indexes = [
+            models.Index(fields=['member', 'settled'], name='levy_member_settled_idx'),
+            models.Index(fields=['event', 'settled'], name='levy_event_settled_idx'),
+        ]
+    
+    @property
+    def outstanding(self):
+        return max(0, self.amount - self.amount_paid)
+    
+    def __str__(self):
+        return f"{self.member.full_name} - {self.event}: {self.amount_paid}/{self.amount}"
+
+
+
+
+class StatementBatch(models.Model):
+    """
+    Zip of the year-end statement PDFs of every member of a church, rendered
+    by welfare/statements.py in the background once the batch is added in
+    the admin.
+    """
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    church = models.ForeignKey(Church, on_delete=models.CASCADE, related_name='statement_batches')
+    year = models.IntegerField()
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    statement_count = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='statements/', blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'statement batches'
+    
+    def __str__(self):
+        return f"{self.church.name} - {self.year} statements"
@@ -0,0 +1,196 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over an ordering that ends in a unique key,
+    such as ('-date', '-id'). The cursor carries the ordering values of the
+    last row of the page, and the next page is the rows that sort after
+    them: (date, id) < (last_date, last_id). Rows sharing the leading key
+    are told apart by the rest of the tuple, so pages never repeat or skip
+    rows however many of them tie.
+
+    Opt-in so existing clients that expect a plain list keep working: a
+    request is paginated only when it sends ?page_size= or ?cursor=.
+    ?include_total=true adds a COUNT(*) of the whole list to the response.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        self.request = request
+        self.total = None
+        if params.get('include_total') in ('1', 'true'):
+            self.total = queryset.count()
+
+        page_size = self.get_page_size(request)
+        # [(field name, descending), ...]
+        self.keys = [(field.lstrip('-'), field.startswith('-')) for field in self.get_ordering(request, queryset, view)]
+        cursor = self.decode_cursor(queryset, params.get(self.cursor_query_param))
+        reverse = cursor is not None and cursor[0]
+        # A previous page is read backwards from its first row, then flipped
+        keys = [(name, descending != reverse) for name, descending in self.keys]
+
+        if cursor is not None:
+            queryset = queryset.filter(self.after(keys, cursor[1]))
+        rows = list(queryset.order_by(*[('-' if descending else '') + name for name, descending in keys])[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, cursor is not None
+        self.page = rows
+        return rows
+
+    @staticmethod
+    def after(keys, values):
+        """
+        Rows sorting after values in the ordering keys: the first key past
+        its value, or equal to it and the second key past, and so on
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(keys, values):
+            condition |= equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{name: value})
+        # Bound on the leading key alone so an index on it narrows the scan
+        name, descending = keys[0]
+        return Q(**{f"{name}__{'lte' if descending else 'gte'}": values[0]}) & condition
+
+    def encode_cursor(self, row, reverse):
+        values = []
+        for name, descending in self.keys:
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        cursor = base64.urlsafe_b64encode(json.dumps([reverse, values]).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, queryset, cursor):
+        """
+        (reverse, [value, ...]) of a cursor, each value converted back with
+        its ordering field, or None without one
+        """
+        if not cursor:
+            return None
+        try:
+            reverse, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.keys) or any(value is None for value in values):
+                raise ValueError
+            annotations = queryset.query.annotations
+            values = [
+                (annotations[name].output_field if name in annotations else queryset.model._meta.get_field(name)).to_python(value)
+                for (name, descending), value in zip(self.keys, values)
+            ]
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), values
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        body = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            body['count'] = self.total
+        body['results'] = data
+        return Response(body)
+
+
+class DatedPagination(KeysetPagination):
+    # Receipts and payments
+    ordering = ('-date', '-id')
+
+
+class EventPagination(KeysetPagination):
+    ordering = ('-event_date', '-id')
+
+
+class MemberPagination(KeysetPagination):
+    ordering = ('full_name', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        # The arrears view of the member list sorts by amount owed
+        if request.query_params.get('ordering') in ('outstanding', '-outstanding') and 'arrears_year' in request.query_params:
+            return (request.query_params['ordering'], 'full_name', 'id')
+        return self.ordering
+
+
+class DefaulterPagination(KeysetPagination):
+    # ?ordering= of the defaulters list; most owed first by default
+    orderings = {
+        '-amount': ('-outstanding', 'full_name', 'id'),
+        'amount': ('outstanding', 'full_name', 'id'),
+        'name': ('full_name', 'id'),
+        '-name': ('-full_name', '-id'),
+    }
+    ordering = orderings['-amount']
+
+    def get_ordering(self, request, queryset, view):
+        return self.orderings.get(request.query_params.get('ordering'), self.ordering)
+
+
+class YearlyDuesPagination(KeysetPagination):
+    ordering = ('-year', '-id')
+
+
+class ActivityPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+
+class LevyObligationPagination(KeysetPagination):
+    ordering = ('-id',)
+
+
+class AgingPagination(PageNumberPagination):
+    """
+    Page numbers for the arrears aging member list, which is computed and
+    sorted in memory rather than read through an indexed ordering
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,174 @@
+"""
+PDF documents drawn with reportlab. Functions here take plain dicts and
+return the PDF bytes; nothing is imported from Django, so the process pool
+workers of welfare/statements.py can import this module without setting
+Django up.
+"""
+import io
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 18 * mm
+LINE_HEIGHT = 5.5 * mm
+
+
+def _money(amount):
+    return f"{amount:,.2f}"
+
+
+def _clip(text, length):
+    text = ' '.join(str(text or '').split())
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+
+class _Page:
+    """
+    Canvas plus a cursor that moves down the page and starts a new page
+    (repeating the current table header) when it reaches the bottom margin
+    """
+
+    def __init__(self, title):
+        self.buffer = io.BytesIO()
+        self.canvas = canvas.Canvas(self.buffer, pagesize=A4, invariant=True)
+        self.canvas.setTitle(title)
+        self.y = PAGE_HEIGHT - MARGIN
+        self.columns = None
+
+    def space(self, lines=1):
+        self.y -= lines * LINE_HEIGHT
+        if self.y < MARGIN:
+            self.canvas.showPage()
+            self.y = PAGE_HEIGHT - MARGIN
+            if self.columns:
+                self.row([header for header, x, align in self.columns], bold=True)
+
+    def text(self, value, size=10, bold=False, x=MARGIN):
+        self.canvas.setFont('Helvetica-Bold' if bold else 'Helvetica', size)
+        self.canvas.drawString(x, self.y, value)
+        self.space()
+
+    def pair(self, label, value):
+        self.canvas.setFont('Helvetica', 10)
+        self.canvas.drawString(MARGIN, self.y, label)
+        self.canvas.drawRightString(MARGIN + 90 * mm, self.y, value)
+        self.space()
+
+    def table(self, columns):
+        # columns: [(header, x offset from the margin, 'left' / 'right'), ...]
+        self.columns = columns
+        self.row([header for header, x, align in columns], bold=True)
+
+    def row(self, values, bold=False):
+        self.canvas.setFont('Helvetica-Bold' if bold else 'Helvetica', 9)
+        for value, (header, x, align) in zip(values, self.columns):
+            if align == 'right':
+                self.canvas.drawRightString(MARGIN + x, self.y, value)
+            else:
+                self.canvas.drawString(MARGIN + x, self.y, value)
+        if bold:
+            self.canvas.line(MARGIN, self.y - 1.5 * mm, PAGE_WIDTH - MARGIN, self.y - 1.5 * mm)
+        self.space()
+
+    def end_table(self):
+        self.columns = None
+        self.space()
+
+    def rule(self):
+        self.canvas.line(MARGIN, self.y + 3 * mm, PAGE_WIDTH - MARGIN, self.y + 3 * mm)
+        self.space(0.5)
+
+    def finish(self):
+        self.canvas.showPage()
+        self.canvas.save()
+        return self.buffer.getvalue()
+
+
+def _church_heading(page, church):
+    page.text(church['welfare_name'] or church['name'], size=15, bold=True)
+    page.text(f"{church['name']}, {church['location']}", size=9)
+    page.rule()
+
+
+def render_statement(statement):
+    """
+    Year-end statement of one member: dues position, transport levies
+    assessed and every receipt filed under the year. statement is a dict
+    built by welfare.statements.statement_rows().
+    """
+    member = statement['member']
+    year = statement['year']
+    page = _Page(f"{year} statement - {member['full_name']}")
+    _church_heading(page, statement['church'])
+
+    page.text(f"Statement for {year}", size=12, bold=True)
+    page.text(f"{member['full_name']}  ·  {member['phone_number']}  ·  {member['status'].title()}")
+    page.space()
+
+    dues = statement['dues']
+    page.text('Dues', size=11, bold=True)
+    page.pair('Expected', _money(dues['expected']))
+    page.pair('Paid', _money(dues['paid']))
+    page.pair('Outstanding', _money(dues['outstanding']))
+    page.pair('Months covered', f"{dues['months_paid']} of 12")
+    page.space()
+
+    levies = statement['levies']
+    page.text('Transport levies', size=11, bold=True)
+    if levies:
+        page.table([('Date', 0, 'left'), ('Event', 24 * mm, 'left'), ('Levy', 125 * mm, 'right'),
+                    ('Paid', 150 * mm, 'right'), ('Owed', 174 * mm, 'right')])
+        for levy in levies:
+            page.row([
+                levy['date'].strftime('%d %b %Y'), _clip(levy['event'], 50), _money(levy['amount']),
+                _money(levy['amount_paid']), _money(max(0, levy['amount'] - levy['amount_paid'])),
+            ])
+        page.end_table()
+    else:
+        page.text('No levies assessed this year.', size=9)
+        page.space()
+
+    receipts = statement['receipts']
+    page.text('Receipts', size=11, bold=True)
+    if receipts:
+        page.table([('Date', 0, 'left'), ('Receipt', 24 * mm, 'left'), ('Type', 62 * mm, 'left'),
+                    ('Details', 94 * mm, 'left'), ('Amount', 174 * mm, 'right')])
+        for receipt in receipts:
+            page.row([
+                receipt['date'].strftime('%d %b %Y'), receipt['receipt_number'], receipt['type'],
+                _clip(receipt['details'], 40), _money(receipt['amount']),
+            ])
+        page.end_table()
+        page.pair('Total received', _money(sum(receipt['amount'] for receipt in receipts)))
+    else:
+        page.text('No receipts this year.', size=9)
+
+    return page.finish()
+
+
+def render_receipt(receipt):
+    """
+    Printable copy of one receipt. receipt is the dict built by
+    welfare.receipt_pdfs.receipt_fields().
+    """
+    page = _Page(f"Receipt {receipt['receipt_number']}")
+    _church_heading(page, receipt['church'])
+
+    page.text(f"Receipt {receipt['receipt_number']}", size=13, bold=True)
+    page.space(0.5)
+    page.pair('Date', receipt['date'].strftime('%d %b %Y'))
+    page.pair('Received from', receipt['member_name'])
+    page.pair('Phone number', receipt['member_phone'])
+    page.pair('Payment for', f"{receipt['type']} ({receipt['year']})")
+    if receipt['event']:
+        page.pair('Event', _clip(receipt['event'], 45))
+    page.space(0.5)
+    page.text(f"Amount received: {_money(receipt['amount'])}", size=12, bold=True)
+    if receipt['details']:
+        page.text(f"Details: {_clip(receipt['details'], 90)}", size=9)
+    page.space()
+    page.text(f"Recorded by {receipt['recorded_by']}", size=9)
+    return page.finish()
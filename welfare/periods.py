@@ -0,0 +1,58 @@
+import datetime
+
+from django.db.models import Q
+
+
+# Years Period.year() can represent; the last one must end on a valid date
+YEARS = range(datetime.MINYEAR, datetime.MAXYEAR)
+YEAR_RANGE_ERROR = f'year must be between {YEARS.start} and {YEARS.stop - 1}'
+
+
+class Period:
+    """
+    A half-open date range [start, end). Filtering with q() compiles to
+    plain date >= start AND date < end comparisons, which can use an index
+    on the date column, unlike __year / __month lookups that wrap the
+    column in EXTRACT() / strftime().
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def year(cls, year):
+        return cls(datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1))
+
+    @classmethod
+    def month(cls, year, month):
+        if month == 12:
+            return cls(datetime.date(year, 12, 1), datetime.date(year + 1, 1, 1))
+        return cls(datetime.date(year, month, 1), datetime.date(year, month + 1, 1))
+
+    @classmethod
+    def quarter(cls, year, quarter):
+        first_month = 3 * (quarter - 1) + 1
+        start = datetime.date(year, first_month, 1)
+        if quarter == 4:
+            return cls(start, datetime.date(year + 1, 1, 1))
+        return cls(start, datetime.date(year, first_month + 3, 1))
+
+    @classmethod
+    def between(cls, first_day, last_day):
+        """
+        Range covering first_day through last_day inclusive
+        """
+        return cls(first_day, last_day + datetime.timedelta(days=1))
+
+    def q(self, date_field):
+        return Q(**{f'{date_field}__gte': self.start, f'{date_field}__lt': self.end})
+
+    def __contains__(self, date):
+        return self.start <= date < self.end
+
+    def __eq__(self, other):
+        return isinstance(other, Period) and (self.start, self.end) == (other.start, other.end)
+
+    def __repr__(self):
+        return f"Period({self.start.isoformat()}, {self.end.isoformat()})"
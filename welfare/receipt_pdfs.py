@@ -0,0 +1,176 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+
+from .pdfs import render_receipt
+
+
+# Bump when the layout in welfare/pdfs.py changes so cached copies are redrawn
+RECEIPT_PDF_LAYOUT = 1
+
+# Eviction trims the cache to this share of its byte limit, so it does not
+# run again on the very next write
+EVICT_TO = 0.9
+
+
+def receipt_fields(receipt):
+    """
+    Everything printed on a receipt, as plain values. Expects member,
+    church, related_event and created_by to be loaded with the receipt.
+    """
+    church = receipt.church
+    event = receipt.related_event
+    return {
+        'church': {'name': church.name, 'welfare_name': church.welfare_name, 'location': church.location},
+        'receipt_number': receipt.receipt_number,
+        'date': receipt.date,
+        'member_name': receipt.member.full_name,
+        'member_phone': receipt.member.phone_number,
+        'type': receipt.get_receipt_type_display(),
+        'year': receipt.year,
+        'amount': receipt.amount,
+        'details': receipt.details,
+        'event': f"{event.get_event_type_display()} - {event.description}" if event else '',
+        'recorded_by': receipt.created_by.name,
+    }
+
+
+def fields_digest(fields):
+    """
+    Hash of the printed fields and the layout version: changes whenever the
+    printed copy would
+    """
+    payload = json.dumps([RECEIPT_PDF_LAYOUT, fields], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class ReceiptPdfCache:
+    """
+    Rendered receipt PDFs on disk, one file per receipt named
+    <receipt id>-<fields digest>.pdf, so an edited receipt misses the cache.
+    Files are touched when served and the least recently used are deleted
+    once the directory grows past max_bytes; the old copy of an edited
+    receipt is never served again, so it ages out the same way.
+
+    Each process keeps a running estimate of the directory size (one scan
+    on its first write, then the bytes it wrote) and only rescans the
+    directory when the estimate passes max_bytes. Writes from other worker
+    processes are therefore seen at the next rescan, and the directory can
+    briefly exceed the limit by what they wrote in between.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.estimated_bytes = None
+
+    def path(self, receipt_id, digest):
+        return os.path.join(self.directory, f'{receipt_id}-{digest}.pdf')
+
+    def get(self, receipt_id, digest):
+        """
+        The cached copy opened for reading and marked as just used, or None
+        """
+        path = self.path(receipt_id, digest)
+        try:
+            pdf_file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since; the open file is still readable
+            pass
+        return pdf_file
+
+    def put(self, receipt_id, digest, pdf):
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Written under a temporary name and renamed, so a concurrent reader
+        # never sees a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(pdf)
+            os.replace(temp_path, self.path(receipt_id, digest))
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        if self.estimated_bytes is None:
+            self.estimated_bytes = self._directory_size()
+        else:
+            self.estimated_bytes += len(pdf)
+        if self.estimated_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        # [(mtime, size, path), ...] of the cached PDFs
+        with os.scandir(self.directory) as entries:
+            rows = []
+            for entry in entries:
+                if not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                rows.append((stat.st_mtime, stat.st_size, entry.path))
+            return rows
+
+    def _directory_size(self):
+        return sum(size for mtime, size, path in self._entries())
+
+    def evict(self):
+        """
+        Delete the least recently served PDFs until the cache is back under
+        EVICT_TO of max_bytes. Returns the number of files deleted.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for mtime, size, path in entries)
+        target = self.max_bytes * EVICT_TO
+        deleted = 0
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+            deleted += 1
+        self.estimated_bytes = total
+        return deleted
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_cache = None
+
+
+def receipt_pdf_cache():
+    global _cache
+    if _cache is None:
+        _cache = ReceiptPdfCache(settings.RECEIPT_PDF_CACHE_DIR, settings.RECEIPT_PDF_CACHE_MAX_BYTES)
+    return _cache
+
+
+def cached_receipt_pdf(receipt_id, fields, digest):
+    """
+    Printable copy of a receipt with the given receipt_fields() and
+    fields_digest() as a binary file object, rendered into the cache on a
+    miss
+    """
+    cache = receipt_pdf_cache()
+    pdf_file = cache.get(receipt_id, digest)
+    if pdf_file is None:
+        pdf = render_receipt(fields)
+        cache.put(receipt_id, digest, pdf)
+        pdf_file = io.BytesIO(pdf)
+    return pdf_file
@@ -0,0 +1,197 @@
+import functools
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+# Seconds a cached report is served as fresh, then how much longer it may
+# be served stale while one request recomputes it in the background
+REPORT_CACHE_TIMEOUT = 60
+REPORT_CACHE_STALE = 300
+
+CACHE_OUTCOMES = ('hit', 'stale', 'miss')
+
+# Names of the views wrapped with cached_report, for cache_stats()
+cached_endpoints = []
+
+
+def _version_key(church_id):
+    return f'welfare:report-version:{church_id}'
+
+
+def church_version(church_id):
+    """
+    Current cache version of a church's reports. Seeded from the clock so a
+    version key that was evicted never comes back with a number that older
+    cached reports were stored under.
+    """
+    return cache.get_or_set(_version_key(church_id), time.time_ns(), None)
+
+
+def bump_church_version(church_id):
+    key = _version_key(church_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_church_reports(church_id):
+    """
+    Drop every cached report of a church once the current transaction
+    commits, so a report recomputed meanwhile cannot be cached under the new
+    version with the old data
+    """
+    transaction.on_commit(lambda: bump_church_version(church_id))
+
+
+def _record(endpoint, outcome):
+    key = f'welfare:report-stats:{endpoint}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cache_stats():
+    """
+    Hit / stale / miss counts per cached endpoint. With a per-process
+    backend such as LocMemCache these cover the current process only.
+    """
+    keys = {
+        f'welfare:report-stats:{endpoint}:{outcome}': (endpoint, outcome)
+        for endpoint in cached_endpoints
+        for outcome in CACHE_OUTCOMES
+    }
+    counts = cache.get_many(list(keys))
+    stats = {endpoint: dict.fromkeys(CACHE_OUTCOMES, 0) for endpoint in cached_endpoints}
+    for key, (endpoint, outcome) in keys.items():
+        stats[endpoint][outcome] = counts.get(key, 0)
+    return stats
+
+
+def _cache_key(request, endpoint, per_user):
+    church_id = request.user.church_id
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+    )
+    digest = hashlib.md5(urlencode(params).encode()).hexdigest()
+    user = request.user.pk if per_user else '-'
+    return f'welfare:report:{church_id}:{church_version(church_id)}:{endpoint}:{user}:{digest}'
+
+
+class _RefreshRequest(HttpRequest):
+    """
+    GET request rebuilt from plain values for a background refresh, carrying
+    the scheme and host of the original so absolute links come out the same
+    """
+
+    def __init__(self, scheme, host, path, query_string):
+        super().__init__()
+        self.method = 'GET'
+        self.path = self.path_info = path
+        self.GET = QueryDict(query_string)
+        self.META['QUERY_STRING'] = query_string
+        self._scheme = scheme
+        self._host = host
+
+    def _get_scheme(self):
+        return self._scheme
+
+    def get_host(self):
+        return self._host
+
+
+def _refresh_values(request):
+    """
+    What a background refresh needs to recompute a report. The request
+    itself belongs to the thread serving it and is not handed over.
+    """
+    return {
+        'church_id': request.user.church_id,
+        'user_id': request.user.pk,
+        'scheme': request.scheme,
+        'host': request.get_host(),
+        'path': request.path,
+        'query_string': request.query_params.urlencode(),
+    }
+
+
+def _refresh_request(church_id, user_id, scheme, host, path, query_string):
+    """
+    DRF request for the refresh, or None when the user is gone or no
+    longer belongs to the church the report was cached for
+    """
+    user = get_user_model().objects.select_related('church').filter(pk=user_id).first()
+    if user is None or user.church_id != church_id:
+        return None
+    request = Request(_RefreshRequest(scheme, host, path, query_string))
+    request.user = user
+    return request
+
+
+def cached_report(timeout=REPORT_CACHE_TIMEOUT, stale=REPORT_CACHE_STALE, per_user=False):
+    """
+    Cache a report view's response data per church, endpoint and query
+    string (and per user with per_user=True, for the member self-service
+    reports). Place it under @api_view so it receives the DRF request.
+
+    Entries are keyed by the church's cache version, which the model signals
+    bump on every write, so a write is visible on the next request. Once an
+    entry is older than timeout it is still returned for up to stale more
+    seconds while a single background thread recomputes it, from the user,
+    church and query string of the request that found it stale.
+    """
+    def decorator(view_func):
+        endpoint = view_func.__name__
+        cached_endpoints.append(endpoint)
+
+        def store(key, response):
+            if response.status_code == 200:
+                cache.set(key, (time.time() + timeout, response.data), timeout + stale)
+
+        def refresh(key, values, args, kwargs):
+            try:
+                request = _refresh_request(**values)
+                if request is not None:
+                    store(key, view_func(request, *args, **kwargs))
+            finally:
+                connections.close_all()
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            key = _cache_key(request, endpoint, per_user)
+            entry = cache.get(key)
+            if entry is not None:
+                fresh_until, data = entry
+                if time.time() < fresh_until:
+                    _record(endpoint, 'hit')
+                    return Response(data)
+                _record(endpoint, 'stale')
+                # Only the first request to see the stale entry recomputes it
+                if cache.add(f'{key}:refreshing', True, timeout):
+                    threading.Thread(
+                        target=refresh, args=(key, _refresh_values(request), args, kwargs), daemon=True
+                    ).start()
+                return Response(data)
+
+            _record(endpoint, 'miss')
+            response = view_func(request, *args, **kwargs)
+            store(key, response)
+            return response
+
+        return wrapper
+    return decorator
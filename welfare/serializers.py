@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db.models import Sum
 from .models import *
 
 
@@ -132,6 +133,11 @@ class LoginSerializer(serializers.Serializer):
             else:
                 auto_password = "123456"
             
+            # Users created by a bulk import get their password hashed on first login
+            if user.password == CustomUser.IMPORTED_PASSWORD:
+                user.set_password(auto_password)
+                user.save(update_fields=['password'])
+            
             # Authenticate with auto-generated password
             auth_user = authenticate(phone_number=phone_number, password=auto_password)
             if auth_user:
@@ -148,16 +154,39 @@ class LoginSerializer(serializers.Serializer):
 class MemberSerializer(serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     church_name = serializers.CharField(source='church.name', read_only=True)
+    outstanding = serializers.SerializerMethodField()
 
     class Meta:
         model = Member
         fields = [
             'id', 'church', 'church_name', 'user', 'user_details', 'full_name', 
             'phone_number', 'gender', 'status', 'location', 'date_joined',
-            'created_at', 'updated_at'
+            'created_at', 'updated_at', 'outstanding'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'user', 'church']  # Add 'church' here
 
+    def get_outstanding(self, obj):
+        # Only present when the member list is requested with ?arrears_year=
+        outstanding = getattr(obj, 'outstanding', None)
+        return float(outstanding) if outstanding is not None else None
+
+
+
+class DefaulterSerializer(serializers.ModelSerializer):
+    # Annotated from the member's balance for the requested year
+    expected = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    paid_dues = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    outstanding = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    last_payment_date = serializers.DateField(read_only=True)
+
+    class Meta:
+        model = Member
+        fields = [
+            'id', 'full_name', 'phone_number', 'gender', 'location', 'date_joined',
+            'expected', 'paid_dues', 'outstanding', 'last_payment_date'
+        ]
+        read_only_fields = fields
+
 
 
 # serializers.py - Updated versions
@@ -166,15 +195,16 @@ class ReceiptSerializer(serializers.ModelSerializer):
     member_name = serializers.CharField(source='member.full_name', read_only=True)
     receipt_type_display = serializers.CharField(source='get_receipt_type_display', read_only=True)
     created_by_name = serializers.CharField(source='created_by.name', read_only=True)
+    event_description = serializers.CharField(source='related_event.description', read_only=True)
 
     class Meta:
         model = Receipt
         fields = [
             'id', 'receipt_number', 'member', 'member_name', 'date', 'receipt_type',
-            'receipt_type_display', 'amount', 'year', 'details', 'created_by',
-            'created_by_name', 'created_at'
+            'receipt_type_display', 'amount', 'year', 'details', 'related_event',
+            'event_description', 'created_by', 'created_by_name', 'created_at'
         ]
-        read_only_fields = ['id', 'receipt_number', 'created_at', 'created_by', 'created_by_name', 'member_name', 'receipt_type_display']
+        read_only_fields = ['id', 'receipt_number', 'created_at', 'created_by', 'created_by_name', 'member_name', 'receipt_type_display', 'event_description']
         
         # Frontend only needs to send these:
         # - member (ID)
@@ -183,21 +213,68 @@ class ReceiptSerializer(serializers.ModelSerializer):
         # - amount
         # - year
         # - details
+        # - related_event (ID, optional, transport levies only)
+
+    def validate(self, data):
+        member = data.get('member', getattr(self.instance, 'member', None))
+        receipt_type = data.get('receipt_type', getattr(self.instance, 'receipt_type', None))
+        related_event = data.get('related_event', getattr(self.instance, 'related_event', None))
+        if related_event is not None:
+            if receipt_type != 'transport_levy':
+                raise serializers.ValidationError({'related_event': "Only transport levy receipts can be linked to an event."})
+            if member is not None and related_event.church_id != member.church_id:
+                raise serializers.ValidationError({'related_event': "Event not found in the member's church."})
+        return data
+
+class BulkReceiptItemSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk receipt post. Members and events are resolved from the
+    context['members'] and context['events'] maps (id -> Member / Event of
+    the caller's church) that the view loads for the whole batch in one
+    query each.
+    """
+    member = serializers.IntegerField()
+    related_event = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Receipt
+        fields = ['member', 'date', 'receipt_type', 'amount', 'year', 'details', 'related_event']
+
+    def validate_member(self, value):
+        member = self.context['members'].get(value)
+        if member is None:
+            raise serializers.ValidationError("Member not found in your church.")
+        return member
+
+    def validate_related_event(self, value):
+        if value is None:
+            return None
+        event = self.context['events'].get(value)
+        if event is None:
+            raise serializers.ValidationError("Event not found in the member's church.")
+        return event
+
+    def validate(self, data):
+        if data.get('related_event') is not None and data.get('receipt_type') != 'transport_levy':
+            raise serializers.ValidationError({'related_event': "Only transport levy receipts can be linked to an event."})
+        return data
+
 
 class EventSerializer(serializers.ModelSerializer):
     member_name = serializers.CharField(source='member.full_name', read_only=True)
     event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
     created_by_name = serializers.CharField(source='created_by.name', read_only=True)
     church_name = serializers.CharField(source='church.name', read_only=True)
+    levy_collected = serializers.SerializerMethodField()
 
     class Meta:
         model = Event
         fields = [
             'id', 'church', 'church_name', 'event_type', 'event_type_display', 'member',
             'member_name', 'event_date', 'venue', 'description', 'levy_amount',
-            'is_levy_paid', 'created_by', 'created_by_name', 'created_at', 'updated_at'
+            'levy_collected', 'is_levy_paid', 'created_by', 'created_by_name', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'church', 'church_name', 'created_at', 'updated_at', 'created_by', 'created_by_name', 'member_name', 'event_type_display']
+        read_only_fields = ['id', 'church', 'church_name', 'created_at', 'updated_at', 'created_by', 'created_by_name', 'member_name', 'event_type_display', 'levy_collected']
         
         # Frontend only needs to send these:
         # - event_type
@@ -208,6 +285,16 @@ class EventSerializer(serializers.ModelSerializer):
         # - levy_amount
         # - is_levy_paid
 
+    def get_levy_collected(self, obj):
+        """
+        Transport levies received against the event. List views annotate it
+        with with_levy_collected(); a single saved event is summed here.
+        """
+        collected = getattr(obj, 'levy_collected', None)
+        if collected is None:
+            collected = obj.levy_receipts.aggregate(total=Sum('amount'))['total']
+        return float(collected or 0)
+
 class PaymentSerializer(serializers.ModelSerializer):
     beneficiary_name = serializers.CharField(source='beneficiary_member.full_name', read_only=True)
     payment_type_display = serializers.CharField(source='get_payment_type_display', read_only=True)
@@ -255,4 +342,18 @@ class YearlyDuesSerializer(serializers.ModelSerializer):
             'id', 'church', 'church_name', 'year', 'monthly_amount',
             'created_by', 'created_by_name', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by', 'created_by_name']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by', 'created_by_name']
+
+class LevyObligationSerializer(serializers.ModelSerializer):
+    member_name = serializers.CharField(source='member.full_name', read_only=True)
+    event_description = serializers.CharField(source='event.description', read_only=True)
+    event_date = serializers.DateField(source='event.event_date', read_only=True)
+    outstanding = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = LevyObligation
+        fields = [
+            'id', 'event', 'event_description', 'event_date', 'member', 'member_name',
+            'amount', 'amount_paid', 'outstanding', 'settled', 'created_at'
+        ]
+        read_only_fields = fields
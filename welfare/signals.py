@@ -0,0 +1,254 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .activity import record_activity
+from .balances import apply_yearly_dues, open_member_balances, refresh_balance
+from .ledger import ledger_entry, record_change, stored_entry
+from .levies import settle_levy
+from .models import Church, Event, Member, Payment, Receipt, YearlyDues
+from .report_cache import invalidate_church_reports
+from .snapshots import invalidate_snapshots
+
+
+def deleted_with(origin, *models):
+    """
+    True when a delete cascades from an instance or queryset of one of models,
+    whose own cascade already removes the derived rows
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model in models
+    return isinstance(origin, models)
+
+
+@receiver(pre_save, sender=Receipt)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Event)
+def remember_ledger_entry(sender, instance, raw=False, **kwargs):
+    """
+    Capture the bucket the row currently counts towards so an edit can move
+    its amount out of the old month / type
+    """
+    if raw:
+        return
+    instance._ledger_previous = stored_entry(sender, instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Event)
+def update_ledger_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(getattr(instance, '_ledger_previous', None), ledger_entry(instance))
+
+
+@receiver(post_delete, sender=Receipt)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Event)
+def update_ledger_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church):
+        return
+    record_change(ledger_entry(instance), None)
+
+
+@receiver(pre_save, sender=Receipt)
+def remember_balance_year(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._balance_previous = None
+    instance._levy_previous = None
+    if instance.pk:
+        previous = Receipt.objects.filter(pk=instance.pk).values_list('member_id', 'year', 'related_event_id').first()
+        if previous is not None:
+            member_id, year, related_event_id = previous
+            instance._balance_previous = (member_id, year)
+            instance._levy_previous = (related_event_id, member_id)
+
+
+@receiver(post_save, sender=Receipt)
+def update_balance_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.member_id, instance.year)
+    previous = getattr(instance, '_balance_previous', None)
+    refresh_balance(*current)
+    if previous and previous != current:
+        refresh_balance(*previous)
+
+
+@receiver(post_delete, sender=Receipt)
+def update_balance_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church, Member):
+        return
+    refresh_balance(instance.member_id, instance.year)
+
+
+@receiver(post_save, sender=Receipt)
+def settle_levy_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.related_event_id, instance.member_id)
+    previous = getattr(instance, '_levy_previous', None)
+    settle_levy(*current)
+    if previous and previous != current:
+        settle_levy(*previous)
+
+
+@receiver(post_delete, sender=Receipt)
+def settle_levy_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church, Member, Event):
+        return
+    settle_levy(instance.related_event_id, instance.member_id)
+
+
+@receiver(pre_save, sender=YearlyDues)
+def remember_dues_year(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._dues_previous_year = None
+    if instance.pk:
+        instance._dues_previous_year = YearlyDues.objects.filter(pk=instance.pk).values_list('year', flat=True).first()
+
+
+@receiver(post_save, sender=YearlyDues)
+def update_balances_on_dues_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    apply_yearly_dues(instance.church_id, instance.year)
+    previous_year = getattr(instance, '_dues_previous_year', None)
+    if previous_year is not None and previous_year != instance.year:
+        apply_yearly_dues(instance.church_id, previous_year)
+
+
+@receiver(post_delete, sender=YearlyDues)
+def update_balances_on_dues_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church):
+        return
+    apply_yearly_dues(instance.church_id, instance.year)
+
+
+@receiver(post_save, sender=Member)
+def open_balances_on_member_create(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        open_member_balances(instance)
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Member)
+@receiver(post_save, sender=YearlyDues)
+@receiver(post_delete, sender=Receipt)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Member)
+@receiver(post_delete, sender=YearlyDues)
+def invalidate_reports(sender, instance, **kwargs):
+    invalidate_church_reports(instance.church_id)
+
+
+def snapshot_years(instance):
+    """
+    Years whose closed-year reports a Receipt, Payment or Event counts
+    towards: the year of its date and, for receipts, the year paid for and
+    the year of the event a levy was paid for
+    """
+    church_id, date, entry_kind, entry_type, amount = ledger_entry(instance)
+    years = {date.year}
+    if isinstance(instance, Receipt):
+        years.add(instance.year)
+        if instance.related_event_id is not None:
+            # Looked up rather than followed: in a cascade the event may already be gone
+            event_date = Event.objects.filter(pk=instance.related_event_id).values_list('event_date', flat=True).first()
+            if event_date is not None:
+                years.add(event_date.year)
+    return years
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Event)
+def invalidate_snapshots_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    years = snapshot_years(instance)
+    # An edit may also move the row out of a closed year
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        years.add(previous[1].year)
+    balance_previous = getattr(instance, '_balance_previous', None)
+    if balance_previous is not None:
+        years.add(balance_previous[1])
+    invalidate_snapshots(instance.church_id, years)
+
+
+@receiver(post_delete, sender=Receipt)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Event)
+def invalidate_snapshots_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church):
+        return
+    invalidate_snapshots(instance.church_id, snapshot_years(instance))
+
+
+@receiver(post_save, sender=YearlyDues)
+def invalidate_snapshots_on_dues_save(sender, instance, raw=False, **kwargs):
+    # The year's dues set what its members are expected to have paid
+    if raw:
+        return
+    invalidate_snapshots(instance.church_id, {instance.year, getattr(instance, '_dues_previous_year', None)})
+
+
+@receiver(post_delete, sender=YearlyDues)
+def invalidate_snapshots_on_dues_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church):
+        return
+    invalidate_snapshots(instance.church_id, {instance.year})
+
+
+@receiver(pre_save, sender=Member)
+def remember_member_status(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._status_previous = None
+    if instance.pk:
+        instance._status_previous = Member.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Member)
+def invalidate_snapshots_on_member_save(sender, instance, created=False, raw=False, **kwargs):
+    # The reports count the church's active members as of today, whatever the year
+    if raw:
+        return
+    if created or instance.status != getattr(instance, '_status_previous', None):
+        invalidate_snapshots(instance.church_id)
+
+
+@receiver(post_delete, sender=Member)
+def invalidate_snapshots_on_member_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Church):
+        return
+    invalidate_snapshots(instance.church_id)
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Member)
+def record_activity_on_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    record_activity(instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Receipt)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Member)
+def record_activity_on_delete(sender, instance, origin=None, **kwargs):
+    # A removed member is one entry, not one per receipt and event it takes with it
+    if deleted_with(origin, Church) or (sender is not Member and deleted_with(origin, Member)):
+        return
+    record_activity(instance, 'deleted')
+
@@ -0,0 +1,116 @@
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Member, MemberYearBalance
+
+
+# (label, fewest, most) months of dues a member is projected to leave unpaid
+SHORTFALL_BUCKETS = [
+    ('0', 0, 0),
+    ('1-3', 1, 3),
+    ('4-6', 4, 6),
+    ('7-12', 7, 12),
+]
+
+
+def payment_history(church, years):
+    """
+    Per active member of church, over the given past years: the share of the
+    dues asked that they paid (capped at 1) and the dues they paid per year.
+    Members with no balance in those years get the church's mean share and
+    median yearly payment. Returns (shares, yearly_paid, members_without_history).
+    """
+    member_ids = list(Member.objects.filter(church=church, status='active').values_list('id', flat=True))
+    rows = list(
+        MemberYearBalance.objects.filter(
+            member__church=church, member__status='active', year__in=years, expected__gt=0
+        )
+        .order_by()
+        .values_list('member_id', Cast('expected', FloatField()), Cast('paid_dues', FloatField()))
+    )
+    members = np.sort(np.array(member_ids, dtype=np.int64))
+    if not len(members):
+        return np.zeros(0), np.zeros(0), 0
+
+    balance_members, expected, paid = zip(*rows) if rows else ((), (), ())
+    index = np.searchsorted(members, np.array(balance_members, dtype=np.int64))
+    expected = np.bincount(index, weights=np.array(expected, dtype=np.float64), minlength=len(members))
+    paid = np.bincount(index, weights=np.array(paid, dtype=np.float64), minlength=len(members))
+    year_count = np.bincount(index, minlength=len(members))
+
+    has_history = year_count > 0
+    shares = np.zeros(len(members))
+    yearly_paid = np.zeros(len(members))
+    shares[has_history] = np.minimum(1, paid[has_history] / expected[has_history])
+    yearly_paid[has_history] = paid[has_history] / year_count[has_history]
+    if has_history.any():
+        shares[~has_history] = shares[has_history].mean()
+        yearly_paid[~has_history] = np.median(yearly_paid[has_history])
+    return shares, yearly_paid, int(np.count_nonzero(~has_history))
+
+
+def simulate_dues(church, monthly_amounts, history_years=3, today=None):
+    """
+    Project a year of dues income at each candidate monthly amount from how
+    the church's active members paid over the last history_years closed
+    years. All amounts are evaluated at once on a (amounts × members) array.
+
+    A member is projected to pay the larger of their historical share of the
+    new yearly ask and what they paid per year before, up to the ask: a
+    member who paid 100 a year still covers an ask of 90, and one who
+    paid half of what was asked pays half of a higher ask.
+    """
+    today = today or timezone.now().date()
+    years = list(range(today.year - history_years, today.year))
+    shares, yearly_paid, without_history = payment_history(church, years)
+
+    amounts = np.array([float(amount) for amount in monthly_amounts])
+    asked = 12 * amounts[:, np.newaxis]
+    projected = np.minimum(asked, np.maximum(shares * asked, yearly_paid))
+    shortfall = asked - projected
+    # Whole months left unpaid, with a cent of tolerance for float rounding
+    months_unpaid = np.ceil(np.round(shortfall / amounts[:, np.newaxis], 2))
+
+    # Every figure reduced over the member axis for all amounts at once
+    member_count = len(shares)
+    expected_income = asked[:, 0] * member_count
+    projected_income = projected.sum(axis=1)
+    collection_rate = np.divide(
+        projected_income * 100, expected_income, out=np.zeros(len(amounts)), where=expected_income > 0
+    )
+    compliant = np.count_nonzero(months_unpaid == 0, axis=1)
+    total_shortfall = shortfall.sum(axis=1)
+    if member_count:
+        median_shortfall = np.median(shortfall, axis=1)
+        p90_shortfall = np.percentile(shortfall, 90, axis=1)
+    else:
+        median_shortfall = p90_shortfall = np.zeros(len(amounts))
+    bucket_counts = {
+        label: np.count_nonzero((months_unpaid >= fewest) & (months_unpaid <= most), axis=1)
+        for label, fewest, most in SHORTFALL_BUCKETS
+    }
+
+    scenarios = []
+    for row, amount in enumerate(monthly_amounts):
+        scenarios.append({
+            'monthly_amount': float(amount),
+            'expected_income': round(float(expected_income[row]), 2),
+            'projected_income': round(float(projected_income[row]), 2),
+            'collection_rate': round(float(collection_rate[row]), 1),
+            'expected_compliance': round(float(compliant[row]) / member_count * 100, 1) if member_count else 0,
+            'shortfall': {
+                'total': round(float(total_shortfall[row]), 2),
+                'median': round(float(median_shortfall[row]), 2),
+                'p90': round(float(p90_shortfall[row]), 2),
+                'months_unpaid': {label: int(counts[row]) for label, counts in bucket_counts.items()},
+            },
+        })
+
+    return {
+        'history_years': years,
+        'active_members': member_count,
+        'members_without_history': without_history,
+        'scenarios': scenarios,
+    }
@@ -0,0 +1,117 @@
+import copy
+import functools
+import json
+
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import ReportSnapshot
+
+
+def _requested_past_year(request):
+    year = request.query_params.get('year', '')
+    if year.isdigit() and int(year) < timezone.now().year:
+        return int(year)
+    return None
+
+
+# report name -> function(church) returning the report's fields about the
+# current date, which a closed year cannot hold
+live_fields = {}
+
+# report name -> the report view without its decorators, which close_year
+# runs so neither the report cache nor an earlier snapshot answers it
+report_views = {}
+
+
+def snapshot_report(live=None):
+    """
+    Serve a report for a past year (?year=) from its ReportSnapshot when the
+    church has closed that year, instead of recomputing it. Place it under
+    @api_view (and under @cached_report).
+
+    live(church) computes the report's fields about the current month
+    (current month totals, growth over last month). They are left out of
+    the snapshot and recomputed on every snapshot hit, so the frozen
+    payload only holds figures that lie wholly inside the closed year.
+    """
+    def decorator(view_func):
+        report = view_func.__name__
+        report_views[report] = view_func
+        if live is not None:
+            live_fields[report] = live
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            year = _requested_past_year(request) if request.user.is_authenticated else None
+            if year is not None:
+                payload = (
+                    ReportSnapshot.objects.filter(church_id=request.user.church_id, year=year, report=report)
+                    .values_list('payload', flat=True)
+                    .first()
+                )
+                if payload is not None:
+                    if live is not None:
+                        payload.update(live(request.user.church))
+                    return Response(payload)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def close_year(request, year, reports):
+    """
+    Freeze the named @snapshot_report reports for the requesting user's
+    church and year. Each report is computed afresh, bypassing the report
+    cache, on a copy of the request carrying only ?year=, and its payload,
+    less the report's live fields, replaces any earlier snapshot.
+
+    Returns the names of the reports frozen.
+    """
+    church = request.user.church
+    year_request = copy.copy(request._request)
+    year_request.method = 'GET'
+    year_request.GET = QueryDict(mutable=True)
+    year_request.GET['year'] = str(year)
+    year_request = Request(year_request)
+    year_request.user = request.user
+
+    frozen = []
+    with transaction.atomic():
+        ReportSnapshot.objects.filter(church=church, year=year, report__in=reports).delete()
+        for name in reports:
+            response = report_views[name](year_request)
+            if response.status_code != 200:
+                continue
+            # Store exactly what the API renders (Decimals as numbers, dates as ISO strings)
+            payload = json.loads(JSONRenderer().render(response.data))
+            if name in live_fields:
+                for field in live_fields[name](church):
+                    payload.pop(field, None)
+            ReportSnapshot.objects.create(
+                church=church, year=year, report=name, payload=payload, created_by=request.user
+            )
+            frozen.append(name)
+    return frozen
+
+
+def invalidate_snapshots(church_id, years=None):
+    """
+    Delete the snapshots of a church's closed years among years, after a
+    back-dated row for one of them was written, or of every closed year
+    when years is None (a change to the church's active members, which the
+    reports count as of today). Only past years can be closed, so writes to
+    the current year cost no query.
+    """
+    if years is None:
+        ReportSnapshot.objects.filter(church_id=church_id).delete()
+        return
+    current_year = timezone.now().year
+    past_years = {year for year in years if year is not None and year < current_year}
+    if past_years:
+        ReportSnapshot.objects.filter(church_id=church_id, year__in=past_years).delete()
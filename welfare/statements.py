@@ -0,0 +1,196 @@
+import datetime
+import itertools
+import logging
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Church, Event, LevyObligation, Member, MemberYearBalance, Receipt, StatementBatch
+from .pdfs import render_statement
+from .periods import Period
+
+
+# Statements handed to a worker per task; big enough that pickling each
+# task costs little next to rendering it
+STATEMENTS_PER_TASK = 25
+
+# A batch still running this long after it started has lost the thread
+# rendering it (the server was restarted or killed) and may be queued again
+STALE_BATCH_AFTER = datetime.timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+
+def _grouped(rows):
+    # member_id -> [row, ...] of rows ordered by member_id
+    return {member_id: list(group) for member_id, group in itertools.groupby(rows, key=lambda row: row['member_id'])}
+
+
+def statement_rows(church, year):
+    """
+    The data of every statement for church and year as plain dicts, in
+    member id order: the church's active members plus anyone else with a
+    balance for the year. Receipts, balances and levy obligations are each
+    fetched with one query ordered by member and grouped in memory.
+    """
+    church_row = {'name': church.name, 'welfare_name': church.welfare_name, 'location': church.location}
+    members = (
+        Member.objects.filter(church=church)
+        .filter(Q(status='active') | Q(year_balances__year=year))
+        .distinct()
+        .order_by('id')
+        .values('id', 'full_name', 'phone_number', 'status')
+    )
+    receipt_types = dict(Receipt.RECEIPT_TYPES)
+    receipts = _grouped(
+        Receipt.objects.filter(church=church, year=year)
+        .order_by('member_id', 'date', 'id')
+        .values('member_id', 'date', 'receipt_number', 'receipt_type', 'amount', 'details')
+    )
+    balances = {
+        balance['member_id']: balance
+        for balance in MemberYearBalance.objects.filter(member__church=church, year=year).values(
+            'member_id', 'expected', 'paid_dues', 'outstanding', 'paid_months'
+        )
+    }
+    event_types = dict(Event.EVENT_TYPES)
+    levies = _grouped(
+        LevyObligation.objects.filter(Period.year(year).q('event__event_date'), event__church=church)
+        .order_by('member_id', 'event__event_date', 'event_id')
+        .values(
+            'member_id', 'amount', 'amount_paid', 'event__event_date', 'event__event_type',
+            'event__description', 'event__member__full_name',
+        )
+    )
+
+    statements = []
+    for member in members:
+        balance = balances.get(member['id'])
+        statements.append({
+            'church': church_row,
+            'year': year,
+            'member': member,
+            'dues': {
+                'expected': balance['expected'] if balance else 0,
+                'paid': balance['paid_dues'] if balance else 0,
+                'outstanding': balance['outstanding'] if balance else 0,
+                'months_paid': MemberYearBalance(paid_months=balance['paid_months']).months_paid if balance else 0,
+            },
+            'levies': [
+                {
+                    'date': levy['event__event_date'],
+                    'event': f"{event_types.get(levy['event__event_type'], levy['event__event_type'])} - "
+                             f"{levy['event__description'] or levy['event__member__full_name']}",
+                    'amount': levy['amount'],
+                    'amount_paid': levy['amount_paid'],
+                }
+                for levy in levies.get(member['id'], [])
+            ],
+            'receipts': [
+                {
+                    'date': receipt['date'],
+                    'receipt_number': receipt['receipt_number'],
+                    'type': receipt_types.get(receipt['receipt_type'], receipt['receipt_type']),
+                    'details': receipt['details'],
+                    'amount': receipt['amount'],
+                }
+                for receipt in receipts.get(member['id'], [])
+            ],
+        })
+    return statements
+
+
+def statement_filename(statement):
+    member = statement['member']
+    return f"{member['id']:06d}-{slugify(member['full_name']) or 'member'}.pdf"
+
+
+def write_statements(church, year, output, workers=None):
+    """
+    Render the statement of every member (see statement_rows) and write
+    them into a zip archive on output, a path or binary file object.
+
+    The rendering is spread over a pool of worker processes (one per CPU
+    by default) while this process writes the finished PDFs in member
+    order. Workers are spawned rather than forked so they do not inherit
+    this process's database connections. Returns the number of statements.
+    """
+    statements = statement_rows(church, year)
+    workers = workers or os.cpu_count() or 1
+
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        if workers == 1 or len(statements) <= STATEMENTS_PER_TASK:
+            for statement in statements:
+                archive.writestr(statement_filename(statement), render_statement(statement))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                pdfs = pool.map(render_statement, statements, chunksize=STATEMENTS_PER_TASK)
+                for statement, pdf in zip(statements, pdfs):
+                    archive.writestr(statement_filename(statement), pdf)
+    return len(statements)
+
+
+def running_batches():
+    """
+    Batches being rendered: running and started less than
+    STALE_BATCH_AFTER ago
+    """
+    return StatementBatch.objects.filter(status='running', started_at__gte=timezone.now() - STALE_BATCH_AFTER)
+
+
+def run_statement_batch(batch_id, workers=None):
+    """
+    Render a StatementBatch into its file, recording the outcome on the
+    batch. Run in a background thread by the admin, so failures are logged
+    rather than raised. Any exception, a worker process dying included
+    (BrokenProcessPool), marks the batch failed, as does another batch of
+    the church still running. At most STATEMENT_BATCH_MAX_WORKERS processes
+    render it.
+    """
+    try:
+        church_id = StatementBatch.objects.values_list('church_id', flat=True).get(pk=batch_id)
+        with transaction.atomic():
+            # Lock the church so two of its batches cannot both start
+            Church.objects.select_for_update().get(pk=church_id)
+            batch = StatementBatch.objects.select_related('church').get(pk=batch_id)
+            batch.started_at = timezone.now()
+            batch.finished_at = None
+            if running_batches().filter(church_id=batch.church_id).exclude(pk=batch.pk).exists():
+                batch.status = 'failed'
+                batch.error = 'Another statement batch of this church is running. Render this one again once it is done.'
+                batch.finished_at = batch.started_at
+            else:
+                batch.status = 'running'
+            batch.save(update_fields=['status', 'error', 'started_at', 'finished_at'])
+        if batch.status == 'failed':
+            return
+
+        workers = min(workers or os.cpu_count() or 1, settings.STATEMENT_BATCH_MAX_WORKERS)
+        try:
+            with tempfile.TemporaryFile() as output:
+                batch.statement_count = write_statements(batch.church, batch.year, output, workers)
+                if batch.file:
+                    # Rendered again: replace the previous archive
+                    batch.file.delete(save=False)
+                batch.file.save(f'statements-{batch.church_id}-{batch.year}.zip', File(output), save=False)
+            batch.status = 'done'
+        except BaseException as exc:
+            # Including a SystemExit or KeyboardInterrupt raised in a worker,
+            # which the pool hands back as is; the batch must not stay running
+            batch.status = 'failed'
+            batch.error = str(exc) or type(exc).__name__
+            logger.exception('Statement batch %s failed', batch_id)
+        finally:
+            batch.finished_at = timezone.now()
+            batch.save(update_fields=['status', 'statement_count', 'file', 'error', 'finished_at'])
+    finally:
+        connections.close_all()
@@ -1,3 +1,1302 @@
-from django.test import TestCase
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .admin import StatementBatchAdmin
+from .exports import xlsx_response
+from .importers import _existing, import_members
+from .levies import assess_levy
+from .models import *
+from .pdfs import render_receipt
+from .periods import Period
+from .receipt_pdfs import EVICT_TO, ReceiptPdfCache
+from .report_cache import REPORT_CACHE_TIMEOUT
+from .simulations import simulate_dues
+from .statements import STALE_BATCH_AFTER, STATEMENTS_PER_TASK, run_statement_batch
+
+
+def make_church(name='Grace Chapel'):
+    church = Church.objects.create(name=name, welfare_name=f'{name} Welfare', location='Accra')
+    admin = CustomUser.objects.create_user(
+        phone_number=f'02{church.id:08d}', name='Admin', church=church, is_welfare_admin=True
+    )
+    return church, admin
+
+
+def walk(client, url, max_rows):
+    """
+    Rows of every page of a keyset paginated list, following next links,
+    then the same rows read back through the previous links. Gives up past
+    max_rows so a cursor that never ends fails instead of hanging.
+    """
+    forward = []
+    response = client.get(url).json()
+    while True:
+        forward.extend(response['results'])
+        if response['next'] is None:
+            break
+        if len(forward) > max_rows:
+            raise AssertionError(f'More than {max_rows} rows returned by {url}')
+        response = client.get(response['next']).json()
+
+    backward = []
+    while True:
+        backward[:0] = response['results']
+        if response['previous'] is None:
+            break
+        if len(backward) > max_rows:
+            raise AssertionError(f'More than {max_rows} rows returned by {url}')
+        response = client.get(response['previous']).json()
+    return forward, backward
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Pages must neither repeat nor skip rows when more rows than a page (and
+    more than DRF's old 1000 row offset cutoff) tie on the leading key
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.year = timezone.now().year
+
+        # Month-end bulk posting: every receipt on the same date
+        member = Member.objects.create(church=cls.church, full_name='Ama Mensah', phone_number='0240000000', gender='female')
+        date = datetime.date(cls.year, 1, 31)
+        Receipt.objects.bulk_create([
+            Receipt(
+                church=cls.church, member=member, date=date, receipt_type='monthly_dues', amount=10,
+                year=cls.year, receipt_number=f'GC/{i:05d}', created_by=cls.admin,
+            )
+            for i in range(1200)
+        ])
+
+        # Most defaulters owe the same amount, and many share a name
+        members = Member.objects.bulk_create([
+            Member(church=cls.church, full_name=f'Member {i % 7}', phone_number=f'05{i:08d}', gender='male')
+            for i in range(1250)
+        ])
+        MemberYearBalance.objects.bulk_create([
+            MemberYearBalance(
+                member=member, year=cls.year, expected=120,
+                outstanding=Decimal('120.00') if i >= 40 else Decimal(i + 1) / 4,
+            )
+            for i, member in enumerate(members)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assert_walk(self, url, expected_ids):
+        forward, backward = walk(self.client, url, len(expected_ids))
+        self.assertEqual([row['id'] for row in forward], expected_ids)
+        self.assertEqual([row['id'] for row in backward], expected_ids)
+
+    def test_receipts_tied_on_date(self):
+        expected = list(Receipt.objects.filter(church=self.church).order_by('-date', '-id').values_list('id', flat=True))
+        self.assert_walk('/api/receipts/?page_size=100', expected)
+
+    def test_defaulters_tied_on_amount(self):
+        members = Member.objects.filter(church=self.church, year_balances__year=self.year)
+        for ordering, order_by in [
+            ('-amount', ('-year_balances__outstanding', 'full_name', 'id')),
+            ('amount', ('year_balances__outstanding', 'full_name', 'id')),
+            ('-name', ('-full_name', '-id')),
+        ]:
+            with self.subTest(ordering=ordering):
+                expected = list(members.order_by(*order_by).values_list('id', flat=True))
+                self.assert_walk(f'/api/members/defaulters/?page_size=200&ordering={ordering}', expected)
+
+    def test_member_arrears_ordering(self):
+        expected = list(
+            Member.objects.filter(church=self.church, year_balances__year=self.year)
+            .order_by('-year_balances__outstanding', 'full_name', 'id')
+            .values_list('id', flat=True)
+        )
+        self.assert_walk(
+            f'/api/members/?page_size=150&arrears_year={self.year}&owing=true&ordering=-outstanding', expected
+        )
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/receipts/?cursor=bm90LWEtY3Vyc29y').status_code, 404)
+
+
+class ReportSnapshotTests(TestCase):
+    """
+    A closed year's insights keep the year's figures frozen but report the
+    current month live
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.member = Member.objects.create(
+            church=cls.church, full_name='Kofi Boateng', phone_number='0240000001', gender='male'
+        )
+        cls.last_year = timezone.now().year - 1
+        Receipt.objects.create(
+            member=cls.member, date=datetime.date(cls.last_year, 6, 1), receipt_type='monthly_dues',
+            amount=40, year=cls.last_year, created_by=cls.admin,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_current_month_fields_are_live(self):
+        reports = {
+            'receipts_insights': ('/api/receipts/insights/', ['current_month_total', 'monthly_growth']),
+            'payments_insights': ('/api/payments/insights/', ['monthly_surplus', 'current_month_total', 'monthly_growth']),
+            'events_insights': ('/api/events/insights/', ['current_month_events', 'levy_trend']),
+        }
+        response = self.client.post('/api/reports/close-year/', {'year': self.last_year}, format='json')
+        self.assertEqual(sorted(response.json()['reports']), sorted(reports))
+        for name, (url, fields) in reports.items():
+            payload = ReportSnapshot.objects.get(church=self.church, year=self.last_year, report=name).payload
+            for field in fields:
+                self.assertNotIn(field, payload)
+
+        # Written after the year was closed, in the current month
+        with self.captureOnCommitCallbacks(execute=True):
+            Receipt.objects.create(
+                member=self.member, date=timezone.now().date(), receipt_type='monthly_dues',
+                amount=15, year=timezone.now().year, created_by=self.admin,
+            )
+        closed = self.client.get(f'/api/receipts/insights/?year={self.last_year}').json()
+        self.assertEqual(closed['current_month_total'], 15.0)
+        self.assertEqual(closed['total_year_receipts'], 40.0)
+        for name, (url, fields) in reports.items():
+            closed = self.client.get(f'{url}?year={self.last_year}').json()
+            current = self.client.get(url).json()
+            for field in fields:
+                self.assertEqual(closed[field], current[field], (name, field))
+
+
+    def close_last_year(self):
+        response = self.client.post('/api/reports/close-year/', {'year': self.last_year}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def snapshot_count(self):
+        return ReportSnapshot.objects.filter(church=self.church, year=self.last_year).count()
+
+    def test_close_year_bypasses_report_cache(self):
+        url = f'/api/receipts/insights/?year={self.last_year}'
+        self.assertEqual(self.client.get(url).json()['total_year_receipts'], 40.0)
+        # A change the report cache is not told about
+        Receipt.objects.filter(member=self.member).update(amount=55)
+        self.close_last_year()
+        payload = ReportSnapshot.objects.get(church=self.church, year=self.last_year, report='receipts_insights').payload
+        self.assertEqual(payload['total_year_receipts'], 55.0)
+
+    def test_dues_changes_discard_the_year(self):
+        dues = YearlyDues.objects.create(church=self.church, year=self.last_year - 1, monthly_amount=10, created_by=self.admin)
+        self.close_last_year()
+        self.assertEqual(self.snapshot_count(), 3)
+
+        dues.monthly_amount = 12
+        dues.save()
+        self.assertEqual(self.snapshot_count(), 3)
+        dues.year = self.last_year
+        dues.save()
+        self.assertEqual(self.snapshot_count(), 0)
+
+        self.close_last_year()
+        dues.delete()
+        self.assertEqual(self.snapshot_count(), 0)
+
+    def test_member_status_changes_discard_snapshots(self):
+        self.close_last_year()
+        self.member.location = 'Kumasi'
+        self.member.save()
+        self.assertEqual(self.snapshot_count(), 3)
+        self.member.status = 'inactive'
+        self.member.save()
+        self.assertEqual(self.snapshot_count(), 0)
+
+        self.close_last_year()
+        Member.objects.create(church=self.church, full_name='Nana Yeboah', phone_number='0240000010', gender='male')
+        self.assertEqual(self.snapshot_count(), 0)
+
+
+class ReceiptNumberTests(TransactionTestCase):
+    """
+    Receipts saved at the same time from several connections must still get
+    distinct numbers from ReceiptSequence
+    """
+    threads = 8
+    receipts_per_thread = 10
+
+    def test_parallel_saves_get_unique_numbers(self):
+        church, admin = make_church()
+        member = Member.objects.create(church=church, full_name='Esi Owusu', phone_number='0240000002', gender='female')
+        start = threading.Barrier(self.threads)
+        errors = []
+
+        def post_receipt():
+            while True:
+                try:
+                    return Receipt.objects.create(
+                        member=member, date=datetime.date(2025, 3, 1), receipt_type='monthly_dues',
+                        amount=10, year=2025, created_by=admin,
+                    )
+                except OperationalError as exc:
+                    # SQLite's shared in-memory test database turns writers
+                    # away instead of queueing them on the lock like
+                    # PostgreSQL; the failed save rolled back, so try again
+                    if connection.vendor != 'sqlite' or 'locked' not in str(exc):
+                        raise
+                    time.sleep(0.001)
+
+        def post_receipts():
+            try:
+                start.wait()
+                for _ in range(self.receipts_per_thread):
+                    post_receipt()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=post_receipts) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        numbers = list(Receipt.objects.filter(church=church).values_list('receipt_number', flat=True))
+        total = self.threads * self.receipts_per_thread
+        self.assertEqual(len(numbers), total)
+        self.assertEqual(len(set(numbers)), total)
+        self.assertEqual(ReceiptSequence.objects.get(church=church, year=2025).last_value, total)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    The list endpoints join what their serializers read, so the number of
+    queries stays the same at 1, 10 and 500 rows
+    """
+    sizes = (1, 10, 500)
+
+    # Unpaginated list endpoint -> queries it may run at any size
+    budgets = {
+        '/api/members/': 1,
+        '/api/receipts/': 1,
+        '/api/payments/': 1,
+        '/api/events/': 1,
+        '/api/yearly-dues/': 1,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_members(self, count):
+        offset = Member.objects.count()
+        users = CustomUser.objects.bulk_create([
+            CustomUser(phone_number=f'03{offset + i:08d}', name=f'User {offset + i}', church=self.church, password='!')
+            for i in range(count)
+        ])
+        return Member.objects.bulk_create([
+            Member(
+                church=self.church, user=user, full_name=f'Member {offset + i}',
+                phone_number=f'03{offset + i:08d}', gender='female',
+            )
+            for i, user in enumerate(users)
+        ])
+
+    def add_receipts(self, count):
+        members = self.add_members(count)
+        offset = Receipt.objects.count()
+        Receipt.objects.bulk_create([
+            Receipt(
+                church=self.church, member=member, date=datetime.date(2025, 1, 1), receipt_type='monthly_dues',
+                amount=10, year=2025, receipt_number=f'QB/{offset + i}', created_by=self.admin,
+            )
+            for i, member in enumerate(members)
+        ])
+
+    def add_events(self, count):
+        members = self.add_members(count)
+        return Event.objects.bulk_create([
+            Event(
+                church=self.church, member=member, event_type='funeral', event_date=datetime.date(2025, 2, 1),
+                levy_amount=5, created_by=self.admin,
+            )
+            for member in members
+        ])
+
+    def add_payments(self, count):
+        events = self.add_events(count)
+        Payment.objects.bulk_create([
+            Payment(
+                church=self.church, payment_type='member_benefit', beneficiary_member=event.member,
+                related_event=event, payee_name='Undertaker', date=datetime.date(2025, 2, 2), amount=50,
+                created_by=self.admin,
+            )
+            for event in events
+        ])
+
+    def add_yearly_dues(self, count):
+        offset = YearlyDues.objects.count()
+        YearlyDues.objects.bulk_create([
+            YearlyDues(church=self.church, year=1000 + offset + i, monthly_amount=10, created_by=self.admin)
+            for i in range(count)
+        ])
+
+    def assert_constant(self, url, model, add_rows):
+        for size in self.sizes:
+            add_rows(size - model.objects.filter(church=self.church).count())
+            with self.subTest(url=url, rows=size), self.assertNumQueries(self.budgets[url]):
+                response = self.client.get(url)
+            self.assertEqual(len(response.json()), size)
+
+    def test_members(self):
+        self.assert_constant('/api/members/', Member, self.add_members)
+
+    def test_receipts(self):
+        self.assert_constant('/api/receipts/', Receipt, self.add_receipts)
+
+    def test_payments(self):
+        self.assert_constant('/api/payments/', Payment, self.add_payments)
+
+    def test_events(self):
+        self.assert_constant('/api/events/', Event, self.add_events)
+
+    def test_yearly_dues(self):
+        self.assert_constant('/api/yearly-dues/', YearlyDues, self.add_yearly_dues)
+
+
+class ReportIndexTests(TestCase):
+    """
+    EXPLAIN of each report query must show an index search, not a full scan
+    of the table. The test tables are tiny, so on PostgreSQL sequential scans
+    are switched off for the session; SQLite plans from the schema alone.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.member = Member.objects.create(
+            church=cls.church, full_name='Yaw Asante', phone_number='0240000003', gender='male'
+        )
+        cls.year = Period.year(2025)
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assert_uses_index(self, queryset, index_name=None):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, r'\bSCAN %s\b(?! USING)' % queryset.model._meta.db_table, plan)
+        else:
+            self.assertNotIn('Seq Scan', plan, plan)
+        if index_name:
+            self.assertIn(index_name, plan, plan)
+
+    def test_active_members(self):
+        # Active member count of the insights and simulator reports
+        self.assert_uses_index(
+            Member.objects.filter(church=self.church, status='active').order_by(), 'member_church_status_idx'
+        )
+
+    def test_member_receipts_of_type_and_year(self):
+        self.assert_uses_index(
+            Receipt.objects.filter(member=self.member, receipt_type='transport_levy', year=2025),
+            'receipt_member_type_year_idx',
+        )
+
+    def test_receipts_in_period(self):
+        self.assert_uses_index(Receipt.objects.filter(self.year.q('date'), church=self.church))
+
+    def test_payments_in_period(self):
+        self.assert_uses_index(Payment.objects.filter(self.year.q('date'), church=self.church))
+
+    def test_payments_of_type_in_period(self):
+        # Event expense total of events_insights
+        self.assert_uses_index(
+            Payment.objects.filter(self.year.q('date'), church=self.church, payment_type='event_expense'),
+            'payment_church_type_date_idx',
+        )
+
+    def test_events_in_period(self):
+        self.assert_uses_index(Event.objects.filter(self.year.q('event_date'), church=self.church))
+
+    def test_member_unpaid_levies(self):
+        # Without table statistics SQLite may prefer the member foreign key
+        # index here, so only the absence of a full scan is checked
+        self.assert_uses_index(Event.objects.filter(member=self.member, is_levy_paid=False))
+
+
+class InsightsQueryTests(TestCase):
+    """
+    The insights reports aggregate a year in a fixed number of queries,
+    however many rows the year holds
+    """
+
+    # Insights endpoint -> queries it may run at any size
+    budgets = {
+        '/api/receipts/insights/': 7,
+        '/api/payments/insights/': 5,
+        '/api/events/insights/': 8,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.member = Member.objects.create(
+            church=cls.church, full_name='Esi Owusu', phone_number='0240000004', gender='female'
+        )
+        cls.year = timezone.now().year
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_month_rows(self, per_month):
+        # per_month of each receipt, payment and event type in every month of the year
+        for month in range(1, 13):
+            date = datetime.date(self.year, month, 1)
+            for i in range(per_month):
+                for receipt_type in ('monthly_dues', 'transport_levy', 'donation'):
+                    Receipt.objects.create(
+                        member=self.member, date=date, receipt_type=receipt_type, amount=10,
+                        year=self.year, created_by=self.admin,
+                    )
+                event = Event.objects.create(
+                    church=self.church, member=self.member, event_type='funeral', event_date=date,
+                    levy_amount=5, created_by=self.admin,
+                )
+                for payment_type in ('member_benefit', 'event_expense', 'operational_expense'):
+                    Payment.objects.create(
+                        church=self.church, payment_type=payment_type, beneficiary_member=self.member,
+                        related_event=event, payee_name='Undertaker', date=date, amount=20, created_by=self.admin,
+                    )
+
+    def test_query_count_is_constant(self):
+        for per_month in (1, 10):
+            self.add_month_rows(per_month - Event.objects.filter(church=self.church, event_date__month=1).count())
+            for url, budget in self.budgets.items():
+                cache.clear()
+                with self.subTest(url=url, per_month=per_month), self.assertNumQueries(budget):
+                    response = self.client.get(url, {'year': self.year})
+                self.assertEqual(response.status_code, 200)
+
+
+class XlsxExportMemoryTests(TestCase):
+    """
+    The XLSX export flushes each row to disk, so its peak memory does not
+    grow with the number of rows
+    """
+    headers = ['Receipt Number', 'Date', 'Member', 'Amount', 'Details']
+
+    def peak_memory(self, count):
+        rows = (
+            (f'R/{i}', datetime.date(2025, 1, 1), f'Member {i}', Decimal('10.50'), 'Monthly dues')
+            for i in range(count)
+        )
+        tracemalloc.start()
+        try:
+            response = xlsx_response(self.headers, rows, 'receipts')
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        response.close()
+        return peak
+
+    def test_peak_memory_is_bounded(self):
+        # Warm up so imports and one-off allocations are not counted
+        self.peak_memory(10)
+        small, large = self.peak_memory(2000), self.peak_memory(20000)
+        self.assertLess(large, small * 1.5)
+
+
+class ReportYearTests(TestCase):
+    """
+    Years no date range can represent are rejected with a 400
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_out_of_range_years(self):
+        urls = [
+            '/api/receipts/insights/', '/api/payments/insights/', '/api/events/insights/',
+            '/api/exports/receipts/', '/api/exports/payments/',
+        ]
+        for url in urls:
+            for year in ('0', '9999', '-1'):
+                with self.subTest(url=url, year=year):
+                    response = self.client.get(url, {'year': year})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('year', response.json()['error'])
+
+    def test_close_out_of_range_year(self):
+        response = self.client.post('/api/reports/close-year/', {'year': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_last_year_in_range(self):
+        response = self.client.get('/api/payments/insights/', {'year': '9998'})
+        self.assertEqual(response.status_code, 200)
+
+
+class RecentActivityTests(TestCase):
+    """
+    The dashboard feed items keep their type / description / time shape
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.member = Member.objects.create(
+            church=cls.church, full_name='Akua Mensah', phone_number='0240000005', gender='female'
+        )
+        Receipt.objects.create(
+            member=cls.member, date=datetime.date(2025, 3, 1), receipt_type='monthly_dues',
+            amount=10, year=2025, created_by=cls.admin,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_item_keys(self):
+        items = self.client.get('/api/dashboard/recent-activity/').json()
+        self.assertTrue(items)
+        for item in items:
+            self.assertEqual(sorted(item), ['description', 'time', 'type'])
+        self.assertEqual(items[0]['description'], 'Akua Mensah paid Monthly Dues')
+
+    def test_paged_item_keys(self):
+        page = self.client.get('/api/dashboard/recent-activity/', {'page_size': 1}).json()
+        self.assertEqual(len(page['results']), 1)
+        self.assertEqual(sorted(page['results'][0]), ['description', 'time', 'type'])
+
+
+class StaleReportRefreshTests(TransactionTestCase):
+    """
+    A stale report is served as is while a background thread recomputes it
+    for the same user, church and query string
+    """
+
+    def test_stale_report_is_refreshed(self):
+        cache.clear()
+        church, admin = make_church()
+        member = Member.objects.create(church=church, full_name='Kwame Darko', phone_number='0240000006', gender='male')
+        year = timezone.now().year
+        receipt = Receipt.objects.create(
+            member=member, date=datetime.date(year, 1, 1), receipt_type='monthly_dues',
+            amount=40, year=year, created_by=admin,
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = '/api/receipts/insights/'
+        self.assertEqual(client.get(url, {'year': year}).json()['total_year_receipts'], 40)
+
+        # A change the report cache is not told about, seen once the entry is stale
+        Receipt.objects.filter(pk=receipt.pk).update(amount=60)
+        later = time.time() + REPORT_CACHE_TIMEOUT + 1
+        running = set(threading.enumerate())
+        with mock.patch('welfare.report_cache.time', SimpleNamespace(time=lambda: later, time_ns=time.time_ns)):
+            self.assertEqual(client.get(url, {'year': year}).json()['total_year_receipts'], 40)
+            refreshes = set(threading.enumerate()) - running
+            self.assertEqual(len(refreshes), 1)
+            for thread in refreshes:
+                thread.join(10)
+            self.assertEqual(client.get(url, {'year': year}).json()['total_year_receipts'], 60)
+
+
+class StatementBatchTests(TransactionTestCase):
+    """
+    A batch whose rendering breaks down is never left running, one whose
+    thread died with the server can be queued again, and a church renders
+    one batch at a time in a bounded number of processes
+    """
+
+    def setUp(self):
+        self.church, self.admin = make_church()
+
+    def test_worker_exit_marks_batch_failed(self):
+        Member.objects.bulk_create([
+            Member(church=self.church, full_name=f'Member {i}', phone_number=f'05{i:08d}', gender='male')
+            for i in range(STATEMENTS_PER_TASK + 1)
+        ])
+        batch = StatementBatch.objects.create(church=self.church, year=2025, created_by=self.admin)
+        # The pool hands a worker's SystemExit back to this process as is
+        with mock.patch('welfare.statements.render_statement', sys.exit), \
+                self.assertLogs('welfare.statements', 'ERROR'):
+            run_statement_batch(batch.pk, workers=2)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'failed')
+        self.assertTrue(batch.error)
+        self.assertIsNotNone(batch.finished_at)
+
+    def render_again(self, queryset):
+        model_admin = StatementBatchAdmin(StatementBatch, admin.site)
+        with mock.patch('welfare.admin.start_statement_batch') as start, \
+                mock.patch.object(model_admin, 'message_user'):
+            model_admin.render_again(None, queryset)
+        return sorted(call.args[0] for call in start.call_args_list)
+
+    def test_render_again_requeues_stuck_batches(self):
+        now = timezone.now()
+        other_church, other_admin = make_church('Bethel')
+        stuck = StatementBatch.objects.create(
+            church=self.church, year=2023, status='running', started_at=now - STALE_BATCH_AFTER * 2
+        )
+        running = StatementBatch.objects.create(church=other_church, year=2024, status='running', started_at=now)
+        failed = StatementBatch.objects.create(church=other_church, year=2025, status='failed', error='Boom')
+
+        self.assertEqual(self.render_again(StatementBatch.objects.all()), [stuck.pk])
+        for batch, status in ((stuck, 'pending'), (running, 'running'), (failed, 'failed')):
+            batch.refresh_from_db()
+            self.assertEqual(batch.status, status)
+
+    def test_one_batch_per_church(self):
+        done = [
+            StatementBatch.objects.create(church=self.church, year=year, status='done') for year in (2023, 2024)
+        ]
+        # Of two batches of the church, one is queued
+        self.assertEqual(len(self.render_again(StatementBatch.objects.filter(pk__in=[batch.pk for batch in done]))), 1)
+
+        StatementBatch.objects.create(church=self.church, year=2022, status='running', started_at=timezone.now())
+        batch = StatementBatch.objects.create(church=self.church, year=2025, created_by=self.admin)
+        with mock.patch('welfare.statements.write_statements') as write:
+            run_statement_batch(batch.pk)
+        write.assert_not_called()
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'failed')
+        self.assertIn('Another statement batch', batch.error)
+
+    @override_settings(STATEMENT_BATCH_MAX_WORKERS=1)
+    def test_workers_are_capped(self):
+        batch = StatementBatch.objects.create(church=self.church, year=2025, created_by=self.admin)
+        with mock.patch('welfare.statements.write_statements', return_value=0) as write:
+            run_statement_batch(batch.pk, workers=8)
+        self.assertEqual(write.call_args.args[3], 1)
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'done')
+
+
+class ArrearsAgingTests(TestCase):
+    """
+    Arrears aging buckets and pages the members behind on dues, for admins only
+    """
+    url = '/api/arrears-aging/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.year = timezone.now().year - 2
+        # full name -> dues paid in each of the years behind, against 120.00 expected a year
+        paid = {'Ama': [100], 'Bea': [60], 'Cobby': [0], 'Dede': [120], 'Efua': [0, 0]}
+        cls.members = {}
+        for i, (name, years) in enumerate(paid.items()):
+            member = Member.objects.create(church=cls.church, full_name=name, phone_number=f'02600000{i:02d}', gender='female')
+            cls.members[name] = member
+            for offset, paid_dues in enumerate(years):
+                MemberYearBalance.objects.update_or_create(
+                    member=member, year=cls.year - offset,
+                    defaults={'expected': 120, 'paid_dues': paid_dues, 'outstanding': 120 - paid_dues},
+                )
+        cls.member_user = CustomUser.objects.create_user(
+            phone_number='0260000099', name='Member', church=cls.church, is_member=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_buckets_and_pages(self):
+        report = self.client.get(self.url, {'page_size': 2}).json()
+        self.assertEqual(report['active_members'], 5)
+        self.assertEqual(report['members_up_to_date'], 1)
+        self.assertEqual(report['members_behind'], 4)
+        self.assertEqual(report['total_arrears'], 440.0)
+        self.assertEqual(report['buckets'], [
+            {'bucket': '0-3', 'members': 1, 'amount': 20.0},
+            {'bucket': '3-6', 'members': 1, 'amount': 60.0},
+            {'bucket': '6-12', 'members': 1, 'amount': 120.0},
+            {'bucket': '12+', 'members': 1, 'amount': 240.0},
+        ])
+        self.assertEqual(report['count'], 4)
+        self.assertEqual(
+            [(row['full_name'], row['months_behind'], row['amount_behind']) for row in report['results']],
+            [('Efua', 24, 240.0), ('Cobby', 12, 120.0)],
+        )
+        self.assertIsNone(report['previous'])
+
+        report = self.client.get(report['next']).json()
+        self.assertEqual([row['full_name'] for row in report['results']], ['Bea', 'Ama'])
+        self.assertIsNone(report['next'])
+
+    def test_bucket_filter(self):
+        report = self.client.get(self.url, {'bucket': '3-6'}).json()
+        self.assertEqual(report['count'], 1)
+        self.assertEqual(report['results'][0]['id'], self.members['Bea'].id)
+        self.assertEqual(report['results'][0]['phone_number'], self.members['Bea'].phone_number)
+
+    def test_anonymous_is_refused(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_member_is_refused(self):
+        # Even once an admin's request has cached the report
+        self.client.get(self.url)
+        self.client.force_authenticate(self.member_user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class DuesSimulatorTests(TestCase):
+    """
+    Projected dues income and compliance at candidate monthly amounts
+    """
+    url = '/api/dues-simulator/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        # full name -> dues paid in 2025 against 120.00 expected, None for no balance
+        for i, (name, paid) in enumerate({'Abena': 120, 'Baaba': 60, 'Comfort': None}.items()):
+            member = Member.objects.create(church=cls.church, full_name=name, phone_number=f'02700000{i:02d}', gender='female')
+            if paid is not None:
+                MemberYearBalance.objects.update_or_create(
+                    member=member, year=2025, defaults={'expected': 120, 'paid_dues': paid, 'outstanding': 120 - paid},
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_projection(self):
+        simulation = simulate_dues(self.church, [Decimal('10'), Decimal('5')], 1, today=datetime.date(2026, 6, 1))
+        self.assertEqual(simulation['history_years'], [2025])
+        self.assertEqual(simulation['active_members'], 3)
+        self.assertEqual(simulation['members_without_history'], 1)
+
+        # At 10.00 the full payer covers 120, the half payer 60 and the
+        # member without history the mean share / median payment, 90
+        at_ten, at_five = simulation['scenarios']
+        self.assertEqual(at_ten['expected_income'], 360.0)
+        self.assertEqual(at_ten['projected_income'], 270.0)
+        self.assertEqual(at_ten['collection_rate'], 75.0)
+        self.assertEqual(at_ten['expected_compliance'], 33.3)
+        self.assertEqual(at_ten['shortfall']['total'], 90.0)
+        self.assertEqual(at_ten['shortfall']['months_unpaid'], {'0': 1, '1-3': 1, '4-6': 1, '7-12': 0})
+
+        # At 5.00 everyone already paid at least the 60 asked
+        self.assertEqual(at_five['projected_income'], 180.0)
+        self.assertEqual(at_five['collection_rate'], 100.0)
+        self.assertEqual(at_five['expected_compliance'], 100.0)
+
+    def test_endpoint(self):
+        response = self.client.get(self.url, {'amounts': '10,5', 'history_years': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([scenario['monthly_amount'] for scenario in response.json()['scenarios']], [10.0, 5.0])
+
+    def test_amount_out_of_range(self):
+        for amounts in ('1e400', '100000000', '0', '-5', 'NaN'):
+            with self.subTest(amounts=amounts):
+                self.assertEqual(self.client.get(self.url, {'amounts': amounts}).status_code, 400)
+
+    def test_access(self):
+        member_user = CustomUser.objects.create_user(
+            phone_number='0270000099', name='Member', church=self.church, is_member=True
+        )
+        self.client.force_authenticate(member_user)
+        self.assertEqual(self.client.get(self.url, {'amounts': '10'}).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url, {'amounts': '10'}).status_code, 401)
+
+
+class MemberImportTests(TestCase):
+    """
+    Imported members log in with their phone-derived password; accounts
+    locked on purpose stay locked, and a concurrent import's rows are
+    reported instead of failing the upload
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+
+    def row(self, name, phone_number):
+        return {'full_name': name, 'phone_number': phone_number, 'gender': 'female'}
+
+    def login(self, phone_number):
+        return APIClient().post('/api/auth/login/', {'phone_number': phone_number}, format='json')
+
+    def test_imported_user_logs_in(self):
+        results = import_members(self.church, [(2, self.row('Adwoa Boakye', '0280000001'))])
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertEqual(self.login('0280000001').status_code, 200)
+        user = CustomUser.objects.get(phone_number='0280000001')
+        self.assertTrue(user.check_password('000001'))
+
+    def test_locked_user_stays_locked(self):
+        user = CustomUser.objects.create_user(phone_number='0280000002', name='Locked', church=self.church)
+        user.set_unusable_password()
+        user.save()
+        self.assertEqual(self.login('0280000002').status_code, 400)
+        user.refresh_from_db()
+        self.assertFalse(user.has_usable_password())
+
+    def test_concurrent_import(self):
+        # Another upload created Adjoa after this import looked the phone numbers up
+        import_members(self.church, [(2, self.row('Adjoa Mensah', '0280000003'))])
+        lookups = []
+
+        def stale_first_lookup(church, phones):
+            lookups.append(phones)
+            if len(lookups) == 1:
+                return {}, set(), set()
+            return _existing(church, phones)
+
+        with mock.patch('welfare.importers._existing', side_effect=stale_first_lookup):
+            results = import_members(
+                self.church, [(2, self.row('Adjoa Mensah', '0280000003')), (3, self.row('Akosua Frimpong', '0280000004'))]
+            )
+
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual([(result['row'], result['status']) for result in results], [(2, 'skipped'), (3, 'created')])
+        self.assertEqual(Member.objects.filter(church=self.church, phone_number='0280000003').count(), 1)
+        self.assertTrue(Member.objects.filter(church=self.church, phone_number='0280000004').exists())
+
+
+class ReceiptChurchTests(TestCase):
+    """
+    Receipts are filed under their member's church, so filtering on
+    Receipt.church gives the same report figures as joining Member did
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.other_church, cls.other_admin = make_church('Bethel')
+        cls.members = [
+            Member.objects.create(church=church, full_name=name, phone_number=phone, gender='female')
+            for church, name, phone in (
+                (cls.church, 'Ama Serwaa', '0290000001'),
+                (cls.church, 'Efua Mensah', '0290000002'),
+                (cls.other_church, 'Yaa Asantewaa', '0290000003'),
+            )
+        ]
+        for index, (receipt_type, amount) in enumerate(
+            (('monthly_dues', 20), ('transport_levy', 5), ('donation', 50), ('monthly_dues', 15), ('other', 3))
+        ):
+            for member in cls.members:
+                Receipt.objects.create(
+                    member=member, date=datetime.date(2024, index + 1, 10), receipt_type=receipt_type,
+                    amount=amount + member.id, year=2024 - index % 2, created_by=cls.admin,
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_church_comes_from_member(self):
+        receipt = Receipt.objects.create(
+            member=self.members[0], date=datetime.date(2025, 1, 5), receipt_type='donation', amount=10,
+            year=2025, created_by=self.admin,
+        )
+        self.assertEqual(receipt.church_id, self.church.id)
+
+        # A church that disagrees with the member's is overwritten
+        receipt = Receipt.objects.create(
+            member=self.members[2], church=self.church, date=datetime.date(2025, 1, 5), receipt_type='donation',
+            amount=10, year=2025, created_by=self.admin,
+        )
+        self.assertEqual(Receipt.objects.get(pk=receipt.pk).church_id, self.other_church.id)
+
+    def test_totals_match_member_join(self):
+        def totals(**church):
+            return list(
+                Receipt.objects.filter(**church).order_by('year', 'receipt_type')
+                .values('year', 'receipt_type')
+                .annotate(total=Sum('amount'), count=Count('id'), payers=Count('member', distinct=True))
+            )
+
+        for church in (self.church, self.other_church):
+            by_church = totals(church=church)
+            self.assertTrue(by_church)
+            self.assertEqual(by_church, totals(member__church=church))
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        data = client.get('/api/receipts/insights/?year=2024').json()
+        old = Receipt.objects.filter(member__church=self.church, year=2024)
+        self.assertEqual(data['total_year_receipts'], float(old.aggregate(total=Sum('amount'))['total']))
+        self.assertEqual(data['total_receipts_count'], old.count())
+        self.assertEqual(
+            data['monthly_dues_total'],
+            float(old.filter(receipt_type='monthly_dues').aggregate(total=Sum('amount'))['total']),
+        )
+
+
+class ReceiptPdfCacheTests(TestCase):
+    """
+    Receipt PDFs are served from a byte-bounded disk cache keyed by the
+    printed fields, with the same key as ETag
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        member = Member.objects.create(church=cls.church, full_name='Ama Serwaa', phone_number='0290000001', gender='female')
+        cls.receipt = Receipt.objects.create(
+            member=member, date=datetime.date(2025, 1, 5), receipt_type='donation', amount=10,
+            year=2025, created_by=cls.admin,
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # Room for one receipt copy (about 2 KB) but not two
+        settings = override_settings(RECEIPT_PDF_CACHE_DIR=self.directory, RECEIPT_PDF_CACHE_MAX_BYTES=3000)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # The cache object is built from the settings on first use
+        shared_cache = mock.patch('welfare.receipt_pdfs._cache', None)
+        shared_cache.start()
+        self.addCleanup(shared_cache.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/receipts/{self.receipt.pk}/pdf/'
+
+    def cached_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.pdf'))
+
+    def get(self, **headers):
+        with mock.patch('welfare.receipt_pdfs.render_receipt', wraps=render_receipt) as render:
+            response = self.client.get(self.url, **headers)
+        return response, render.call_count
+
+    def test_etag_and_not_modified(self):
+        response, renders = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(renders, 1)
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        etag = response['ETag']
+        self.assertEqual(self.cached_files(), [f'{self.receipt.pk}-{etag[1:-1]}.pdf'])
+
+        response, renders = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(renders, 0)
+
+        response, renders = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(renders, 0)
+        self.assertEqual(b''.join(response.streaming_content), pdf)
+
+    def test_edit_misses_cache(self):
+        response, renders = self.get()
+        etag = response['ETag']
+        old_copy, = self.cached_files()
+        # Make the old copy the least recently used whatever the clock resolution
+        os.utime(os.path.join(self.directory, old_copy), (0, 0))
+
+        self.receipt.amount = 12
+        self.receipt.save()
+        response, renders = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(renders, 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Both copies do not fit, so the stale one was evicted
+        self.assertEqual(self.cached_files(), [f"{self.receipt.pk}-{response['ETag'][1:-1]}.pdf"])
+
+    def test_evict_to_byte_limit(self):
+        pdf_cache = ReceiptPdfCache(self.directory, max_bytes=1000)
+        for receipt_id in range(1, 4):
+            pdf_cache.put(receipt_id, 'digest', b'x' * 300)
+            os.utime(pdf_cache.path(receipt_id, 'digest'), (receipt_id, receipt_id))
+        self.assertEqual(len(self.cached_files()), 3)
+
+        # Serving the oldest copy makes the second the least recently used
+        pdf_cache.get(1, 'digest').close()
+        pdf_cache.put(4, 'digest', b'x' * 300)
+        self.assertEqual(self.cached_files(), ['1-digest.pdf', '3-digest.pdf', '4-digest.pdf'])
+        self.assertEqual(pdf_cache.estimated_bytes, 900)
+
+        # A manual run trims a directory that grew behind the cache's back
+        with open(pdf_cache.path(5, 'digest'), 'wb') as pdf_file:
+            pdf_file.write(b'x' * 600)
+        self.assertEqual(pdf_cache.evict(), 2)
+        self.assertLessEqual(pdf_cache.estimated_bytes, 1000 * EVICT_TO)
+
+
+class BulkReceiptTests(TestCase):
+    """
+    Receipts posted in bulk leave the ledger, year balances and levy
+    obligations exactly as the same receipts saved one at a time, and a
+    batch with a bad row writes nothing
+    """
+    url = '/api/receipts/bulk/'
+    rows = [
+        ('Ama Serwaa', '2024-11-20', 'monthly_dues', '25.00', 2024),
+        ('Ama Serwaa', '2025-01-05', 'monthly_dues', '30.00', 2025),
+        ('Ama Serwaa', '2025-02-05', 'monthly_dues', '7.50', 2025),
+        ('Kojo Antwi', '2025-01-12', 'monthly_dues', '120.00', 2025),
+        ('Kojo Antwi', '2025-03-01', 'donation', '50.00', 2025),
+        ('Ama Serwaa', '2025-04-05', 'transport_levy', '5.00', 2025),
+        ('Kojo Antwi', '2025-04-06', 'transport_levy', '2.00', 2025),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.churches = {}
+        for name, phone in (('Grace Chapel', '029'), ('Bethel', '028')):
+            church, admin = make_church(name)
+            members = {
+                full_name: Member.objects.create(
+                    church=church, full_name=full_name, phone_number=f'{phone}000000{index}', gender=gender
+                )
+                for index, (full_name, gender) in enumerate((('Ama Serwaa', 'female'), ('Kojo Antwi', 'male')))
+            }
+            for year, amount in ((2024, 10), (2025, 15)):
+                YearlyDues.objects.create(church=church, year=year, monthly_amount=amount, created_by=admin)
+            event = Event.objects.create(
+                church=church, member=members['Kojo Antwi'], event_type='funeral',
+                event_date=datetime.date(2025, 4, 1), levy_amount=5, created_by=admin,
+            )
+            assess_levy(event)
+            cls.churches[name] = SimpleNamespace(church=church, admin=admin, members=members, event=event)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def payload(self, church):
+        return [
+            {
+                'member': church.members[name].id, 'date': date, 'receipt_type': receipt_type,
+                'amount': amount, 'year': year,
+                **({'related_event': church.event.id} if receipt_type == 'transport_levy' else {}),
+            }
+            for name, date, receipt_type, amount, year in self.rows
+        ]
+
+    def side_effects(self, church):
+        ledger = ChurchMonthlyLedger.objects.filter(church=church.church).order_by(
+            'year', 'month', 'entry_kind', 'entry_type'
+        ).values_list('year', 'month', 'entry_kind', 'entry_type', 'amount', 'count')
+        balances = MemberYearBalance.objects.filter(member__church=church.church).order_by(
+            'member__full_name', 'year'
+        ).values_list(
+            'member__full_name', 'year', 'expected', 'paid_dues', 'paid_levy', 'outstanding',
+            'paid_months', 'month_remainder', 'last_payment_date',
+        )
+        obligations = LevyObligation.objects.filter(event=church.event).order_by(
+            'member__full_name'
+        ).values_list('member__full_name', 'amount_paid', 'settled')
+        return list(ledger), list(balances), list(obligations)
+
+    def test_matches_per_row_saves(self):
+        bulk, single = self.churches['Grace Chapel'], self.churches['Bethel']
+        self.client.force_authenticate(bulk.admin)
+        response = self.client.post(self.url, self.payload(bulk), format='json')
+        self.assertEqual(response.status_code, 201)
+
+        for name, date, receipt_type, amount, year in self.rows:
+            Receipt.objects.create(
+                member=single.members[name], date=datetime.date.fromisoformat(date), receipt_type=receipt_type,
+                amount=Decimal(amount), year=year, created_by=single.admin,
+                related_event=single.event if receipt_type == 'transport_levy' else None,
+            )
+
+        ledger, balances, obligations = self.side_effects(bulk)
+        self.assertTrue(ledger and balances and obligations)
+        self.assertEqual((ledger, balances, obligations), self.side_effects(single))
+
+    def test_bad_row_writes_nothing(self):
+        church = self.churches['Grace Chapel']
+        self.client.force_authenticate(church.admin)
+        before = self.side_effects(church)
+
+        rows = self.payload(church)
+        rows[3]['receipt_type'] = 'refund'
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [3])
+
+        # A failure after the insert rolls the whole batch back as well
+        with mock.patch('welfare.views.settle_receipt_levies', side_effect=OperationalError('Lost connection')), \
+                self.assertRaises(OperationalError):
+            self.client.post(self.url, self.payload(church), format='json')
+
+        self.assertFalse(Receipt.objects.filter(church=church.church).exists())
+        self.assertFalse(ReceiptSequence.objects.filter(church=church.church).exists())
+        self.assertEqual(self.side_effects(church), before)
+
+
+class BulkReceiptLevyTests(TestCase):
+    """
+    Transport levy receipts posted in bulk can be linked to their event,
+    which settles the member's levy obligation
+    """
+    url = '/api/receipts/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.ama = Member.objects.create(church=cls.church, full_name='Ama Serwaa', phone_number='0290000001', gender='female')
+        cls.kojo = Member.objects.create(church=cls.church, full_name='Kojo Antwi', phone_number='0290000002', gender='male')
+        cls.event = Event.objects.create(
+            church=cls.church, member=cls.kojo, event_type='funeral', event_date=datetime.date(2025, 4, 1),
+            levy_amount=5, created_by=cls.admin,
+        )
+        assess_levy(cls.event)
+        other_church, other_admin = make_church('Bethel')
+        other_member = Member.objects.create(church=other_church, full_name='Yaa Asantewaa', phone_number='0290000003', gender='female')
+        cls.other_event = Event.objects.create(
+            church=other_church, member=other_member, event_type='funeral', event_date=datetime.date(2025, 4, 1),
+            levy_amount=5, created_by=other_admin,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def row(self, member, receipt_type='transport_levy', **fields):
+        return {
+            'member': member.id, 'date': '2025-04-05', 'receipt_type': receipt_type,
+            'amount': '5.00', 'year': 2025, **fields,
+        }
+
+    def test_linked_levy_is_settled(self):
+        response = self.client.post(
+            self.url, [self.row(self.ama, related_event=self.event.id), self.row(self.kojo, 'monthly_dues')], format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['receipts'][0]['related_event'], self.event.id)
+        obligation = LevyObligation.objects.get(event=self.event, member=self.ama)
+        self.assertTrue(obligation.settled)
+        self.assertEqual(obligation.amount_paid, Decimal('5.00'))
+
+    def test_invalid_events(self):
+        rows = [
+            self.row(self.ama, 'monthly_dues', related_event=self.event.id),
+            self.row(self.ama, related_event=self.other_event.id),
+            self.row(self.kojo, related_event=self.event.id),
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0, 1])
+        self.assertFalse(Receipt.objects.filter(church=self.church).exists())
+
+
+class MemberSummaryQueryTests(TestCase):
+    """
+    The member home screen summary costs the same queries however many
+    years of history the member has
+    """
+    url = '/api/me/summary/'
+    budget = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.user = CustomUser.objects.create_user(
+            phone_number='0300000001', name='Abena Osei', church=cls.church, is_member=True
+        )
+        cls.member = Member.objects.create(
+            church=cls.church, user=cls.user, full_name='Abena Osei', phone_number='0300000001', gender='female',
+        )
+        cls.other = Member.objects.create(church=cls.church, full_name='Kofi Mensah', phone_number='0300000002', gender='male')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_year(self, year):
+        YearlyDues.objects.create(church=self.church, year=year, monthly_amount=10, created_by=self.admin)
+        for month in (1, 2, 3):
+            Receipt.objects.create(
+                member=self.member, date=datetime.date(year, month, 1), receipt_type='monthly_dues',
+                amount=10, year=year, created_by=self.admin,
+            )
+        event = Event.objects.create(
+            church=self.church, member=self.other, event_type='funeral', event_date=datetime.date(year, 5, 1),
+            levy_amount=5, created_by=self.admin,
+        )
+        assess_levy(event)
+        Receipt.objects.create(
+            member=self.member, date=datetime.date(year, 5, 2), receipt_type='transport_levy',
+            amount=5, year=year, related_event=event, created_by=self.admin,
+        )
+
+    def test_query_count_is_constant(self):
+        this_year = timezone.now().year
+        for years in (1, 5):
+            for year in range(this_year - years + 1, this_year + 1):
+                if not YearlyDues.objects.filter(church=self.church, year=year).exists():
+                    self.add_year(year)
+            cache.clear()
+            with self.subTest(years=years), self.assertNumQueries(self.budget):
+                response = self.client.get(self.url)
+            self.assertEqual(len(response.json()['paymentHistory']), 4 * years)
+
+
+class DefaulterAccessTests(TestCase):
+    """
+    The defaulter list is for admins and rejects years it cannot report on
+    """
+    url = '/api/members/defaulters/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.church, cls.admin = make_church()
+        cls.member_user = CustomUser.objects.create_user(
+            phone_number='0310000001', name='Member', church=cls.church, is_member=True
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_member_is_refused(self):
+        self.client.force_authenticate(self.member_user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_invalid_years(self):
+        for year in ('0', '9999', 'last'):
+            with self.subTest(year=year):
+                response = self.client.get(self.url, {'year': year})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('year', response.json()['error'])
+        self.assertEqual(self.client.get(self.url, {'year': '2025'}).status_code, 200)
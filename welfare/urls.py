@@ -22,6 +22,10 @@ urlpatterns = [
     # Members
     path('members/', views.MemberListCreateView.as_view(), name='member-list'),
     path('members/<int:pk>/', views.MemberDetailView.as_view(), name='member-detail'),
+    path('members/import/', views.import_members_view, name='member-import'),
+    path('members/defaulters/', views.DefaulterListView.as_view(), name='member-defaulters'),
+    path('exports/<str:kind>/', views.export_records, name='export-records'),
+    path('report-cache/stats/', views.report_cache_stats, name='report-cache-stats'),
     path('member-payment-history/', views.member_payment_history, name='member-payment-history'), 
     
     
@@ -30,7 +34,9 @@ urlpatterns = [
     
     # Receipts
     path('receipts/', views.ReceiptListCreateView.as_view(), name='receipt-list'),
+    path('receipts/bulk/', views.bulk_create_receipts, name='receipt-bulk-create'),
     path('receipts/<int:pk>/', views.ReceiptDetailView.as_view(), name='receipt-detail'),
+    path('receipts/<int:pk>/pdf/', views.receipt_pdf, name='receipt-pdf'),
     
     # Payments
     path('payments/', views.PaymentListCreateView.as_view(), name='payment-list'),
@@ -40,6 +46,7 @@ urlpatterns = [
     # Events
     path('events/', views.EventListCreateView.as_view(), name='event-list'),
     path('events/<int:pk>/', views.EventDetailView.as_view(), name='event-detail'),
+    path('levy-obligations/', views.LevyObligationListView.as_view(), name='levy-obligation-list'),
     
     
     #member dashboard path
@@ -47,6 +54,7 @@ urlpatterns = [
     path('reports-transport-levies/', views.transport_levies_report, name='transport-levies-report'),
     path('events-upcoming-list/', views.events_list, name='events-list'),
     path('reports-outstanding-amounts/', views.outstanding_amounts_report, name='outstanding-amounts-report'),
+    path('me/summary/', views.my_summary, name='my-summary'),
     
     #main dashboard
     # Dashboard paths
@@ -56,4 +64,7 @@ urlpatterns = [
     path('receipts/insights/', views.receipts_insights, name='receipts-insights'),
     path('payments/insights/', views.payments_insights, name='payments-insights'),
     path('events/insights/', views.events_insights, name='events-insights'),
+    path('arrears-aging/', views.arrears_aging_report, name='arrears-aging'),
+    path('dues-simulator/', views.dues_simulator, name='dues-simulator'),
+    path('reports/close-year/', views.close_report_year, name='close-report-year'),
 ]
\ No newline at end of file
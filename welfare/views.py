@@ -9,10 +9,46 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Sum, Count, Q
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Sum, Count, Q, F, Value
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.db.models.functions import Coalesce
 
 from .serializers import *
 from .models import *
+from .activity import record_bulk_activity
+from .aging import aging_buckets, arrears_aging, bucket_positions
+from .aggregations import MONTH_LABELS, growth, month_before, month_q, summarize
+from .balances import dues_compliant_members, month_mask, months_due, refresh_balances, with_year_balance
+from .periods import YEAR_RANGE_ERROR, YEARS, Period
+from .receipt_pdfs import cached_receipt_pdf, fields_digest, receipt_fields
+from .report_cache import cache_stats, cached_report, invalidate_church_reports
+from .simulations import simulate_dues
+from .snapshots import close_year, invalidate_snapshots, snapshot_report
+from .pagination import (
+    ActivityPagination,
+    AgingPagination,
+    DatedPagination,
+    DefaulterPagination,
+    EventPagination,
+    LevyObligationPagination,
+    MemberPagination,
+    YearlyDuesPagination,
+)
+from .exports import csv_response, export_rows, xlsx_response
+from .importers import import_members, iter_member_rows, summarize_import
+from .ledger import ledger_trend, record_bulk_insert
+from .levies import assess_levy, settle_receipt_levies, with_levy_collected
+from .member_reports import (
+    MemberHistory,
+    dues_payload,
+    outstanding_amounts_payload,
+    payment_history_row,
+    transport_levies_payload,
+)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -191,26 +227,160 @@ class ChurchBasedPermission(permissions.BasePermission):
         return obj.church == request.user.church
 
 
+class IsWelfareOrChurchAdmin(permissions.BasePermission):
+    """
+    Welfare or church admins only. Checked before a cached report is served,
+    so a member never reads what an admin's request cached for the church.
+    """
+    message = "Only welfare or church admins can view this report"
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_welfare_admin or user.is_church_admin))
+
+
 
 # MemberListCreateView
 class MemberListCreateView(generics.ListCreateAPIView):
     serializer_class = MemberSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MemberPagination
 
     def get_queryset(self):
-        return Member.objects.filter(church=self.request.user.church)
+        queryset = Member.objects.filter(church=self.request.user.church).select_related('church', 'user__church')
+        
+        # Optional arrears view: ?arrears_year=2025&owing=true&months_missed=3&ordering=-outstanding
+        arrears_year = self.request.query_params.get('arrears_year')
+        if arrears_year is None:
+            return queryset
+        try:
+            arrears_year = int(arrears_year)
+        except (TypeError, ValueError):
+            arrears_year = timezone.now().year
+        
+        queryset = with_year_balance(queryset, arrears_year)
+        
+        if self.request.query_params.get('owing') == 'true':
+            queryset = queryset.filter(outstanding__gt=0)
+        
+        # Members who paid none of the last N months due in the year
+        months_missed = self.request.query_params.get('months_missed', '')
+        if months_missed.isdigit() and int(months_missed) > 0:
+            months_missed = int(months_missed)
+            due = months_due(arrears_year)
+            if months_missed > due:
+                return queryset.none()
+            missed = month_mask(due - months_missed + 1, due)
+            queryset = queryset.alias(
+                missed_paid=Coalesce(F('balance__paid_months'), Value(0)).bitand(missed)
+            ).filter(missed_paid=0)
+        
+        ordering = self.request.query_params.get('ordering')
+        if ordering in ('outstanding', '-outstanding'):
+            queryset = queryset.order_by(ordering, 'full_name')
+        
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(church=self.request.user.church)
 
 
+class DefaulterListView(generics.ListAPIView):
+    """
+    Active members who still owe dues for ?year= (default: this year), with
+    the amount from their year balance joined in one query. ?ordering=
+    -amount (default), amount, name or -name. Welfare or church admins only.
+    """
+    serializer_class = DefaulterSerializer
+    permission_classes = [permissions.IsAuthenticated, IsWelfareOrChurchAdmin]
+    pagination_class = DefaulterPagination
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.year = int(request.query_params.get('year', timezone.now().year))
+        except (TypeError, ValueError):
+            return Response({'error': 'year must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if self.year not in YEARS:
+            return Response({'error': YEAR_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        params = self.request.query_params
+        year = self.year
+        
+        members = Member.objects.filter(church=self.request.user.church, status='active')
+        ordering = DefaulterPagination.orderings.get(params.get('ordering'), DefaulterPagination.ordering)
+        return with_year_balance(members, year).filter(outstanding__gt=0).order_by(*ordering)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_members_view(request):
+    """
+    Import members from an uploaded CSV or XLSX file (multipart field "file")
+    and return a per-row report
+    """
+    if not (request.user.is_welfare_admin or request.user.is_church_admin):
+        raise PermissionDenied("Only welfare or church admins can import members")
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload a CSV or XLSX file in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        results = import_members(request.user.church, iter_member_rows(upload.file, upload.name))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'summary': summarize_import(results),
+        'results': results
+    })
+
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_records(request, kind):
+    """
+    Stream the church's full history of receipts, payments, events or members
+    as CSV (default) or XLSX (?file_type=xlsx). Optional filters: year,
+    date_from, date_to (YYYY-MM-DD) and type.
+    """
+    file_type = request.query_params.get('file_type', 'csv')
+    if file_type not in ('csv', 'xlsx'):
+        return Response({'error': 'file_type must be csv or xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        headers, rows = export_rows(kind, request.user.church, request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    filename = f"{kind}-{timezone.now():%Y%m%d}"
+    if file_type == 'xlsx':
+        return xlsx_response(headers, rows, filename)
+    return csv_response(headers, rows, filename)
+
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_cache_stats(request):
+    """
+    Hit / stale / miss counts of the cached report endpoints, for tuning TTLs
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied("Only staff can view cache statistics")
+    return Response(cache_stats())
+
+
 # MemberDetailView
 class MemberDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MemberSerializer
     permission_classes = [permissions.IsAuthenticated, ChurchBasedPermission]
 
     def get_queryset(self):
-        return Member.objects.filter(church=self.request.user.church)
+        return Member.objects.filter(church=self.request.user.church).select_related('church', 'user__church')
 
 
 
@@ -222,20 +392,124 @@ class MemberDetailView(generics.RetrieveUpdateDestroyAPIView):
 class ReceiptListCreateView(generics.ListCreateAPIView):
     serializer_class = ReceiptSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DatedPagination
 
     def get_queryset(self):
-        return Receipt.objects.filter(member__church=self.request.user.church)
+        return Receipt.objects.filter(church=self.request.user.church).select_related('member', 'related_event', 'created_by')
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
         
+# Bulk receipt posting (month-end batches)
+MAX_BULK_RECEIPTS = 1000
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_receipts(request):
+    """
+    Create a batch of receipts in one transaction. Accepts a JSON array of
+    receipts (member, date, receipt_type, amount, year, details and, for
+    transport levies, related_event); either every row is created or none
+    is and the per-row errors are returned.
+    """
+    rows = request.data
+    if not isinstance(rows, list) or not rows:
+        return Response({'error': 'Expected a non-empty list of receipts'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > MAX_BULK_RECEIPTS:
+        return Response(
+            {'error': f'At most {MAX_BULK_RECEIPTS} receipts can be posted at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    church = request.user.church
+    
+    # Resolve every referenced member and event of the caller's church in one query each
+    member_ids = set()
+    event_ids = set()
+    for row in rows:
+        for field, ids in (('member', member_ids), ('related_event', event_ids)):
+            try:
+                ids.add(int(row.get(field)))
+            except (AttributeError, TypeError, ValueError):
+                pass
+    members = Member.objects.filter(church=church, id__in=member_ids).in_bulk()
+    events = Event.objects.filter(church=church, id__in=event_ids).in_bulk() if event_ids else {}
+    
+    serializer = BulkReceiptItemSerializer(data=rows, many=True, context={'members': members, 'events': events})
+    if not serializer.is_valid():
+        errors = [
+            {'index': index, 'errors': row_errors}
+            for index, row_errors in enumerate(serializer.errors)
+            if row_errors
+        ]
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+    
+    receipts = [Receipt(church=church, created_by=request.user, **row) for row in serializer.validated_data]
+    
+    with transaction.atomic():
+        # Reserve one contiguous block of numbers per receipt year
+        per_year = Counter(receipt.date.year for receipt in receipts)
+        next_seq = {year: ReceiptSequence.reserve(church, year, count) for year, count in per_year.items()}
+        for receipt in receipts:
+            year = receipt.date.year
+            receipt.receipt_number = Receipt.format_receipt_number(church, year, next_seq[year])
+            next_seq[year] += 1
+        
+        Receipt.objects.bulk_create(receipts, batch_size=500)
+        
+        # bulk_create sends no signals, so bring the rollups up to date here
+        record_bulk_insert(receipts)
+        refresh_balances((receipt.member_id, receipt.year) for receipt in receipts)
+        settle_receipt_levies(receipts)
+        invalidate_church_reports(church.id)
+        invalidate_snapshots(church.id, {receipt.year for receipt in receipts} | per_year.keys())
+        record_bulk_activity(receipts)
+    
+    return Response({
+        'created': len(receipts),
+        'receipts': ReceiptSerializer(receipts, many=True).data
+    }, status=status.HTTP_201_CREATED)
+
+
 # ReceiptDetailView
 class ReceiptDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ReceiptSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Receipt.objects.filter(member__church=self.request.user.church)
+        return Receipt.objects.filter(church=self.request.user.church).select_related('member', 'related_event', 'created_by')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def receipt_pdf(request, pk):
+    """
+    Printable PDF copy of a receipt. Copies are cached on disk by receipt id
+    and a hash of the printed fields, which is also the ETag, so a repeat
+    download with If-None-Match gets a 304 without the PDF being read or
+    drawn again.
+    """
+    try:
+        receipt = Receipt.objects.select_related('member', 'church', 'related_event', 'created_by').get(
+            pk=pk, church=request.user.church
+        )
+    except Receipt.DoesNotExist:
+        return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    fields = receipt_fields(receipt)
+    digest = fields_digest(fields)
+    etag = f'"{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        filename = f"receipt-{receipt.receipt_number.replace('/', '-')}.pdf"
+        response = FileResponse(
+            cached_receipt_pdf(receipt.id, fields, digest), filename=filename, content_type='application/pdf'
+        )
+    response['ETag'] = etag
+    # Clients keep the copy but check it is still current before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 
@@ -244,9 +518,12 @@ class ReceiptDetailView(generics.RetrieveUpdateDestroyAPIView):
 class PaymentListCreateView(generics.ListCreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DatedPagination
 
     def get_queryset(self):
-        return Payment.objects.filter(church=self.request.user.church)
+        return Payment.objects.filter(church=self.request.user.church).select_related(
+            'church', 'beneficiary_member', 'related_event', 'created_by'
+        )
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user, church=self.request.user.church)
@@ -256,7 +533,9 @@ class PaymentDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated, ChurchBasedPermission]
 
     def get_queryset(self):
-        return Payment.objects.filter(church=self.request.user.church)
+        return Payment.objects.filter(church=self.request.user.church).select_related(
+            'church', 'beneficiary_member', 'related_event', 'created_by'
+        )
 
 
 
@@ -265,19 +544,57 @@ class PaymentDetailView(generics.RetrieveUpdateDestroyAPIView):
 class EventListCreateView(generics.ListCreateAPIView):
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EventPagination
 
     def get_queryset(self):
-        return Event.objects.filter(church=self.request.user.church)
+        return with_levy_collected(
+            Event.objects.filter(church=self.request.user.church).select_related('church', 'member', 'created_by')
+        )
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user, church=self.request.user.church)
+        # The event and every member's levy obligation commit together
+        with transaction.atomic():
+            event = serializer.save(created_by=self.request.user, church=self.request.user.church)
+            assess_levy(event)
 
 class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated, ChurchBasedPermission]
 
     def get_queryset(self):
-        return Event.objects.filter(church=self.request.user.church)
+        return with_levy_collected(
+            Event.objects.filter(church=self.request.user.church).select_related('church', 'member', 'created_by')
+        )
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            event = serializer.save()
+            assess_levy(event)
+
+
+class LevyObligationListView(generics.ListAPIView):
+    """
+    Transport levy obligations of the church, filtered by ?event=, ?member=
+    and ?settled=true|false, e.g. who has not paid for an event yet
+    """
+    serializer_class = LevyObligationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LevyObligationPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        if not (user.is_welfare_admin or user.is_church_admin):
+            raise PermissionDenied("Only welfare or church admins can view levy obligations")
+
+        obligations = LevyObligation.objects.filter(event__church=user.church).select_related('event', 'member')
+        params = self.request.query_params
+        if params.get('event', '').isdigit():
+            obligations = obligations.filter(event_id=params['event'])
+        if params.get('member', '').isdigit():
+            obligations = obligations.filter(member_id=params['member'])
+        if params.get('settled') in ('true', 'false'):
+            obligations = obligations.filter(settled=params['settled'] == 'true')
+        return obligations
 
 
 
@@ -287,9 +604,10 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
 class YearlyDuesListCreateView(generics.ListCreateAPIView):
     serializer_class = YearlyDuesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = YearlyDuesPagination
 
     def get_queryset(self):
-        return YearlyDues.objects.filter(church=self.request.user.church)
+        return YearlyDues.objects.filter(church=self.request.user.church).select_related('church', 'created_by')
 
     def perform_create(self, serializer):
         # Only welfare admins can create yearly dues
@@ -303,7 +621,7 @@ class YearlyDuesDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated, ChurchBasedPermission]
 
     def get_queryset(self):
-        return YearlyDues.objects.filter(church=self.request.user.church)
+        return YearlyDues.objects.filter(church=self.request.user.church).select_related('church', 'created_by')
 
     def perform_update(self, serializer):
         # Only welfare admins can update yearly dues
@@ -318,194 +636,28 @@ class YearlyDuesDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # member_dues_report
 @api_view(['GET'])
+@cached_report(per_user=True)
 def member_dues_report(request):
     """
     Returns member dues report for the logged-in user only
     """
-    user = request.user
-    church = user.church
-    current_year = timezone.now().year
-    
-    # Get the member record for the logged-in user
-    members = Member.objects.all()
-    print(members)
     try:
-        member = Member.objects.get(user=user, church=church)
+        member = Member.objects.get(user=request.user, church=request.user.church)
     except Member.DoesNotExist:
         return Response({"error": "Member profile not found"}, status=404)
     
-    # Check if member is active
-    is_active_member = member.status == 'active'
-    
-    # Calculate totals using YearlyDues
-    all_yearly_dues = YearlyDues.objects.filter(church=church)
-    yearly_dues_dict = {yd.year: yd.monthly_amount for yd in all_yearly_dues}
-    
-    # Get all years we have receipts for THIS USER
-    receipt_years = Receipt.objects.filter(
-        member=member,  # Filter by specific member
-        receipt_type='monthly_dues'
-    ).values_list('year', flat=True).distinct()
-    
-    print(receipt_years)
-    
-    # Calculate total expected and total paid FOR THIS USER
-    total_expected = 0
-    total_paid = 0
-    payment_history = []
-    
-    # Process each year we have data for
-    years_to_show = sorted(set(range(current_year - 3, current_year + 1)) | set(receipt_years))
-    
-    
-    print(f"Current year: {current_year}")
-    print(f"Years to show: {years_to_show}")
-    print(f"Yearly dues available: {yearly_dues_dict}")
-    
-    for year in sorted(years_to_show, reverse=True):
-        # Get monthly due amount for this year
-        monthly_amount = yearly_dues_dict.get(year)
-        if monthly_amount is None:
-            monthly_amount = 0 #yearly_dues_dict.get(current_year, 0)
-        
-        # Calculate expected for this year FOR THIS USER ONLY
-        year_expected = 12 * monthly_amount if is_active_member else 0
-        print(f"Year: {year}, Monthly: {monthly_amount}, Expected: {year_expected}")
-        
-        # Get actual paid for this year FOR THIS USER
-        year_receipts = Receipt.objects.filter(
-            member=member,  # Filter by specific member
-            receipt_type='monthly_dues',
-            year=year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Calculate progress
-        year_progress = (year_receipts / year_expected * 100) if year_expected > 0 else 0
-        
-        # Add to payment history (only if we have data)
-        if year_receipts > 0 or year_expected > 0:
-            payment_history.append({
-                'year': year,
-                'amountPaid': float(year_receipts),
-                'progress': round(year_progress, 1)
-            })
-        
-        # Add to totals
-        total_expected += year_expected
-        total_paid += year_receipts
-    
-    # Calculate overall progress
-    overall_progress = (total_paid / total_expected * 100) if total_expected > 0 else 0
-    
-    # Get current year specific data FOR THIS USER
-    current_monthly_amount = yearly_dues_dict.get(current_year, 10)
-    current_year_expected = 12 * current_monthly_amount if is_active_member else 0
-    current_year_receipts = Receipt.objects.filter(
-        member=member,  # Filter by specific member
-        receipt_type='monthly_dues',
-        year=current_year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    current_year_progress = (current_year_receipts / current_year_expected * 100) if current_year_expected > 0 else 0
-    
-    response_data = {
-        'totalDuesExpected': float(total_expected),
-        'totalPaid': float(total_paid),
-        'overallProgress': round(overall_progress, 1),
-        
-        'currentYear': current_year,
-        'currentYearExpected': float(current_year_expected),
-        'currentYearPaid': float(current_year_receipts),
-        'currentYearProgress': round(current_year_progress, 1),
-        
-        'paymentHistory': payment_history[:4],
-        'memberStatus': member.status
-    }
-    
-    return Response(response_data)
+    return Response(dues_payload(MemberHistory(member), timezone.now().year))
 
 
 
 @api_view(['GET'])
+@cached_report(per_user=True)
 def transport_levies_report(request):
     """
     Returns transport levies report for the CURRENT MEMBER in the exact format expected by frontend
     """
     current_member = request.user.member_profile  # Get the member profile of current user
-    church = request.user.church
-    current_year = timezone.now().year
-    
-    # Calculate transport levies from receipts FOR CURRENT MEMBER
-    total_transport_receipts = Receipt.objects.filter(
-        member=current_member,
-        receipt_type='transport_levy'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Calculate expected transport levies from events FOR CURRENT MEMBER
-    total_events_levy = Event.objects.filter(
-        member=current_member,
-        is_levy_paid=False  # Only count unpaid levies as expected
-    ).aggregate(total=Sum('levy_amount'))['total'] or 0
-    
-    total_expected = total_events_levy
-    total_paid = total_transport_receipts
-    
-    # Current year calculations FOR CURRENT MEMBER
-    current_year_receipts = Receipt.objects.filter(
-        member=current_member,
-        receipt_type='transport_levy',
-        year=current_year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    current_year_expected = Event.objects.filter(
-        member=current_member,
-        is_levy_paid=False,
-        event_date__year=current_year
-    ).aggregate(total=Sum('levy_amount'))['total'] or 0
-    
-    # Calculate progress percentages
-    overall_progress = (total_paid / total_expected * 100) if total_expected > 0 else 0
-    current_year_progress = (current_year_receipts / current_year_expected * 100) if current_year_expected > 0 else 0
-    
-    # Member contributions (transport levy receipts FOR CURRENT MEMBER)
-    member_contributions = []
-    transport_receipts = Receipt.objects.filter(
-        member=current_member,
-        receipt_type='transport_levy'
-    ).select_related('member').order_by('-date')[:10]  # Last 10 contributions
-    
-    for receipt in transport_receipts:
-        # Try to find related event for this receipt
-        related_event = Event.objects.filter(
-            member=current_member,
-            event_date__year=receipt.year
-        ).first()
-        
-        purpose = "Transport levy"
-        if related_event:
-            purpose = f"{related_event.get_event_type_display()} - {related_event.description}"
-        
-        member_contributions.append({
-            'memberName': receipt.member.full_name,
-            'amountPaid': float(receipt.amount),
-            'progress': 100,  # Since they've paid, progress is 100%
-            'date': receipt.date.strftime('%b %d, %Y'),
-            'purpose': purpose
-        })
-    
-    response_data = {
-        'totalTransportExpected': float(total_expected),
-        'totalPaid': float(total_paid),
-        'overallProgress': round(overall_progress, 1),
-        
-        'currentYear': current_year,
-        'currentYearExpected': float(current_year_expected),
-        'currentYearPaid': float(current_year_receipts),
-        'currentYearProgress': round(current_year_progress, 1),
-        
-        'memberContributions': member_contributions
-    }
-    
-    return Response(response_data)
+    return Response(transport_levies_payload(MemberHistory(current_member), timezone.now().year))
 
 # events_list
 @api_view(['GET'])
@@ -516,10 +668,15 @@ def events_list(request):
     church = request.user.church
     today = timezone.now().date()
     
-    events = Event.objects.filter(church=church).select_related('member', 'created_by').order_by('-event_date')
+    events = with_levy_collected(
+        Event.objects.filter(church=church).select_related('member', 'created_by').order_by('-event_date')
+    )
+    
+    paginator = EventPagination()
+    page = paginator.paginate_queryset(events, request)
     
     events_data = []
-    for event in events:
+    for event in (events if page is None else page):
         events_data.append({
             'id': event.id,
             'event_type': event.event_type,
@@ -532,86 +689,24 @@ def events_list(request):
             'venue': event.venue,
             'description': event.description,
             'levy_amount': float(event.levy_amount),
+            'levy_collected': float(event.levy_collected),
             'is_levy_paid': event.is_levy_paid,
             'created_by_name': event.created_by.name
         })
     
+    if page is not None:
+        return paginator.get_paginated_response(events_data)
     return Response(events_data)
 
 
 @api_view(['GET'])
+@cached_report(per_user=True)
 def outstanding_amounts_report(request):
     """
     Returns outstanding amounts and recent payments for CURRENT MEMBER in the exact format expected by frontend
     """
     current_member = request.user.member_profile
-    current_year = timezone.now().year
-    
-    # Calculate outstanding dues per year FOR CURRENT MEMBER
-    outstanding_dues = {}
-    years_with_dues = Receipt.objects.filter(
-        member=current_member,
-        receipt_type='monthly_dues'
-    ).values_list('year', flat=True).distinct()
-    
-    for year in sorted(years_with_dues, reverse=True)[:2]:  # Last 2 years
-        # Get expected dues for this year FOR CURRENT MEMBER
-        yearly_dues = YearlyDues.objects.filter(church=request.user.church, year=year).first()
-        if yearly_dues:
-            # For individual member: 12 months × monthly amount
-            expected_amount = 12 * yearly_dues.monthly_amount
-        else:
-            expected_amount = 0
-        
-        # Get actual paid for this year FOR CURRENT MEMBER
-        paid_amount = Receipt.objects.filter(
-            member=current_member,
-            receipt_type='monthly_dues',
-            year=year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        outstanding = max(0, expected_amount - paid_amount)
-        if outstanding > 0:
-            outstanding_dues[str(year)] = float(outstanding)
-    
-    # Calculate outstanding transport levies per year FOR CURRENT MEMBER
-    outstanding_transport = {}
-    for year in range(current_year - 1, current_year + 1):  # Current and previous year
-        unpaid_levies = Event.objects.filter(
-            member=current_member,
-            is_levy_paid=False,
-            event_date__year=year
-        ).aggregate(total=Sum('levy_amount'))['total'] or 0
-        
-        if unpaid_levies > 0:
-            outstanding_transport[str(year)] = float(unpaid_levies)
-    
-    # Get recent payments FOR CURRENT MEMBER (last 10 receipts)
-    recent_receipts = Receipt.objects.filter(
-        member=current_member
-    ).select_related('member').order_by('-date')[:10]
-    
-    recent_payments = []
-    for receipt in recent_receipts:
-        receipt_type_display = 'Dues' if receipt.receipt_type == 'monthly_dues' else 'Transport Levy'
-        
-        recent_payments.append({
-            'id': receipt.id,
-            'type': receipt_type_display,
-            'amount': float(receipt.amount),
-            'date': receipt.date.strftime('%Y-%m-%d'),
-            'year': str(receipt.year),
-            'details': receipt.details or f"{receipt_type_display} payment",
-            'receiptNumber': receipt.receipt_number
-        })
-    
-    response_data = {
-        'outstandingDues': outstanding_dues,
-        'outstandingTransport': outstanding_transport,
-        'recentPayments': recent_payments
-    }
-    
-    return Response(response_data)
+    return Response(outstanding_amounts_payload(MemberHistory(current_member), timezone.now().year))
 
 
 
@@ -633,23 +728,42 @@ def member_payment_history(request):
         member=current_member
     ).select_related('member').order_by('-date')
     
-    payment_history = []
-    for receipt in receipts:
-        payment_history.append({
-            'id': receipt.id,
-            'receipt_number': receipt.receipt_number,
-            'receipt_type': receipt.receipt_type,
-            'date': receipt.date,
-            'amount': float(receipt.amount),
-            'year': receipt.year,
-            'details': receipt.details or '',
-            'created_at': receipt.created_at
-        })
+    paginator = DatedPagination()
+    page = paginator.paginate_queryset(receipts, request)
     
+    payment_history = [payment_history_row(receipt) for receipt in (receipts if page is None else page)]
+    
+    if page is not None:
+        return paginator.get_paginated_response(payment_history)
     return Response(payment_history)
 
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_report(per_user=True)
+def my_summary(request):
+    """
+    Everything the member home screen shows in one call: the dues, transport
+    levies and outstanding amounts reports plus the full payment history,
+    computed from the member's rows loaded once
+    """
+    try:
+        member = Member.objects.get(user=request.user, church=request.user.church)
+    except Member.DoesNotExist:
+        return Response({"error": "Member profile not found"}, status=404)
+    
+    current_year = timezone.now().year
+    history = MemberHistory(member)
+    return Response({
+        'dues': dues_payload(history, current_year),
+        'transportLevies': transport_levies_payload(history, current_year),
+        'outstandingAmounts': outstanding_amounts_payload(history, current_year),
+        'paymentHistory': [payment_history_row(receipt) for receipt in history.receipts]
+    })
+
+
+
 @api_view(['GET'])
 def church_info(request):
     """
@@ -688,6 +802,7 @@ def update_church_contact(request):
 
 
 @api_view(['GET'])
+@cached_report()
 def dashboard_stats(request):
     """
     Returns dashboard statistics for the church welfare admin
@@ -700,27 +815,19 @@ def dashboard_stats(request):
     total_members = Member.objects.filter(church=church).count()
     active_members = Member.objects.filter(church=church, status='active').count()
     
-    # Financial statistics - Total
-    total_receipts = Receipt.objects.filter(
-        member__church=church
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_payments = Payment.objects.filter(
-        church=church
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Financial statistics - Current Month
-    monthly_receipts = Receipt.objects.filter(
-        member__church=church,
-        date__year=current_year,
-        date__month=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    monthly_payments = Payment.objects.filter(
-        church=church,
-        date__year=current_year,
-        date__month=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Financial statistics - Total and Current Month, read from the monthly ledger rollup
+    current_month_q = Q(year=current_year, month=current_month)
+    ledger_totals = summarize(
+        ChurchMonthlyLedger.objects.filter(church=church),
+        total_receipts=Sum('amount', filter=Q(entry_kind='receipt')),
+        total_payments=Sum('amount', filter=Q(entry_kind='payment')),
+        monthly_receipts=Sum('amount', filter=Q(entry_kind='receipt') & current_month_q),
+        monthly_payments=Sum('amount', filter=Q(entry_kind='payment') & current_month_q),
+    )
+    total_receipts = ledger_totals['total_receipts'] or 0
+    total_payments = ledger_totals['total_payments'] or 0
+    monthly_receipts = ledger_totals['monthly_receipts'] or 0
+    monthly_payments = ledger_totals['monthly_payments'] or 0
     
     # Event statistics
     total_events = Event.objects.filter(church=church).count()
@@ -777,80 +884,35 @@ def get_time_since(dt):
             return f'{hours} hour{"s" if hours > 1 else ""} ago'
 
 @api_view(['GET'])
+@cached_report(timeout=30, stale=30)
 def dashboard_recent_activity(request):
     """
     Returns recent activity for the dashboard
     """
     church = request.user.church
-    recent_activity = []
-    
-    # Get recent receipts (last 5)
-    recent_receipts = Receipt.objects.filter(
-        member__church=church
-    ).select_related('member').order_by('-created_at')[:5]
-    
-    for receipt in recent_receipts:
-        recent_activity.append({
-            'type': 'receipt',
-            'description': f'{receipt.member.full_name} paid {receipt.get_receipt_type_display()}',
-            'time': get_time_since(receipt.created_at),
-            'timestamp': receipt.created_at
-        })
     
-    # Get recent events (last 5)
-    recent_events = Event.objects.filter(
-        church=church
-    ).select_related('member').order_by('-created_at')[:5]
-    
-    for event in recent_events:
-        recent_activity.append({
-            'type': 'event',
-            'description': f'New {event.get_event_type_display()} event for {event.member.full_name}',
-            'time': get_time_since(event.created_at),
-            'timestamp': event.created_at
-        })
-    
-    # Get recent payments (last 5)
-    recent_payments = Payment.objects.filter(
-        church=church
-    ).order_by('-created_at')[:5]
+    # Latest 10 entries, or cursor pages through the whole feed with ?page_size= / ?cursor=
+    entries = ActivityEntry.objects.filter(church=church)
+    paginator = ActivityPagination()
+    page = paginator.paginate_queryset(entries, request)
     
-    for payment in recent_payments:
+    recent_activity = []
+    for entry in (entries.order_by('-created_at', '-id')[:10] if page is None else page):
         recent_activity.append({
-            'type': 'payment',
-            'description': f'{payment.get_payment_type_display()} payment to {payment.payee_name}',
-            'time': get_time_since(payment.created_at),
-            'timestamp': payment.created_at
+            'type': entry.kind,
+            'description': entry.description,
+            'time': get_time_since(entry.created_at)
         })
     
-    # Get recent member updates (last 5)
-    recent_members = Member.objects.filter(
-        church=church
-    ).order_by('-updated_at')[:5]
-    
-    for member in recent_members:
-        if member.updated_at != member.created_at:  # Only count updates, not creations
-            recent_activity.append({
-                'type': 'member',
-                'description': f'{member.full_name} updated profile',
-                'time': get_time_since(member.updated_at),
-                'timestamp': member.updated_at
-            })
-    
-    # Sort by timestamp and take top 10
-    recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
-    recent_activity = recent_activity[:10]
-    
-    # Remove timestamp from response
-    for activity in recent_activity:
-        activity.pop('timestamp', None)
-    
+    if page is not None:
+        return paginator.get_paginated_response(recent_activity)
     return Response(recent_activity)
 
 
 
 
 @api_view(['GET'])
+@cached_report()
 def membership_insights(request):
     """
     Returns comprehensive membership insights and analytics
@@ -858,66 +920,56 @@ def membership_insights(request):
     church = request.user.church
     current_year = timezone.now().year
     
+    # Member counts by status and gender in one grouped pass
+    status_counts = dict.fromkeys((status_value for status_value, status_label in Member.MEMBER_STATUS), 0)
+    gender_counts = {'male': 0, 'female': 0}
+    total_members = 0
+    member_groups = Member.objects.filter(church=church).order_by().values('status', 'gender').annotate(count=Count('id'))
+    for group in member_groups:
+        total_members += group['count']
+        status_counts[group['status']] = status_counts.get(group['status'], 0) + group['count']
+        gender_counts[group['gender']] = gender_counts.get(group['gender'], 0) + group['count']
+    
     # Basic member counts
-    total_members = Member.objects.filter(church=church).count()
-    active_members = Member.objects.filter(church=church, status='active').count()
+    active_members = status_counts['active']
     
     # Gender breakdown
-    male_count = Member.objects.filter(church=church, gender='male').count()
-    female_count = Member.objects.filter(church=church, gender='female').count()
+    male_count = gender_counts['male']
+    female_count = gender_counts['female']
     
     # Status breakdown
     status_breakdown = []
     for status_value, status_label in Member.MEMBER_STATUS:
-        count = Member.objects.filter(church=church, status=status_value).count()
         status_breakdown.append({
             'status': status_label,
-            'count': count
+            'count': status_counts[status_value]
         })
     
-    # Calculate compliance rate (members who have paid current year dues)
-    current_year_dues_paid = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='monthly_dues',
-        year=current_year
-    ).values('member').distinct().count()
+    # Calculate compliance rate (members whose dues cover every month up to the current one)
+    current_year_dues_paid = dues_compliant_members(church, current_year)
     
     compliance_rate = round((current_year_dues_paid / active_members * 100)) if active_members > 0 else 0
     
     # Regular contributors (members with at least 3 payments this year)
     regular_contributors = Receipt.objects.filter(
-        member__church=church,
+        church=church,
         receipt_type='monthly_dues',
         year=current_year
     ).values('member').annotate(payment_count=Count('id')).filter(payment_count__gte=3).count()
     
-    # Outstanding dues calculation
-    current_dues = YearlyDues.objects.filter(church=church, year=current_year).first()
-    if current_dues:
-        expected_per_member = 12 * current_dues.monthly_amount
-    else:
-        expected_per_member = 0
-    
-    # Calculate members with outstanding dues
-    members_with_dues = []
-    all_active_members = Member.objects.filter(church=church, status='active')
-    
-    for member in all_active_members:
-        paid_amount = Receipt.objects.filter(
-            member=member,
-            receipt_type='monthly_dues',
-            year=current_year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        if paid_amount < expected_per_member:
-            members_with_dues.append(member)
-    
-    members_with_outstanding_dues = len(members_with_dues)
-    total_outstanding_amount = members_with_outstanding_dues * (expected_per_member - (paid_amount if paid_amount else 0))
+    # Members with outstanding dues and the exact amount they still owe
+    arrears = MemberYearBalance.objects.filter(
+        member__church=church,
+        member__status='active',
+        year=current_year,
+        outstanding__gt=0
+    ).aggregate(members_owing=Count('id'), total_outstanding=Sum('outstanding'))
+    members_with_outstanding_dues = arrears['members_owing']
+    total_outstanding_amount = arrears['total_outstanding'] or 0
     
     # Top contributors (based on total payments across all years)
     top_contributors_data = Receipt.objects.filter(
-        member__church=church
+        church=church
     ).values(
         'member__id', 'member__full_name'
     ).annotate(
@@ -952,14 +1004,35 @@ def membership_insights(request):
 
 
 
+def receipts_current_period(church):
+    """
+    The receipts_insights fields about the current month. Not part of a
+    closed year's snapshot; served live over it.
+    """
+    now = timezone.now()
+    previous_month_year, previous_month = month_before(now.year, now.month)
+    totals = summarize(
+        Receipt.objects.filter(church=church),
+        current_month_receipts=Sum('amount', filter=month_q('date', now.year, now.month)),
+        previous_month_receipts=Sum('amount', filter=month_q('date', previous_month_year, previous_month)),
+    )
+    current_month_receipts = totals['current_month_receipts'] or 0
+    previous_month_receipts = totals['previous_month_receipts'] or 0
+    return {
+        'current_month_total': float(current_month_receipts),
+        'monthly_growth': round(growth(current_month_receipts, previous_month_receipts), 1),
+    }
+
+
 @api_view(['GET'])
+@cached_report()
+@snapshot_report(live=receipts_current_period)
 def receipts_insights(request):
     """
     Returns comprehensive receipts insights and analytics
     """
     church = request.user.church
     current_year = timezone.now().year
-    current_month = timezone.now().month
     
     # Get year from query params, default to current year
     year = request.GET.get('year', current_year)
@@ -967,111 +1040,72 @@ def receipts_insights(request):
         year = int(year)
     except (TypeError, ValueError):
         year = current_year
-    
-    # Total receipts for the year
-    year_receipts = Receipt.objects.filter(
-        member__church=church,
-        year=year
+    if year not in YEARS:
+        return Response({'error': YEAR_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+    
+    church_receipts = Receipt.objects.filter(church=church)
+    
+    # Yearly totals and type breakdown in one pass
+    year_q = Q(year=year)
+    totals = summarize(
+        church_receipts,
+        total_year_receipts=Sum('amount', filter=year_q),
+        total_receipts_count=Count('id', filter=year_q),
+        monthly_dues_total=Sum('amount', filter=year_q & Q(receipt_type='monthly_dues')),
+        transport_levy_total=Sum('amount', filter=year_q & Q(receipt_type='transport_levy')),
+        other_types_total=Sum('amount', filter=year_q & Q(receipt_type__in=['donation', 'passbook', 'other'])),
     )
     
-    total_year_receipts = year_receipts.aggregate(total=Sum('amount'))['total'] or 0
-    total_receipts_count = year_receipts.count()
-    
-    # Current month receipts
-    current_month_receipts = Receipt.objects.filter(
-        member__church=church,
-        date__year=current_year,
-        date__month=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Previous month for growth calculation
-    previous_month = current_month - 1 if current_month > 1 else 12
-    previous_month_year = current_year if current_month > 1 else current_year - 1
-    
-    previous_month_receipts = Receipt.objects.filter(
-        member__church=church,
-        date__year=previous_month_year,
-        date__month=previous_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    total_year_receipts = totals['total_year_receipts'] or 0
+    total_receipts_count = totals['total_receipts_count']
     
-    # Monthly growth calculation
-    monthly_growth = 0
-    if previous_month_receipts > 0:
-        monthly_growth = ((current_month_receipts - previous_month_receipts) / previous_month_receipts) * 100
+    # Current month total and month-over-month growth
+    current_period = receipts_current_period(church)
     
     # Average receipt amount
     average_receipt_amount = total_year_receipts / total_receipts_count if total_receipts_count > 0 else 0
     
     # Type breakdown for the year
-    monthly_dues_total = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='monthly_dues',
-        year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    transport_levy_total = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='transport_levy',
-        year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    other_types_total = Receipt.objects.filter(
-        member__church=church,
-        receipt_type__in=['donation', 'passbook', 'other'],
-        year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    monthly_dues_total = totals['monthly_dues_total'] or 0
+    transport_levy_total = totals['transport_levy_total'] or 0
+    other_types_total = totals['other_types_total'] or 0
     
     # Monthly trends for the year
     monthly_trends = []
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    trend = ledger_trend(
+        church, 'receipt', year,
+        total=Sum('amount'),
+        monthly_dues=Sum('amount', filter=Q(entry_type='monthly_dues')),
+        transport_levy=Sum('amount', filter=Q(entry_type='transport_levy')),
+    )
     
-    for month_num in range(1, 13):
-        month_receipts = Receipt.objects.filter(
-            member__church=church,
-            date__year=year,
-            date__month=month_num
-        )
-        
-        month_total = month_receipts.aggregate(total=Sum('amount'))['total'] or 0
-        month_dues = month_receipts.filter(receipt_type='monthly_dues').aggregate(total=Sum('amount'))['total'] or 0
-        month_transport = month_receipts.filter(receipt_type='transport_levy').aggregate(total=Sum('amount'))['total'] or 0
-        
+    for month_label, month in zip(MONTH_LABELS, trend):
         monthly_trends.append({
-            'month': months[month_num - 1],
-            'total': float(month_total),
-            'monthly_dues': float(month_dues),
-            'transport_levy': float(month_transport)
+            'month': month_label,
+            'total': float(month['total'] or 0),
+            'monthly_dues': float(month['monthly_dues'] or 0),
+            'transport_levy': float(month['transport_levy'] or 0)
         })
     
-    # Monthly dues compliance rate
+    # Monthly dues compliance rate: members covered for every month due in the year
     active_members = Member.objects.filter(church=church, status='active').count()
-    members_paid_dues = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='monthly_dues',
-        year=year
-    ).values('member').distinct().count()
-    
-    print(members_paid_dues, active_members)
+    members_paid_dues = dues_compliant_members(church, year)
     
     monthly_dues_compliance = round((members_paid_dues / active_members * 100)) if active_members > 0 else 0
     monthly_dues_target = 85  # Default target
     
     # Transport levy efficiency (collected vs expected from events)
     total_events_levy = Event.objects.filter(
+        Period.year(year).q('event_date'),
         church=church,
-        event_type='funeral',
-        event_date__year=year
+        event_type='funeral'
     ).aggregate(total=Sum('levy_amount'))['total'] or 0
     
-    
-    print(transport_levy_total, total_events_levy)
-    
     transport_levy_efficiency = round((transport_levy_total / total_events_levy * 100)) if total_events_levy > 0 else 0
     transport_levy_expected = 75  # Default expected rate
     
     # Top contributors for the year
-    top_contributors_data = Receipt.objects.filter(
-        member__church=church,
+    top_contributors_data = church_receipts.filter(
         year=year
     ).values(
         'member__id', 'member__full_name'
@@ -1093,8 +1127,8 @@ def receipts_insights(request):
     response_data = {
         'total_year_receipts': float(total_year_receipts),
         'total_receipts_count': total_receipts_count,
-        'current_month_total': float(current_month_receipts),
-        'monthly_growth': round(monthly_growth, 1),
+        'current_month_total': current_period['current_month_total'],
+        'monthly_growth': current_period['monthly_growth'],
         'average_receipt_amount': round(float(average_receipt_amount), 2),
         
         'monthly_dues_total': float(monthly_dues_total),
@@ -1117,14 +1151,42 @@ def receipts_insights(request):
 
 
 
+def payments_current_period(church):
+    """
+    The payments_insights fields about the current month. Not part of a
+    closed year's snapshot; served live over it.
+    """
+    now = timezone.now()
+    previous_month_year, previous_month = month_before(now.year, now.month)
+    current_month_q = month_q('date', now.year, now.month)
+    totals = summarize(
+        Payment.objects.filter(church=church),
+        current_month_payments=Sum('amount', filter=current_month_q),
+        previous_month_payments=Sum('amount', filter=month_q('date', previous_month_year, previous_month)),
+    )
+    current_month_payments = totals['current_month_payments'] or 0
+    previous_month_payments = totals['previous_month_payments'] or 0
+    current_month_receipts = Receipt.objects.filter(current_month_q, church=church).aggregate(
+        total=Sum('amount')
+    )['total'] or 0
+    return {
+        # Current month receipts - current month payments
+        'monthly_surplus': float(current_month_receipts - current_month_payments),
+        'current_month_total': float(current_month_payments),
+        # Negative growth is good for payments - less spending
+        'monthly_growth': round(growth(current_month_payments, previous_month_payments), 1),
+    }
+
+
 @api_view(['GET'])
+@cached_report()
+@snapshot_report(live=payments_current_period)
 def payments_insights(request):
     """
     Returns comprehensive payments insights and financial health analytics
     """
     church = request.user.church
     current_year = timezone.now().year
-    current_month = timezone.now().month
     
     # Get year from query params, default to current year
     year = request.GET.get('year', current_year)
@@ -1132,106 +1194,59 @@ def payments_insights(request):
         year = int(year)
     except (TypeError, ValueError):
         year = current_year
-    
-    # Total payments for the year
-    year_payments = Payment.objects.filter(
-        church=church,
-        date__year=year
+    if year not in YEARS:
+        return Response({'error': YEAR_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Yearly totals and type breakdown in one pass
+    year_q = Period.year(year).q('date')
+    totals = summarize(
+        Payment.objects.filter(church=church),
+        total_year_payments=Sum('amount', filter=year_q),
+        total_payments_count=Count('id', filter=year_q),
+        member_benefits_total=Sum('amount', filter=year_q & Q(payment_type='member_benefit')),
+        operational_total=Sum('amount', filter=year_q & Q(payment_type='operational_expense')),
+        event_expenses_total=Sum('amount', filter=year_q & Q(payment_type='event_expense')),
+        other_expenses_total=Sum('amount', filter=year_q & Q(payment_type='other')),
     )
     
-    total_year_payments = year_payments.aggregate(total=Sum('amount'))['total'] or 0
-    total_payments_count = year_payments.count()
-    
-    # Current month payments
-    current_month_payments = Payment.objects.filter(
-        church=church,
-        date__year=current_year,
-        date__month=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Previous month for growth calculation
-    previous_month = current_month - 1 if current_month > 1 else 12
-    previous_month_year = current_year if current_month > 1 else current_year - 1
-    
-    previous_month_payments = Payment.objects.filter(
-        church=church,
-        date__year=previous_month_year,
-        date__month=previous_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    total_year_payments = totals['total_year_payments'] or 0
+    total_payments_count = totals['total_payments_count']
     
-    # Monthly growth calculation (negative growth is good for payments - less spending)
-    monthly_growth = 0
-    if previous_month_payments > 0:
-        monthly_growth = ((current_month_payments - previous_month_payments) / previous_month_payments) * 100
+    # Current month total, month-over-month growth and surplus
+    current_period = payments_current_period(church)
     
     # Average payment amount
     average_payment_amount = total_year_payments / total_payments_count if total_payments_count > 0 else 0
     
     # Payment type breakdown for the year
-    member_benefits_total = Payment.objects.filter(
-        church=church,
-        payment_type='member_benefit',
-        date__year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    operational_total = Payment.objects.filter(
-        church=church,
-        payment_type='operational_expense', 
-        date__year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    event_expenses_total = Payment.objects.filter(
-        church=church,
-        payment_type='event_expense',
-        date__year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    other_expenses_total = Payment.objects.filter(
-        church=church,
-        payment_type='other',
-        date__year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    member_benefits_total = totals['member_benefits_total'] or 0
+    operational_total = totals['operational_total'] or 0
+    event_expenses_total = totals['event_expenses_total'] or 0
+    other_expenses_total = totals['other_expenses_total'] or 0
     
     # Monthly trends for the year
     monthly_trends = []
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    trend = ledger_trend(
+        church, 'payment', year,
+        total=Sum('amount'),
+        member_benefits=Sum('amount', filter=Q(entry_type='member_benefit')),
+        operational=Sum('amount', filter=Q(entry_type='operational_expense')),
+        event_expenses=Sum('amount', filter=Q(entry_type='event_expense')),
+    )
     
-    for month_num in range(1, 13):
-        month_payments = Payment.objects.filter(
-            church=church,
-            date__year=year,
-            date__month=month_num
-        )
-        
-        month_total = month_payments.aggregate(total=Sum('amount'))['total'] or 0
-        month_member_benefits = month_payments.filter(payment_type='member_benefit').aggregate(total=Sum('amount'))['total'] or 0
-        month_operational = month_payments.filter(payment_type='operational_expense').aggregate(total=Sum('amount'))['total'] or 0
-        month_event_expenses = month_payments.filter(payment_type='event_expense').aggregate(total=Sum('amount'))['total'] or 0
-        
+    for month_label, month in zip(MONTH_LABELS, trend):
         monthly_trends.append({
-            'month': months[month_num - 1],
-            'total': float(month_total),
-            'member_benefits': float(month_member_benefits),
-            'operational': float(month_operational),
-            'event_expenses': float(month_event_expenses)
+            'month': month_label,
+            'total': float(month['total'] or 0),
+            'member_benefits': float(month['member_benefits'] or 0),
+            'operational': float(month['operational'] or 0),
+            'event_expenses': float(month['event_expenses'] or 0)
         })
     
     # Financial Health Metrics
     
     # Total receipts for the year (for financial health calculations)
-    total_receipts = Receipt.objects.filter(
-        member__church=church,
-        year=year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Monthly surplus (current month receipts - current month payments)
-    current_month_receipts = Receipt.objects.filter(
-        member__church=church,
-        date__year=current_year,
-        date__month=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    monthly_surplus = current_month_receipts - current_month_payments
+    total_receipts = Receipt.objects.filter(church=church, year=year).aggregate(total=Sum('amount'))['total'] or 0
     
     # Spending ratio (payments ÷ receipts)
     spending_ratio = round((total_year_payments / total_receipts * 100)) if total_receipts > 0 else 0
@@ -1244,7 +1259,7 @@ def payments_insights(request):
     
     response_data = {
         # Financial Health
-        'monthly_surplus': float(monthly_surplus),
+        'monthly_surplus': current_period['monthly_surplus'],
         'spending_ratio': spending_ratio,
         'welfare_ratio': welfare_ratio,
         'total_receipts': float(total_receipts),
@@ -1253,8 +1268,8 @@ def payments_insights(request):
         # Payments Overview
         'total_year_payments': float(total_year_payments),
         'total_payments_count': total_payments_count,
-        'current_month_total': float(current_month_payments),
-        'monthly_growth': round(monthly_growth, 1),
+        'current_month_total': current_period['current_month_total'],
+        'monthly_growth': current_period['monthly_growth'],
         'average_payment_amount': round(float(average_payment_amount), 2),
         
         # Payment Type Breakdown
@@ -1272,14 +1287,37 @@ def payments_insights(request):
 
 
 
+def events_current_period(church):
+    """
+    The events_insights fields about the current month. Not part of a
+    closed year's snapshot; served live over it.
+    """
+    now = timezone.now()
+    previous_month_year, previous_month = month_before(now.year, now.month)
+    current_month_events = Event.objects.filter(
+        month_q('event_date', now.year, now.month), church=church
+    ).count()
+    levy_totals = summarize(
+        Receipt.objects.filter(church=church, receipt_type='transport_levy'),
+        current_month_levy=Sum('amount', filter=month_q('date', now.year, now.month)),
+        previous_month_levy=Sum('amount', filter=month_q('date', previous_month_year, previous_month)),
+    )
+    return {
+        'current_month_events': current_month_events,
+        # Levy collected this month against the previous month
+        'levy_trend': round(growth(levy_totals['current_month_levy'] or 0, levy_totals['previous_month_levy'] or 0), 1),
+    }
+
+
 @api_view(['GET'])
+@cached_report()
+@snapshot_report(live=events_current_period)
 def events_insights(request):
     """
     Returns comprehensive events insights and analytics
     """
     church = request.user.church
     current_year = timezone.now().year
-    current_month = timezone.now().month
     
     # Get year from query params, default to current year
     year = request.GET.get('year', current_year)
@@ -1287,52 +1325,54 @@ def events_insights(request):
         year = int(year)
     except (TypeError, ValueError):
         year = current_year
+    if year not in YEARS:
+        return Response({'error': YEAR_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+    
+    church_events = Event.objects.filter(church=church)
+    
+    # Event volume and type distribution in one pass
+    year_q = Period.year(year).q('event_date')
+    event_totals = summarize(
+        church_events,
+        total_events=Count('id', filter=year_q),
+        events_with_levy=Count('id', filter=year_q & Q(levy_amount__gt=0)),
+        **{
+            f'{event_type}_count': Count('id', filter=year_q & Q(event_type=event_type))
+            for event_type, event_label in Event.EVENT_TYPES
+        }
+    )
     
-    # Event volume
-    total_events = Event.objects.filter(
-        church=church,
-        event_date__year=year
-    ).count()
-    
-    current_month_events = Event.objects.filter(
-        church=church,
-        event_date__year=current_year,
-        event_date__month=current_month
-    ).count()
+    total_events = event_totals['total_events']
+    current_period = events_current_period(church)
     
     # Event type distribution
     event_type_distribution = []
     for event_type, event_label in Event.EVENT_TYPES:
-        count = Event.objects.filter(
-            church=church,
-            event_type=event_type,
-            event_date__year=year
-        ).count()
         event_type_distribution.append({
             'event_type': event_type,
-            'count': count
+            'count': event_totals[f'{event_type}_count']
         })
     
     # Financial impact
-    events_with_levy = Event.objects.filter(
-        church=church,
-        event_date__year=year,
-        levy_amount__gt=0
-    ).count()
+    events_with_levy = event_totals['events_with_levy']
     
     total_levy_collected = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='transport_levy',
-        year=year
+        church=church, receipt_type='transport_levy', year=year
     ).aggregate(total=Sum('amount'))['total'] or 0
     
-    total_levy_expected = Event.objects.filter(
-        church=church,
-        event_date__year=year
-    ).aggregate(total=Sum('levy_amount'))['total'] or 0
-    
-    # Levy collection rate
-    levy_collection_rate = round((total_levy_collected / total_levy_expected * 100)) if total_levy_expected > 0 else 0
+    # Levy collection rate: what members paid for the year's events against
+    # what was assessed on them
+    obligation_totals = LevyObligation.objects.filter(
+        Period.year(year).q('event__event_date'),
+        event__church=church,
+    ).aggregate(
+        assessed=Sum('amount'),
+        collected=Sum('amount_paid'),
+        outstanding=Sum(F('amount') - F('amount_paid'), filter=Q(settled=False)),
+    )
+    levy_assessed = obligation_totals['assessed'] or 0
+    levy_outstanding = obligation_totals['outstanding'] or 0
+    levy_collection_rate = round((obligation_totals['collected'] or 0) / levy_assessed * 100) if levy_assessed > 0 else 0
     
     # Average levy amount
     average_levy_amount = total_levy_collected / events_with_levy if events_with_levy > 0 else 0
@@ -1340,71 +1380,45 @@ def events_insights(request):
     # Cost recovery rate (levies collected vs total event costs)
     # This is a simplified calculation - you might want to track actual event costs separately
     total_event_payments = Payment.objects.filter(
+        Period.year(year).q('date'),
         church=church,
-        payment_type='event_expense',
-        date__year=year
+        payment_type='event_expense'
     ).aggregate(total=Sum('amount'))['total'] or 0
     
     cost_recovery_rate = round((total_levy_collected / total_event_payments * 100)) if total_event_payments > 0 else 0
     
     # Monthly trends
     monthly_trends = []
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    event_trend = ledger_trend(
+        church, 'event', year,
+        total_events=Sum('count'),
+        levy_expected=Sum('amount'),
+    )
+    levy_trend_rows = ledger_trend(
+        church, 'receipt', year,
+        levy_collected=Sum('amount', filter=Q(entry_type='transport_levy')),
+    )
     
-    for month_num in range(1, 13):
-        month_events = Event.objects.filter(
-            church=church,
-            event_date__year=year,
-            event_date__month=month_num
-        )
-        
-        month_total_events = month_events.count()
-        month_levy_collected = Receipt.objects.filter(
-            member__church=church,
-            receipt_type='transport_levy',
-            date__year=year,
-            date__month=month_num
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        month_levy_expected = month_events.aggregate(total=Sum('levy_amount'))['total'] or 0
+    for month_label, month_events, month_levies in zip(MONTH_LABELS, event_trend, levy_trend_rows):
+        month_total_events = month_events['total_events'] or 0
+        month_levy_collected = month_levies['levy_collected'] or 0
+        month_levy_expected = month_events['levy_expected'] or 0
         month_levy_rate = round((month_levy_collected / month_levy_expected * 100)) if month_levy_expected > 0 else 0
         
         monthly_trends.append({
-            'month': months[month_num - 1],
+            'month': month_label,
             'total_events': month_total_events,
             'levy_collected': float(month_levy_collected),
             'levy_collection_rate': month_levy_rate
         })
     
-    # Levy trend (current month vs previous month)
-    previous_month = current_month - 1 if current_month > 1 else 12
-    previous_month_year = current_year if current_month > 1 else current_year - 1
-    
-    current_month_levy = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='transport_levy',
-        date__year=current_year,
-        date__month=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    previous_month_levy = Receipt.objects.filter(
-        member__church=church,
-        receipt_type='transport_levy',
-        date__year=previous_month_year,
-        date__month=previous_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    levy_trend = 0
-    if previous_month_levy > 0:
-        levy_trend = ((current_month_levy - previous_month_levy) / previous_month_levy) * 100
-    
     # Performance targets
     levy_collection_target = 85  # Default target
     
     response_data = {
         # Event Volume
         'total_events': total_events,
-        'current_month_events': current_month_events,
+        'current_month_events': current_period['current_month_events'],
         
         # Event Type Distribution
         'event_type_distribution': event_type_distribution,
@@ -1412,6 +1426,8 @@ def events_insights(request):
         # Financial Impact
         'total_levy_collected': float(total_levy_collected),
         'levy_collection_rate': levy_collection_rate,
+        'total_levy_assessed': float(levy_assessed),
+        'total_levy_outstanding': float(levy_outstanding),
         'average_levy_amount': round(float(average_levy_amount), 2),
         'events_with_levy': events_with_levy,
         'cost_recovery_rate': cost_recovery_rate,
@@ -1421,7 +1437,124 @@ def events_insights(request):
         
         # Performance
         'levy_collection_target': levy_collection_target,
-        'levy_trend': round(levy_trend, 1)
+        'levy_trend': current_period['levy_trend']
     }
     
-    return Response(response_data)
\ No newline at end of file
+    return Response(response_data)
+
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsWelfareOrChurchAdmin])
+@cached_report()
+def arrears_aging_report(request):
+    """
+    How far behind on dues the church's active members are, bucketed by
+    months behind (0-3, 3-6, 6-12, 12+), with a page of the members behind
+    sorted furthest behind first. ?bucket= narrows the list to one bucket.
+    """
+    church = request.user.church
+    member_ids, months_behind, amount_behind = arrears_aging(church)
+    buckets = aging_buckets(months_behind, amount_behind)
+    active_members = Member.objects.filter(church=church, status='active').count()
+    
+    paginator = AgingPagination()
+    page = paginator.paginate_queryset(bucket_positions(months_behind, request.query_params.get('bucket')), request)
+    members = Member.objects.filter(pk__in=[int(member_ids[position]) for position in page]).in_bulk()
+    
+    results = []
+    for position in page:
+        member = members[int(member_ids[position])]
+        results.append({
+            'id': member.id,
+            'full_name': member.full_name,
+            'phone_number': member.phone_number,
+            'months_behind': int(months_behind[position]),
+            'amount_behind': round(float(amount_behind[position]), 2),
+        })
+    
+    return Response({
+        'active_members': active_members,
+        'members_up_to_date': active_members - len(member_ids),
+        'members_behind': len(member_ids),
+        'total_arrears': round(float(amount_behind.sum()), 2),
+        'buckets': buckets,
+        'count': paginator.page.paginator.count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': results,
+    })
+
+
+
+# Most candidate amounts one simulator request may compare
+MAX_SIMULATED_AMOUNTS = 50
+
+# Largest candidate amount: the most YearlyDues.monthly_amount can hold
+MAX_SIMULATED_MONTHLY_AMOUNT = Decimal('99999999.99')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsWelfareOrChurchAdmin])
+@cached_report()
+def dues_simulator(request):
+    """
+    Projected dues income, compliance and shortfalls at candidate monthly
+    amounts (?amounts=10,12.5,15), from how active members paid over the
+    last ?history_years= (default 3) years
+    """
+    church = request.user.church
+    try:
+        amounts = [Decimal(amount.strip()) for amount in request.query_params.get('amounts', '').split(',') if amount.strip()]
+    except InvalidOperation:
+        return Response({'error': 'amounts must be a comma-separated list of numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not amounts or len(amounts) > MAX_SIMULATED_AMOUNTS:
+        return Response(
+            {'error': f'Give between 1 and {MAX_SIMULATED_AMOUNTS} amounts'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if any(not amount.is_finite() or not 0 < amount <= MAX_SIMULATED_MONTHLY_AMOUNT for amount in amounts):
+        return Response(
+            {'error': f'amounts must be greater than 0 and at most {MAX_SIMULATED_MONTHLY_AMOUNT}'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    
+    history_years = request.query_params.get('history_years', '3')
+    if not history_years.isdigit() or not 1 <= int(history_years) <= 10:
+        return Response({'error': 'history_years must be between 1 and 10'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    simulation = simulate_dues(church, amounts, int(history_years))
+    simulation['current_monthly_amount'] = YearlyDues.objects.filter(
+        church=church, year=timezone.now().year
+    ).values_list('monthly_amount', flat=True).first()
+    return Response(simulation)
+
+
+
+# Reports frozen when a church closes a year
+SNAPSHOT_REPORTS = ('receipts_insights', 'payments_insights', 'events_insights')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def close_report_year(request):
+    """
+    Freeze the receipts, payments and events insights of a past year so they
+    are served from ReportSnapshot instead of being recomputed. Writing a
+    back-dated receipt, payment or event or changing the year's dues discards
+    the year's snapshots; a change to the active members discards them all.
+    """
+    if not (request.user.is_welfare_admin or request.user.is_church_admin):
+        raise PermissionDenied("Only welfare or church admins can close a year")
+    
+    try:
+        year = int(request.data.get('year'))
+    except (TypeError, ValueError):
+        return Response({'error': 'year is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if year not in YEARS:
+        return Response({'error': YEAR_RANGE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+    if year >= timezone.now().year:
+        return Response({'error': 'Only past years can be closed'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    frozen = close_year(request, year, SNAPSHOT_REPORTS)
+    return Response({'year': year, 'reports': frozen})
+